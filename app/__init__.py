@@ -1,10 +1,11 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from app.configuration.settings import Configuration
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db
-from app.tasks.scheduler.scheduler import start_scheduler
+from app.tasks.scheduler.scheduler import start_scheduler, stop_scheduler
 
 from app.auth.auth import AuthRouter
 from app.admin.admin import AdminRouter
@@ -27,20 +28,50 @@ from app.routes.payment.payment import PaymentRouter
 from app.routes.company.promocode import PromoCodeRouter
 
 from app.tasks.websockets import routes as websocket_routes
+from app.services.cart_store import cart_store
+from app.integration.mercadopago import payment_gateway
+from app.services.payment_expiry import payment_expiry
+from app.services.webhook_inbox import webhook_inbox
+from app.services.payment_events import payment_status_listener
+from app.services.promocodes import refresh_promo_registry
 
 configuration = Configuration()
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logging.info(f"SISTEMA >>> Ambiente carregado: {configuration.environment}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Flusher do store de carrinhos (CART_STORE); no encerramento grava o que estiver pendente
+    await cart_store.start()
+    # Cancelamento de pagamentos no vencimento (carrega os pendentes do banco)
+    await payment_expiry.start()
+    # Workers da caixa de entrada dos webhooks de pagamento
+    await webhook_inbox.start()
+    # Status de pagamento alterados pelos jobs (NOTIFY), inclusive no worker de jobs
+    await payment_status_listener.start()
+    promo_refresh = asyncio.create_task(refresh_promo_registry(configuration.promo_registry_refresh_interval))
+    try:
+        yield
+    finally:
+        promo_refresh.cancel()
+        with suppress(asyncio.CancelledError):
+            await promo_refresh
+        await payment_status_listener.stop()
+        await webhook_inbox.stop()
+        await payment_expiry.stop()
+        await payment_gateway.aclose()
+        await cart_store.stop()
+        stop_scheduler()
+
 def create_app():
     """
     Cria e configura a aplicação FastAPI, incluindo middlewares e rotas.
     """
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
 
-    logging.info("Inicializando o banco de dados...")
-    init_db()
+    # Migrações e seeds rodam fora do processo web: python -m app.database.bootstrap
+    # Jobs: SCHEDULER_MODE=off aqui e python -m app.tasks.scheduler.worker em processo próprio
     start_scheduler()
 
     if configuration.environment == "production":
@@ -54,6 +85,7 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
     
     # Configure a montagem dos arquivos estáticos AQUI
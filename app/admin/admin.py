@@ -1,8 +1,8 @@
 from datetime import datetime, timedelta, timezone
 import bcrypt
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlmodel import Session, select
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from app.core.middlewares.users import is_admin
 from app.models.user.address import Address
@@ -10,6 +10,7 @@ from app.models.user.user import User
 from app.schemas.user.user import UserCreate, UserResponse, UserUpdate
 from app.auth.auth import AuthRouter
 from app.database.connection import get_session
+from app.core.utils.pagination import CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, split_page, to_naive_utc
 
 get_current_user = AuthRouter().get_current_user
 
@@ -22,10 +23,28 @@ class AdminRouter(APIRouter):
         self.add_api_route("/admin/users/{user_id}", self.update_user_by_id, methods=["PUT"], response_model=UserResponse)
         self.add_api_route("/admin/users/{user_id}", self.delete_user_by_id, methods=["DELETE"], response_model=Dict[str, Any])
 
-    async def get_all_users(self, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    async def get_all_users(
+        self,
+        response: Response,
+        cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {CURSOR_HEADER} da página anterior"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        role: Optional[str] = Query(None),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        session: Session = Depends(get_session),
+        current_user: User = Depends(get_current_user),
+    ):
         is_admin(current_user)
-        users = session.exec(select(User).where(User.deleted_at == None)).all()
-        return [UserResponse.from_orm(user) for user in users]
+        statement = select(User).where(User.deleted_at == None)
+        if role:
+            statement = statement.where(User.role == role)
+        if created_from:
+            statement = statement.where(User.created_at >= to_naive_utc(created_from))
+        if created_to:
+            statement = statement.where(User.created_at < to_naive_utc(created_to))
+
+        users = session.exec(keyset_page(statement, User, cursor, limit)).all()
+        return [UserResponse.from_orm(user) for user in split_page(users, limit, response)]
 
     async def create_user(self, user_data: UserCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
         is_admin(current_user)
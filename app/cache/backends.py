@@ -0,0 +1,355 @@
+# app/cache/backends.py
+import asyncio
+import logging
+import pickle
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Contadores de uso de um backend de cache."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    sets: int = 0
+    deletes: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class CacheBackend(ABC):
+    """Interface comum dos backends usados pelo DataCache."""
+
+    name = "base"
+
+    def __init__(self):
+        self._stats = CacheStats()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self._stats, field, getattr(self._stats, field) + amount)
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Retorna o valor da chave ou None se não existir/estiver expirado."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        """Armazena o valor com tempo de expiração em segundos."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a chave do cache."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todas as chaves do backend."""
+
+    # Versões para o event loop; backends com E/S de rede as rodam numa thread
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: int) -> None:
+        self.set(key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            data = self._stats.as_dict()
+        data["backend"] = self.name
+        return data
+
+    def close(self) -> None:
+        """Libera recursos (threads, conexões) do backend."""
+
+
+class LRUBackend(CacheBackend):
+    """
+    Cache em memória do processo com limite de entradas e de bytes.
+    As chaves menos usadas são descartadas primeiro e uma thread remove as expiradas periodicamente.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, sweep_interval: float = 60.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        if sweep_interval > 0:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, args=(sweep_interval,), name="cache-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    @staticmethod
+    def _size_of(value: Any) -> int:
+        try:
+            return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return 0
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._count("misses")
+                return None
+            value, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._count("expirations")
+                self._count("misses")
+                return None
+            self._data.move_to_end(key)
+        self._count("hits")
+        return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        size = self._size_of(value)
+        if self.max_bytes and size > self.max_bytes:
+            logging.warning(f"CACHE >>> Valor da chave {key} ({size} bytes) excede o limite do cache e não foi armazenado")
+            self.delete(key)
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            evicted = 0
+            while self._data and (
+                (self.max_entries and len(self._data) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                evicted += 1
+        self._count("sets")
+        if evicted:
+            self._count("evictions", evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key not in self._data:
+                return
+            self._remove(key)
+        self._count("deletes")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Remove as chaves expiradas e retorna quantas foram removidas."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._data.items() if now >= expires_at]
+            for key in expired:
+                self._remove(key)
+        if expired:
+            self._count("expirations", len(expired))
+        return len(expired)
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"CACHE >>> Erro na limpeza de chaves expiradas: {e}")
+
+    def stats(self) -> dict:
+        data = super().stats()
+        with self._lock:
+            data.update(entries=len(self._data), bytes=self._bytes,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes)
+        return data
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+class RedisBackend(CacheBackend):
+    """
+    Cache compartilhado entre workers usando o protocolo Redis.
+    O cliente é injetável; qualquer objeto com get/set/delete/scan_iter (ex.: fakeredis) serve.
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = "thomaggio:cache:"):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("CACHE_BACKEND=redis requer o pacote 'redis' instalado") from e
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self.client.set(self._key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+        self._count("sets")
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self._key(key))
+        self._count("deletes")
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: int) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        await asyncio.to_thread(self.delete, key)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        data = super().stats()
+        try:
+            # Remoções por falta de memória são feitas pelo próprio servidor
+            data["evictions"] = int(self.client.info("stats").get("evicted_keys", 0))
+        except Exception:
+            pass
+        return data
+
+    def close(self) -> None:
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+class TieredBackend(CacheBackend):
+    """
+    Dois níveis: L1 em memória (TTL curto) na frente do L2 compartilhado.
+    Escritas e remoções são publicadas num canal para que os outros workers descartem o L1.
+    """
+
+    name = "tiered"
+
+    def __init__(self, l1: LRUBackend, l2: RedisBackend, l1_ttl: int = 30,
+                 channel: str = "thomaggio:cache:invalidate"):
+        super().__init__()
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.channel = channel
+        self._origin = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+        self._pubsub = None
+        try:
+            self._pubsub = self.l2.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(self.channel)
+            self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+            self._listener.start()
+        except Exception as e:
+            # Sem pub/sub a consistência entre workers fica limitada ao TTL do L1
+            logging.warning(f"CACHE >>> Invalidação entre workers indisponível: {e}")
+
+    def _publish(self, key: str) -> None:
+        try:
+            self.l2.client.publish(self.channel, f"{self._origin}:{key}")
+        except Exception as e:
+            logging.warning(f"CACHE >>> Falha ao publicar invalidação da chave {key}: {e}")
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                logging.error(f"CACHE >>> Erro no canal de invalidação: {e}")
+                self._stop.wait(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode()
+            origin, _, key = data.partition(":")
+            if origin != self._origin:
+                self.l1.delete(key)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        value = self.l2.get(key)
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        self.l1.set(key, value, self.l1_ttl)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self.l2.set(key, value, ttl)
+        self.l1.set(key, value, min(ttl, self.l1_ttl))
+        self._count("sets")
+        self._publish(key)
+
+    def delete(self, key: str) -> None:
+        self.l2.delete(key)
+        self.l1.delete(key)
+        self._count("deletes")
+        self._publish(key)
+
+    def clear(self) -> None:
+        self.l2.clear()
+        self.l1.clear()
+
+    def stats(self) -> dict:
+        data = super().stats()
+        data["l1"] = self.l1.stats()
+        data["l2"] = self.l2.stats()
+        data["evictions"] = data["l1"]["evictions"] + data["l2"]["evictions"]
+        return data
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+        self.l1.close()
+        self.l2.close()
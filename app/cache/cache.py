@@ -1,15 +1,33 @@
 # app/cache/cache.py
+import gzip
+import json
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+from pydantic import TypeAdapter
 from app.models.product.category import Category
 from app.models.company.delivery_config import DeliveryConfig
 from app.schemas.product.product import ProductResponse
 from app.cache.cache_config import DataCache
+from app.helpers.product.catalog import get_catalog_version_cached
+from app.services.pricing import PriceTable
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.company.company import Company
 from app.models.product.product import Product
+from app.configuration.settings import Configuration
 
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só servimos gzip
+    brotli = None
+
+configuration = Configuration()
 cache = DataCache()
+products_adapter = TypeAdapter(List[ProductResponse])
+
+# Produtos do snapshot já convertidos em modelos, por versão do catálogo (memória do processo)
+_catalog_products: Tuple[Optional[int], Dict[int, Product]] = (None, {})
 
 class CacheManager:
     _cache_key_prefix = "main_data_"
@@ -35,6 +53,12 @@ class CacheManager:
         self.cache.set(cache_key, data, ttl=900)
         logging.info(f"CACHE >>> Dados armazenados no cache com a chave: {cache_key}")
 
+    async def invalidate(self, key: str) -> None:
+        """Remove a chave do cache (em todos os workers quando o backend é compartilhado)"""
+        cache_key = self.get_cache_key(key)
+        self.cache.clear(cache_key)
+        logging.info(f"CACHE >>> Chave invalidada: {cache_key}")
+
     async def get_company_data(self, session: Session) -> dict:
         """Obtém dados da empresa, usando cache quando possível"""
         cache_key = "company_data"
@@ -64,54 +88,70 @@ class CacheManager:
         await self.cache_data(cache_key, company_data)
         return company_data
 
-    async def get_products_data(self, session: Session) -> dict:
-        """Obtém dados de produtos e categorias, usando cache apenas se nada foi alterado."""
+    async def get_catalog_version(self, session: AsyncSession) -> int:
+        """
+        Versão do catálogo memorizada por CATALOG_VERSION_CHECK_INTERVAL segundos,
+        para que requisições seguidas não consultem o banco.
+        """
+        return await get_catalog_version_cached(session, configuration.catalog_version_check_interval)
+
+    @staticmethod
+    def catalog_etag(version: int) -> str:
+        """ETag forte do catálogo, derivado apenas da versão."""
+        return f'"catalog-v{version}"'
+
+    async def get_products_snapshot(self, session: AsyncSession, version: Optional[int] = None) -> dict:
+        """
+        Snapshot do catálogo pronto para envio: JSON já serializado e as variantes gzip/brotli.
+        O cache vale enquanto a versão do catálogo não mudar.
+        """
         cache_key = "product_data"
         cached = await self.load_cached_data(cache_key)
-        
-        if cached:
-            # Busca os IDs e updated_at dos produtos no banco
-            db_products_info = session.exec(
-                select(Product.id, Product.is_active, Product.updated_at)
-                .where(Product.id.in_([p["id"] for p in cached["products"]]))
-            ).all()
-            
-            # Verifica se algum produto foi atualizado desde o cache
-            cache_is_valid = True
-            for db_prod in db_products_info:
-                cached_prod = next((p for p in cached["products"] if p["id"] == db_prod.id), None)
-                
-                # Se o produto não existe mais no cache ou foi atualizado, invalida o cache
-                if not cached_prod or cached_prod.get("updated_at") != db_prod.updated_at:
-                    cache_is_valid = False
-                    break
-            
-            # Se o cache ainda é válido, atualiza apenas o `is_active` e retorna
-            if cache_is_valid:
-                is_active_lookup = {prod.id: prod.is_active for prod in db_products_info}
-                for p in cached["products"]:
-                    p["is_active"] = is_active_lookup.get(p["id"], False)
-                return cached
-        
-        # Se o cache é inválido ou não existe, busca tudo do zero
-        products = session.exec(select(Product)).all()
-        produtos_disponiveis = [
-            ProductResponse.model_validate(product).model_dump()
-            for product in products
-        ]
+
+        # Lida antes dos dados: se houver escrita no meio, o snapshot fica com a versão antiga e é refeito
+        if version is None:
+            version = await self.get_catalog_version(session)
+        if cached and cached.get("version") == version and "prices" in cached:
+            return cached
+
+        # Se o cache é inválido ou não existe, busca tudo do zero (categoria carregada junto)
+        products = (await session.exec(select(Product).options(selectinload(Product.category)))).all()
+        body = products_adapter.dump_json(
+            [ProductResponse.model_validate(product) for product in products]
+        )
 
         categories = [
-            c.name for c in session.exec(select(Category).where(Category.is_active)).all()
+            c.name for c in (await session.exec(select(Category).where(Category.is_active))).all()
         ]
 
         data = {
-            "products": produtos_disponiveis,
-            "categories": categories
+            "version": version,
+            "etag": self.catalog_etag(version),
+            "body": body,
+            "gzip": gzip.compress(body, compresslevel=6),
+            "br": brotli.compress(body) if brotli else None,
+            "categories": categories,
+            # Tabela de preços montada com as mesmas linhas do snapshot (mesma versão)
+            "prices": PriceTable.from_products(products, version),
         }
 
         await self.cache_data(cache_key, data)
         return data
     
+    async def get_price_table(self, session: AsyncSession) -> PriceTable:
+        """Tabela de preços da versão atual do catálogo, sem consulta extra quando o snapshot está em cache."""
+        return (await self.get_products_snapshot(session))["prices"]
+    
+    async def get_catalog_products(self, session: AsyncSession) -> Dict[int, Product]:
+        """Produtos do catálogo por id, montados a partir do snapshot (sem consultar o banco)."""
+        global _catalog_products
+        snapshot = await self.get_products_snapshot(session)
+        version, products = _catalog_products
+        if version != snapshot["version"]:
+            products = {data["id"]: Product.model_validate(data) for data in json.loads(snapshot["body"])}
+            _catalog_products = (snapshot["version"], products)
+        return products
+    
     async def get_delivery_config_data(self, session: Session) -> dict:
         """Obtém dados de entrega, usando cache quando possível"""
         cache_key = "delivery_data"
@@ -1,42 +1,58 @@
 # app/utils/cache.py
 from typing import Dict, Any, Optional
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 
+from app.cache.backends import CacheBackend, LRUBackend, RedisBackend, TieredBackend
 from app.configuration.settings import Configuration
 
-Configuration()
+configuration = Configuration()
+
+def create_backend(kind: Optional[str] = None, redis_client=None) -> CacheBackend:
+    """Cria o backend de cache configurado em CACHE_BACKEND (memory, redis ou tiered)."""
+    kind = (kind or configuration.cache_backend).lower()
+
+    if kind == "redis":
+        return RedisBackend(client=redis_client, url=configuration.redis_url)
+
+    if kind == "tiered":
+        return TieredBackend(
+            l1=_create_lru(),
+            l2=RedisBackend(client=redis_client, url=configuration.redis_url),
+            l1_ttl=configuration.cache_l1_ttl,
+        )
+
+    if kind != "memory":
+        logging.warning(f"CACHE >>> Backend '{kind}' desconhecido, usando memória")
+    return _create_lru()
+
+def _create_lru() -> LRUBackend:
+    return LRUBackend(
+        max_entries=configuration.cache_max_entries,
+        max_bytes=configuration.cache_max_bytes,
+        sweep_interval=configuration.cache_sweep_interval,
+    )
 
 class DataCache:
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._expiry_times: Dict[str, datetime] = {}
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend or create_backend()
         self.default_ttl = timedelta(minutes=15)
+        logging.info(f"CACHE >>> Backend selecionado: {self.backend.name}")
 
     def set(self, key: str, data: Dict[str, Any], ttl: Optional[int] = None) -> None:
         """Armazena dados no cache com tempo de expiração em segundos."""
-        expiration = datetime.now() + timedelta(seconds=ttl) if ttl else datetime.now() + self.default_ttl
-        self._cache[key] = data
-        self._expiry_times[key] = expiration
+        self.backend.set(key, data, ttl or int(self.default_ttl.total_seconds()))
         logging.debug(f"Cache setado para key: {key}")
 
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         """Obtém dados do cache se existirem e não estiverem expirados."""
-        if key not in self._cache:
-            return None
-            
-        if datetime.now() > self._expiry_times.get(key, datetime.min):
-            del self._cache[key]
-            del self._expiry_times[key]
-            logging.debug(f"Cache expirado para key: {key}")
-            return None
-            
-        return self._cache[key]
+        return self.backend.get(key)
 
     def clear(self, key: str) -> None:
         """Remove dados do cache."""
-        if key in self._cache:
-            del self._cache[key]
-            del self._expiry_times[key]
-            logging.debug(f"Cache limpo para key: {key}")
+        self.backend.delete(key)
+        logging.debug(f"Cache limpo para key: {key}")
 
+    def stats(self) -> dict:
+        """Contadores de acertos, falhas e remoções do backend."""
+        return self.backend.stats()
@@ -40,6 +40,58 @@ class Configuration:
         self.db_dev_port = os.getenv("DB_DEV_PORT", "5432")
         self.db_dev_name = os.getenv("DB_DEV_NAME")
         
+        # Pool de conexões (um engine por processo)
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", 5))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+        self.db_pool_timeout = int(os.getenv("DB_POOL_TIMEOUT", 30))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 1800))
+        self.db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+        
+        # Cache (memory | redis | tiered)
+        self.cache_backend = os.getenv("CACHE_BACKEND", "memory").lower()
+        self.cache_max_entries = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+        self.cache_max_bytes = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        self.cache_sweep_interval = int(os.getenv("CACHE_SWEEP_INTERVAL", 60))
+        self.cache_l1_ttl = int(os.getenv("CACHE_L1_TTL", 30))
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.catalog_version_check_interval = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", 2))
+        self.promo_registry_refresh_interval = int(os.getenv("PROMO_REGISTRY_REFRESH_INTERVAL", 60))
+        
+        # Scheduler: leader (jobs só no processo que detém o lock) | local (todo processo) | off (worker separado)
+        # Com vários workers web o recomendado é off + python -m app.tasks.scheduler.worker: em leader
+        # cada worker mantém a sua thread de scheduler e disputa o lock a cada SCHEDULER_LEADER_INTERVAL
+        self.scheduler_mode = os.getenv("SCHEDULER_MODE", "leader").lower()
+        self.scheduler_leader_interval = int(os.getenv("SCHEDULER_LEADER_INTERVAL", 15))
+        
+        # Expiração de pagamentos no vencimento (heap em memória) e varredura de reconciliação, em minutos
+        self.payment_expiry_scheduler = os.getenv("PAYMENT_EXPIRY_SCHEDULER", "true").lower() == "true"
+        self.payment_reconcile_interval = int(os.getenv("PAYMENT_RECONCILE_INTERVAL", 10))
+        
+        # Webhooks do Mercado Pago: caixa de entrada no banco drenada por workers assíncronos
+        # (WEBHOOK_WORKERS=0 deixa a drenagem para os outros processos)
+        self.webhook_workers = int(os.getenv("WEBHOOK_WORKERS", 2))
+        self.webhook_batch_size = int(os.getenv("WEBHOOK_BATCH_SIZE", 50))
+        self.webhook_poll_interval = float(os.getenv("WEBHOOK_POLL_INTERVAL", 2))
+        self.webhook_max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 8))
+        self.webhook_event_retention_days = int(os.getenv("WEBHOOK_EVENT_RETENTION_DAYS", 7))
+        
+        # Jobs do scheduler: linhas por lote nos UPDATE/DELETE em massa
+        self.job_batch_size = int(os.getenv("JOB_BATCH_SIZE", 1000))
+        
+        # Store de carrinhos com gravação adiada (off | memory | redis)
+        self.cart_store = os.getenv("CART_STORE", "off").lower()
+        # Workers do uvicorn (mesma variável que ele lê); CART_STORE=memory só aceita 1
+        self.web_concurrency = int(os.getenv("WEB_CONCURRENCY", 1))
+        self.cart_store_flush_interval = float(os.getenv("CART_STORE_FLUSH_INTERVAL", 0.25))
+        self.cart_store_ttl = int(os.getenv("CART_STORE_TTL", 3600))
+        
+        # Websockets (fila por conexão; política: drop_oldest | drop_newest | disconnect)
+        self.ws_queue_size = int(os.getenv("WS_QUEUE_SIZE", 100))
+        self.ws_slow_consumer_policy = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest").lower()
+        self.ws_send_timeout = float(os.getenv("WS_SEND_TIMEOUT", 5))
+        # Intervalo dos comentários de keep-alive no stream SSE de pagamento (segundos)
+        self.sse_heartbeat_interval = float(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+        
         self.endpoint_url_r2 = os.getenv("ENDPOINT_CLOUDFLARE_R2")
         self.aws_access_key_id_aws = os.getenv("AWS_ACCESS_KEY_ID")
         self.aws_secret_access_key_aws = os.getenv("AWS_SECRET_ACCESS_KEY_ID")
@@ -48,6 +100,14 @@ class Configuration:
         
         self.mercado_pago_access_token_test = os.getenv("MERCADO_PAGO_ACCESS_TOKEN_TEST")
         self.mercado_pago_access_token_prod = os.getenv("MERCADO_PAGO_ACCESS_TOKEN_PROD")
+        self.mercado_pago_base_url = os.getenv("MERCADO_PAGO_BASE_URL", "https://api.mercadopago.com")
+        
+        # Cliente do gateway: mercadopago | fake (gateway em memória para testes e carga)
+        self.payment_gateway = os.getenv("PAYMENT_GATEWAY", "mercadopago").lower()
+        self.payment_gateway_timeout = float(os.getenv("PAYMENT_GATEWAY_TIMEOUT", 10))
+        self.payment_gateway_retries = int(os.getenv("PAYMENT_GATEWAY_RETRIES", 2))
+        self.payment_gateway_breaker_failures = int(os.getenv("PAYMENT_GATEWAY_BREAKER_FAILURES", 5))
+        self.payment_gateway_breaker_reset = float(os.getenv("PAYMENT_GATEWAY_BREAKER_RESET", 30))
         
         self.meta_url = os.getenv("META_URL")
         self.facebook_access_token = os.getenv("META_ACCESS_TOKEN")
@@ -0,0 +1,48 @@
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+# Cabeçalho com o cursor da próxima página (ausente na última página)
+CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """As colunas de data são gravadas em UTC sem fuso; converte filtros recebidos com fuso."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{to_naive_utc(created_at).isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+def keyset_page(statement, model, cursor: Optional[str], limit: int):
+    """
+    Ordena por (created_at, id) decrescente e continua a partir do cursor, sem OFFSET.
+    Busca um registro a mais para saber se existe próxima página.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+def split_page(rows: Sequence, limit: int, response: Response) -> list:
+    """Recorta a página e, se houver mais registros, publica o cursor no cabeçalho da resposta."""
+    rows = list(rows)
+    page = rows[:limit]
+    if len(rows) > limit:
+        last = page[-1]
+        response.headers[CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return page
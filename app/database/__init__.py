@@ -1,9 +1,9 @@
 # app/database/__init__.py
 
-from .connection import get_session
+from .connection import get_session, session_scope
 from .populate import populate_database
 
 def init_db():
-    """Inicializa o banco de dados e popula com dados iniciais."""
-    session = get_session()
-    populate_database(session)
+    """Aplica as migrações e popula o banco com dados iniciais (ver app/database/bootstrap.py)."""
+    from .bootstrap import bootstrap_database
+    bootstrap_database()
@@ -0,0 +1,58 @@
+# app/database/bootstrap.py
+
+import logging
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlmodel import Session
+
+from app.database.connection import get_engine
+from app.database.populate import populate_database
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+ALEMBIC_INI = ROOT_DIR / "alembic.ini"
+MIGRATIONS_DIR = ROOT_DIR / "migrations"
+
+# Revisão que corresponde ao esquema criado pelo antigo create_all
+BASELINE_REVISION = "0001_initial_schema"
+
+def get_alembic_config(connection=None) -> Config:
+    """Configuração do Alembic com caminhos absolutos; reutiliza a conexão informada."""
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def bootstrap_database() -> None:
+    """Aplica as migrações pendentes e popula os dados iniciais em uma única transação."""
+    engine = get_engine()
+
+    with engine.begin() as connection:
+        config = get_alembic_config(connection)
+
+        tables = inspect(connection).get_table_names()
+        if "alembic_version" not in tables and "tb_company" in tables:
+            # Banco criado antes das migrações: marca o esquema inicial como já aplicado
+            logging.info("BANCO DE DADOS >>> Esquema existente sem versão, marcando revisão inicial")
+            command.stamp(config, BASELINE_REVISION)
+
+        logging.info("BANCO DE DADOS >>> Aplicando migrações pendentes")
+        command.upgrade(config, "head")
+
+        # Seeds idempotentes na mesma transação das migrações
+        session = Session(bind=connection)
+        populate_database(session)
+        session.flush()
+        session.close()
+
+    logging.info("BANCO DE DADOS >>> Bootstrap concluído")
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    bootstrap_database()
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,197 @@
 # app/database/connection.py
 
 import logging
-from sqlmodel import create_engine, SQLModel, Session
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.configuration.settings import Configuration
 
 # Configuração global já carregada
 configuration = Configuration()
 
-def get_session():
-    """Cria e retorna a sessão para interação com o banco de dados."""
+# Engine e fábrica de sessões únicos por processo (criados sob demanda)
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_engine_lock = threading.Lock()
+
+# Engine assíncrono (asyncpg) para as rotas de maior tráfego
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+def get_database_url() -> str:
+    """Retorna a URL do banco de acordo com o ambiente."""
+    if configuration.environment == "development":
+        return configuration.connect_to_postgresql_dev()
+    return configuration.connect_to_postgresql()
+
+def get_async_database_url() -> str:
+    """Retorna a URL do banco usando o driver assíncrono asyncpg."""
+    url = make_url(get_database_url())
+    return url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+def get_engine() -> Engine:
+    """Retorna o engine do processo, criando-o (com pool) na primeira chamada."""
+    global _engine, _session_factory
+
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            try:
+                engine = create_engine(
+                    get_database_url(),
+                    echo=False,
+                    poolclass=QueuePool,
+                    pool_size=configuration.db_pool_size,
+                    max_overflow=configuration.db_max_overflow,
+                    pool_timeout=configuration.db_pool_timeout,
+                    pool_recycle=configuration.db_pool_recycle,
+                    pool_pre_ping=configuration.db_pool_pre_ping,
+                )
+
+                _session_factory = sessionmaker(bind=engine, class_=Session)
+                _engine = engine
+                logging.info(
+                    f"BANCO DE DADOS >>> Pool criado (size={configuration.db_pool_size}, "
+                    f"overflow={configuration.db_max_overflow}, recycle={configuration.db_pool_recycle}s)"
+                )
+            except Exception as e:
+                logging.error(f"Erro ao conectar ao banco de dados: {e}")
+                raise
+    return _engine
+
+def get_session_factory() -> sessionmaker:
+    """Retorna a fábrica de sessões ligada ao engine do processo."""
+    get_engine()
+    return _session_factory
+
+def get_session() -> Iterator[Session]:
+    """Dependência das rotas: abre uma sessão do pool e sempre a devolve ao final da requisição."""
+    session = get_session_factory()()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """Sessão para uso fora das rotas (jobs, scripts), devolvida ao pool ao sair do bloco."""
+    session = get_session_factory()()
     try:
-        if configuration.environment == "development":
-            db_url = configuration.connect_to_postgresql_dev()
-        else:
-            db_url = configuration.connect_to_postgresql()
-            
-        # Criação do engine para a conexão com o banco de dados
-        engine = create_engine(db_url, echo=False)
-
-        # Criando as tabelas no banco de dados (caso não existam)
-        SQLModel.metadata.create_all(bind=engine)
-
-        # Criação da sessão
-        session = Session(engine)
-        return session
-    except Exception as e:
-        logging.error(f"Erro ao conectar ao banco de dados: {e}")
+        yield session
+    except Exception:
+        session.rollback()
         raise
+    finally:
+        session.close()
+
+# Época usada pelo Postgres no formato binário de timestamp
+_PG_EPOCH = datetime(2000, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _encode_timestamp(value: datetime) -> tuple:
+    # As colunas são TIMESTAMP WITHOUT TIME ZONE, mas os modelos usam datetime.now(timezone.utc).
+    # O psycopg2 descarta o fuso ao gravar; aqui fazemos o mesmo convertendo para UTC "ingênuo".
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return ((value - _PG_EPOCH) // _MICROSECOND,)
+
+def _decode_timestamp(value: tuple) -> datetime:
+    return _PG_EPOCH + timedelta(microseconds=value[0])
+
+async def _register_timestamp_codec(connection) -> None:
+    await connection.set_type_codec(
+        "timestamp",
+        schema="pg_catalog",
+        encoder=_encode_timestamp,
+        decoder=_decode_timestamp,
+        format="tuple",
+    )
+
+def get_async_engine() -> AsyncEngine:
+    """Retorna o engine assíncrono do processo, criando-o na primeira chamada."""
+    global _async_engine, _async_session_factory
+
+    if _async_engine is not None:
+        return _async_engine
+
+    with _engine_lock:
+        if _async_engine is None:
+            engine = create_async_engine(
+                get_async_database_url(),
+                echo=False,
+                pool_size=configuration.db_pool_size,
+                max_overflow=configuration.db_max_overflow,
+                pool_timeout=configuration.db_pool_timeout,
+                pool_recycle=configuration.db_pool_recycle,
+                pool_pre_ping=configuration.db_pool_pre_ping,
+            )
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def _on_connect(dbapi_connection, connection_record):
+                dbapi_connection.run_async(_register_timestamp_codec)
+
+            # expire_on_commit=False: objetos continuam legíveis após o commit sem novo I/O
+            _async_session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            _async_engine = engine
+            logging.info("BANCO DE DADOS >>> Pool assíncrono (asyncpg) criado")
+    return _async_engine
+
+def get_async_session_factory() -> async_sessionmaker:
+    """Retorna a fábrica de sessões assíncronas do processo."""
+    get_async_engine()
+    return _async_session_factory
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Dependência assíncrona das rotas: a sessão é sempre fechada ao final da requisição."""
+    async with get_async_session_factory()() as session:
+        yield session
+
+def _pool_stats(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+def get_pool_status() -> dict:
+    """Estatísticas dos pools de conexões (síncrono e assíncrono) para monitoramento."""
+    status = {
+        "initialized": _engine is not None,
+        "max_overflow": configuration.db_max_overflow,
+        "timeout": configuration.db_pool_timeout,
+        "recycle": configuration.db_pool_recycle,
+        "pre_ping": configuration.db_pool_pre_ping,
+    }
+    if _engine is not None:
+        status.update(_pool_stats(_engine.pool))
+    if _async_engine is not None:
+        status["async"] = _pool_stats(_async_engine.sync_engine.pool)
+    return status
+
+def dispose_engine() -> None:
+    """Fecha todas as conexões do pool síncrono (ex.: ao encerrar o processo)."""
+    global _engine, _session_factory
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            _session_factory = None
+
+async def dispose_async_engine() -> None:
+    """Fecha todas as conexões do pool assíncrono."""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
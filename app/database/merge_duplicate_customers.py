@@ -0,0 +1,63 @@
+# app/database/merge_duplicate_customers.py
+
+import argparse
+import logging
+from sqlalchemy import text
+
+from app.database.connection import get_engine
+
+PREDICATE = "role = 'customer' AND phone IS NOT NULL AND deleted_at IS NULL"
+
+# Clientes duplicados pelo telefone: o mais antigo é mantido e recebe pedidos e endereços dos demais
+DUPLICATES = f"""
+    SELECT u.id AS duplicate_id, k.keep_id
+    FROM tb_user u
+    JOIN (
+        SELECT phone, min(id) AS keep_id FROM tb_user WHERE {PREDICATE} GROUP BY phone HAVING count(*) > 1
+    ) k ON k.phone = u.phone
+    WHERE u.role = 'customer' AND u.deleted_at IS NULL AND u.id <> k.keep_id
+"""
+
+REPORT = f"""
+    SELECT phone, array_agg(id ORDER BY id) AS ids
+    FROM tb_user WHERE {PREDICATE}
+    GROUP BY phone HAVING count(*) > 1
+    ORDER BY phone
+"""
+
+def merge_duplicate_customers(apply: bool = False) -> int:
+    """
+    Correção de dados que precede a migração 0005_customer_phone_unique: lista os clientes com
+    o mesmo telefone e, com `apply`, passa pedidos e endereços para o cadastro mais antigo e
+    marca os demais como excluídos. Retorna quantos telefones estavam duplicados.
+    """
+    with get_engine().begin() as connection:
+        groups = connection.execute(text(REPORT)).all()
+        for phone, ids in groups:
+            logging.info(f"CLIENTES >>> Telefone {phone}: cadastros {ids} (mantido {ids[0]})")
+        if not groups or not apply:
+            return len(groups)
+
+        orders = connection.execute(text(
+            f"UPDATE tb_order o SET user_id = d.keep_id FROM ({DUPLICATES}) d WHERE o.user_id = d.duplicate_id"
+        )).rowcount
+        addresses = connection.execute(text(
+            f"UPDATE tb_address a SET user_id = d.keep_id FROM ({DUPLICATES}) d WHERE a.user_id = d.duplicate_id"
+        )).rowcount
+        users = connection.execute(text(
+            f"UPDATE tb_user u SET deleted_at = now() at time zone 'utc' FROM ({DUPLICATES}) d WHERE u.id = d.duplicate_id"
+        )).rowcount
+        logging.info(f"CLIENTES >>> {users} cadastros unificados ({orders} pedidos, {addresses} endereços movidos)")
+    return len(groups)
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Unifica clientes cadastrados com o mesmo telefone")
+    parser.add_argument("--apply", action="store_true", help="grava a unificação (sem ela, só lista)")
+    args = parser.parse_args()
+    duplicated = merge_duplicate_customers(apply=args.apply)
+    if duplicated and not args.apply:
+        logging.info(f"CLIENTES >>> {duplicated} telefones duplicados; rode com --apply para unificar")
+
+if __name__ == "__main__":
+    main()
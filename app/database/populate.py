@@ -46,8 +46,7 @@ def populate_company(session: Session) -> Company:
     if not company:
         company = Company(**company_data)
         session.add(company)
-        session.commit()
-        session.refresh(company)
+        session.flush()
     return company
 
 def populate_delivery_config(session: Session):
@@ -66,8 +65,7 @@ def populate_delivery_config(session: Session):
 
     config = DeliveryConfig(**config_data.dict())
     session.add(config)
-    session.commit()
-    session.refresh(config)
+    session.flush()
 
 def populate_admin_user(session: Session, company_id: int):
     """Cria o usuário admin padrão, se ainda não existir."""
@@ -87,8 +85,7 @@ def populate_admin_user(session: Session, company_id: int):
         }
         user = User(**user_data)
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        session.flush()
         
         address_data = Address(
             user_id=user.id,
@@ -105,7 +102,7 @@ def populate_admin_user(session: Session, company_id: int):
         )
         
         session.add(address_data)
-        session.commit()
+        session.flush()
         
 def populate_employee_user(session: Session, company_id: int):
     """Cria um usuário funcionário padrão, se ainda não existir."""
@@ -125,8 +122,7 @@ def populate_employee_user(session: Session, company_id: int):
         }
         user = User(**user_data)
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        session.flush()
 
         address_data = Address(
             user_id=user.id,
@@ -143,7 +139,7 @@ def populate_employee_user(session: Session, company_id: int):
         )
 
         session.add(address_data)
-        session.commit()
+        session.flush()
 
 def populate_default_category(session: Session):
     """Cria a categoria padrão 'Geral' se ela ainda não existir."""
@@ -175,7 +171,7 @@ def populate_default_category(session: Session):
             ),
         ]
         session.add_all(categories)
-        session.commit()
+        session.flush()
 
 def populate_products(session: Session, company_id: int):
     """Popula produtos fictícios para testes."""
@@ -311,7 +307,7 @@ def populate_products(session: Session, company_id: int):
     ]
 
     session.add_all(produtos)
-    session.commit()
+    session.flush()
     
 def hash_password(password: str) -> str:
     """Gera um hash seguro para senha usando bcrypt."""
@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+from app.enums.cart import CartStatus
+from app.models.cart.cart_item import CartItem
+from app.models.product.product import Product
+from app.schemas.cart.cart_item import CartItemOperation
+from app.services.cart_store import StoredCart
+from app.services.pricing import PriceTable
+
+UPDATABLE_FIELDS = ("size", "selected_flavors", "observation", "options")
+
+def _float_options(line) -> Dict[str, float]:
+    return {name: float(price) for name, price in line.options.items()}
+
+def _add(state: StoredCart, operation: CartItemOperation, products: Dict[int, Product],
+         price_table: PriceTable, new_ids: Iterator[int], now: datetime) -> None:
+    product = products.get(operation.product_id)
+    if not product or not product.is_active:
+        raise ValueError("Produto inválido ou inativo")
+    if operation.size not in (product.prices_by_size or {}):
+        raise ValueError("Tamanho inválido para este produto")
+    quantity = operation.quantity or 1
+    line = price_table.price_line(product.id, operation.size, quantity, operation.options)
+
+    # Mesmo comportamento do POST unitário: item igual (produto + tamanho) soma a quantidade
+    item = next((
+        item for item in state.items.values()
+        if item["product_id"] == operation.product_id and item["size"] == operation.size
+    ), None)
+    if item:
+        item["quantity"] += quantity
+        item["unit_price"] = float(line.unit_price)
+        item["updated_at"] = now
+        return
+
+    for flavor in operation.selected_flavors or []:
+        if flavor['name'] not in (product.selected_flavors or []):
+            raise ValueError(f"Sabor '{flavor['name']}' inválido para este produto")
+    item = CartItem(
+        id=next(new_ids),
+        cart_id=state.cart["id"],
+        product_id=operation.product_id,
+        quantity=quantity,
+        size=operation.size,
+        selected_flavors=operation.selected_flavors,
+        unit_price=float(line.unit_price),
+        observation=operation.observation,
+        options=_float_options(line),
+        created_at=now,
+    ).model_dump()
+    state.items[item["id"]] = item
+    if state.cart["status"] in (CartStatus.ACTIVE, CartStatus.CLEARED):
+        state.cart["status"] = CartStatus.PROCESSING
+
+def _update(state: StoredCart, operation: CartItemOperation, price_table: PriceTable, now: datetime) -> None:
+    item = state.find_item(operation.item_id)
+    if not item:
+        raise ValueError("Item não encontrado no carrinho")
+    fields = dict(item)
+    if operation.quantity is not None:
+        fields["quantity"] = operation.quantity
+    for field in UPDATABLE_FIELDS:
+        value = getattr(operation, field)
+        if value is not None:
+            fields[field] = value
+
+    # Tamanho e opções podem ter mudado: o preço sai sempre do catálogo
+    line = price_table.price_line(fields["product_id"], fields["size"], fields["quantity"], fields["options"])
+    fields["unit_price"] = float(line.unit_price)
+    fields["options"] = _float_options(line)
+    fields["updated_at"] = now
+    state.items[operation.item_id] = fields
+
+def _remove(state: StoredCart, operation: CartItemOperation) -> None:
+    if not state.find_item(operation.item_id, operation.size):
+        raise ValueError("Item não encontrado no carrinho")
+    del state.items[operation.item_id]
+
+def apply_cart_operations(state: StoredCart, operations: List[CartItemOperation], products: Dict[int, Product],
+                          price_table: PriceTable, new_ids: Iterator[int]) -> List[dict]:
+    """
+    Aplica as operações em ordem sobre o estado do carrinho (itens como dicionários) e
+    recalcula os totais. Todas são validadas: retorna a lista de erros com o índice de cada
+    operação recusada; com qualquer erro o chamador descarta o estado inteiro.
+    """
+    now = datetime.now(timezone.utc)
+    errors = []
+    for index, operation in enumerate(operations):
+        try:
+            if operation.op == "add":
+                _add(state, operation, products, price_table, new_ids, now)
+            elif operation.op == "update":
+                _update(state, operation, price_table, now)
+            else:
+                _remove(state, operation)
+        except ValueError as e:  # inclui PricingError
+            errors.append({"index": index, "op": operation.op, "detail": str(e)})
+    state.recalculate()
+    return errors
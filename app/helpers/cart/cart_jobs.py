@@ -1,51 +1,61 @@
-
-
 from datetime import datetime, timedelta, timezone
 import logging
 
-from sqlmodel import select
+from sqlmodel import delete, select, update
 
 from app.configuration.settings import Configuration
 from app.enums.cart import CartStatus
 from app.models.cart.cart import Cart
-from app.database.connection import get_session
+from app.models.cart.cart_item import CartItem
+from app.database.connection import session_scope
+from app.helpers.cart.totals import check_cart_totals
+from app.services.cart_store import cart_store
+from app.tasks.scheduler.batch_jobs import run_in_chunks
 
 Configuration()
 
+def _cart_ids(status: CartStatus, threshold: datetime, batch_size: int):
+    # SKIP LOCKED: carrinhos sendo alterados agora ficam para a próxima execução
+    return (
+        select(Cart.id)
+        .where(Cart.status == status, Cart.updated_at < threshold)
+        .order_by(Cart.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
 def expire_old_carts():
     now = datetime.now(timezone.utc)
     threshold = now - timedelta(days=7)
 
-    with get_session() as session:
-        carts = session.exec(
-            select(Cart).where(
-                Cart.status == CartStatus.ACTIVE,
-                Cart.updated_at < threshold
-            )
-        ).all()
-
-        for cart in carts:
-            cart.status = CartStatus.EXPIRED
-            cart.updated_at = now
-
-        session.commit()
-        logging.info(f"JOB >>> Desativando {len(carts)} carrinhos inativos")
-        
-def delete_expired_carts():
-    now = datetime.now(timezone.utc)
-    threshold = now - timedelta(days=30)
-
-    with get_session() as session:
-        carts = session.exec(
-            select(Cart).where(
-                Cart.status == CartStatus.EXPIRED,
-                Cart.updated_at < threshold
-            )
-        ).all()
+    def expire_chunk(session, batch_size: int) -> int:
+        ids = _cart_ids(CartStatus.ACTIVE, threshold, batch_size).scalar_subquery()
+        expired = session.exec(
+            update(Cart)
+            .where(Cart.id.in_(ids))
+            .values(status=CartStatus.EXPIRED, updated_at=now, version=Cart.version + 1)
+            .returning(Cart.code)
+        ).scalars().all()
+        # A cópia do store ficaria ACTIVE; sai dele e é relida do banco
+        cart_store.evict_many(expired)
+        return len(expired)
 
-        for cart in carts:
-            session.delete(cart)
-
-        session.commit()
-        logging.info(f"JOB >>> Apagando {len(carts)} carrinhos expirados permanentemente")
+    run_in_chunks("expire_old_carts", expire_chunk)
 
+def delete_expired_carts():
+    threshold = datetime.now(timezone.utc) - timedelta(days=30)
+
+    def delete_chunk(session, batch_size: int) -> int:
+        ids = session.exec(_cart_ids(CartStatus.EXPIRED, threshold, batch_size)).all()
+        if ids:
+            session.exec(delete(CartItem).where(CartItem.cart_id.in_(ids)))
+            codes = session.exec(delete(Cart).where(Cart.id.in_(ids)).returning(Cart.code)).scalars().all()
+            cart_store.evict_many(codes)
+        return len(ids)
+
+    run_in_chunks("delete_expired_carts", delete_chunk)
+
+def verify_cart_totals():
+    with session_scope() as session:
+        mismatches = check_cart_totals(session, fix=True)
+        logging.info(f"JOB >>> Conferência dos totais dos carrinhos: {len(mismatches)} corrigidos")
@@ -0,0 +1,119 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Numeric, cast, func, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.enums.cart import CartStatus
+from app.models.cart.cart import Cart
+from app.models.cart.cart_item import CartItem
+
+# Carrinhos ainda editáveis: os concluídos/expirados não são mais conferidos
+OPEN_CART_STATUSES = (CartStatus.ACTIVE, CartStatus.PROCESSING, CartStatus.CLEARED)
+CHECK_BATCH_SIZE = 500
+
+def _money(expression):
+    return func.round(cast(expression, Numeric), 2)
+
+def line_amount(unit_price: float, quantity: int, options: Optional[Dict[str, float]]) -> float:
+    """Mesmo cálculo de CartItem.subtotal, a partir dos valores soltos."""
+    return round(quantity * ((unit_price or 0.0) + sum((options or {}).values())), 2)
+
+def discount_for(subtotal: float, percentage: Optional[float]) -> float:
+    return round(subtotal * (percentage or 0) / 100, 2) if percentage else 0.0
+
+async def adjust_cart_totals(session: AsyncSession, cart: Cart, amount: float, count: int) -> None:
+    """
+    Soma a variação de valor e de quantidade aos totais do carrinho no próprio banco
+    (sem ler e regravar), recalculando o desconto do cupom sobre o novo subtotal.
+    """
+    new_subtotal = Cart.subtotal + amount
+    statement = (
+        update(Cart)
+        .where(Cart.id == cart.id)
+        .values(
+            subtotal=_money(new_subtotal),
+            items_count=Cart.items_count + count,
+            discount=_money(new_subtotal * func.coalesce(Cart.promo_discount_percentage, 0) / 100),
+            version=Cart.version + 1,
+        )
+        .returning(Cart.subtotal, Cart.items_count, Cart.discount, Cart.version)
+    )
+    row = (await session.exec(statement)).one()
+    set_committed_value(cart, "subtotal", row.subtotal)
+    set_committed_value(cart, "items_count", row.items_count)
+    set_committed_value(cart, "discount", row.discount)
+    set_committed_value(cart, "version", row.version)
+
+def reset_cart_totals(cart: Cart) -> None:
+    cart.subtotal = 0.0
+    cart.items_count = 0
+    cart.discount = 0.0
+    # Incremento no próprio UPDATE: não depende da versão carregada na sessão
+    cart.version = Cart.version + 1
+
+def _expected_totals(items) -> Dict[int, Tuple[float, int]]:
+    totals: Dict[int, Tuple[float, int]] = {}
+    for cart_id, quantity, unit_price, options in items:
+        subtotal, count = totals.get(cart_id, (0.0, 0))
+        totals[cart_id] = (subtotal + line_amount(unit_price, quantity, options), count + quantity)
+    return totals
+
+def check_cart_totals(session: Session, fix: bool = False, batch_size: int = CHECK_BATCH_SIZE) -> List[dict]:
+    """
+    Confere os totais gravados dos carrinhos abertos com a soma dos itens, em lotes por id.
+    Retorna as divergências; com `fix` grava os valores corretos, condicionado à versão lida:
+    carrinho alterado durante a conferência fica como está (os totais dele já foram refeitos
+    por quem o alterou) e sai da lista.
+    """
+    mismatches = []
+    changed = 0
+    last_id = 0
+    while True:
+        carts = session.exec(
+            select(Cart)
+            .where(Cart.id > last_id, Cart.status.in_(OPEN_CART_STATUSES))
+            .order_by(Cart.id)
+            .limit(batch_size)
+        ).all()
+        if not carts:
+            break
+        last_id = carts[-1].id
+
+        items = session.exec(
+            select(CartItem.cart_id, CartItem.quantity, CartItem.unit_price, CartItem.options)
+            .where(CartItem.cart_id.in_([cart.id for cart in carts]))
+        ).all()
+        expected = _expected_totals(items)
+
+        for cart in carts:
+            subtotal, count = expected.get(cart.id, (0.0, 0))
+            subtotal = round(subtotal, 2)
+            discount = discount_for(subtotal, cart.promo_discount_percentage)
+            if (abs(cart.subtotal - subtotal) < 0.005 and cart.items_count == count
+                    and abs(cart.discount - discount) < 0.005):
+                continue
+            if fix:
+                updated = session.exec(
+                    update(Cart)
+                    .where(Cart.id == cart.id, Cart.version == cart.version)
+                    .values(subtotal=subtotal, items_count=count, discount=discount, version=Cart.version + 1)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if not updated:
+                    changed += 1
+                    continue
+            mismatches.append({
+                "cart_id": cart.id,
+                "stored": {"subtotal": cart.subtotal, "items_count": cart.items_count, "discount": cart.discount},
+                "expected": {"subtotal": subtotal, "items_count": count, "discount": discount},
+            })
+
+        if fix:
+            session.commit()
+
+    if mismatches:
+        logging.warning(f"CARRINHO >>> {len(mismatches)} carrinhos com totais divergentes{' (corrigidos)' if fix else ''}")
+    if changed:
+        logging.info(f"CARRINHO >>> {changed} carrinhos alterados durante a conferência; mantidos como estão")
+    return mismatches
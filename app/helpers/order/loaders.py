@@ -0,0 +1,29 @@
+from typing import Optional
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.order.order import Order
+from app.models.order.order_item import OrderItem
+
+# Limites de registros retornados pelas listagens de pedidos
+ORDER_LIST_DEFAULT_LIMIT = 100
+ORDER_LIST_MAX_LIMIT = 500
+
+def order_load_options(with_products: bool = False) -> list:
+    """
+    Opções de carregamento dos relacionamentos do pedido.
+    Endereço vem no mesmo SELECT (muitos-para-um) e itens em uma única consulta IN,
+    então o número de idas ao banco não depende da quantidade de pedidos.
+    """
+    items = selectinload(Order.items)
+    if with_products:
+        items = items.selectinload(OrderItem.product)
+    return [joinedload(Order.delivery_address), items]
+
+def select_orders(with_products: bool = False):
+    """SELECT de pedidos já com os relacionamentos carregados."""
+    return select(Order).options(*order_load_options(with_products))
+
+async def load_order(session: AsyncSession, *criteria, with_products: bool = False) -> Optional[Order]:
+    """Carrega um pedido (com itens e endereço) pelos critérios informados."""
+    return (await session.exec(select_orders(with_products).where(*criteria))).first()
@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+from typing import List
+from sqlalchemy import case, exists, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.enums.cart import CartStatus
+from app.models.cart.cart import Cart
+from app.models.order.order_item import OrderItem
+from app.models.user.address import Address
+from app.models.user.user import CUSTOMER_PHONE_PREDICATE, User
+from app.services.pricing import PricedLine
+
+ADDRESS_FIELDS = ("street", "number", "complement", "neighborhood", "city", "state", "zip_code", "reference")
+
+async def upsert_customer(session: AsyncSession, name: str, phone: str) -> User:
+    """
+    Cria o cliente pelo telefone ou atualiza o nome, em um único INSERT ... ON CONFLICT.
+
+    O telefone só é único entre clientes (role='customer', não excluídos): um funcionário ou
+    administrador com o mesmo número não é encontrado aqui e ganha um cadastro de cliente à parte.
+    """
+    now = datetime.now(timezone.utc)
+    statement = pg_insert(User).values(
+        name=name, phone=phone, role="customer", is_active=True, is_admin=False,
+        created_at=now, updated_at=now,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[User.phone],
+        index_where=CUSTOMER_PHONE_PREDICATE,
+        set_={
+            "name": statement.excluded.name,
+            "updated_at": case(
+                (User.name.is_distinct_from(statement.excluded.name), statement.excluded.updated_at),
+                else_=User.updated_at,
+            ),
+        },
+    ).returning(User)
+    result = await session.exec(
+        select(User).from_statement(statement).execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+async def upsert_delivery_address(session: AsyncSession, user_id: int, data) -> Address:
+    """
+    Atualiza o endereço de entrega mais antigo do cliente ou cria um novo, em um único comando
+    (CTE com UPDATE e INSERT condicionados à existência do endereço).
+    """
+    now = datetime.now(timezone.utc)
+    values = {field: getattr(data, field) for field in ADDRESS_FIELDS}
+
+    existing = (
+        select(Address.id)
+        .where(Address.user_id == user_id, Address.is_company_address == False)
+        .order_by(Address.id)
+        .limit(1)
+        .with_for_update()
+        .cte("existing")
+    )
+    updated = (
+        update(Address)
+        .where(Address.id == existing.c.id)
+        .values(**values, updated_at=now)
+        .returning(*Address.__table__.c)
+        .cte("updated")
+    )
+    new_values = {**values, "user_id": user_id, "is_company_address": False, "created_at": now}
+    inserted = (
+        insert(Address)
+        .from_select(
+            list(new_values),
+            select(*[literal(value, type_=Address.__table__.c[key].type).label(key) for key, value in new_values.items()])
+            .where(~exists(select(existing.c.id))),
+        )
+        .returning(*Address.__table__.c)
+        .cte("inserted")
+    )
+    statement = select(updated).union_all(select(inserted))
+    result = await session.exec(
+        select(Address).from_statement(statement).execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+async def insert_order_items(session: AsyncSession, order_id: int, items, lines: List[PricedLine]) -> List[OrderItem]:
+    """Insere todos os itens do pedido em um único INSERT ... RETURNING, com os preços calculados no servidor."""
+    if not items:
+        return []
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "order_id": order_id,
+            "product_id": item.product_id,
+            "quantity": line.quantity,
+            "unit_price": float(line.unit_price),
+            "total_price": float(line.total_price),
+            "size": item.size,
+            "observation": item.observation,
+            "selected_flavors": item.selected_flavors,
+            "options": {name: float(price) for name, price in line.options.items()},
+            "created_at": now,
+        }
+        for item, line in zip(items, lines)
+    ]
+    # VALUES com várias linhas: o insert em lote do ORM separaria as linhas por colunas nulas
+    result = await session.scalars(insert(OrderItem).values(rows).returning(OrderItem))
+    return sorted(result.all(), key=lambda item: item.id)
+
+async def complete_cart(session: AsyncSession, cart_code: str) -> None:
+    """Marca o carrinho como concluído sem carregá-lo."""
+    await session.exec(
+        update(Cart)
+        .where(Cart.code == cart_code)
+        .values(status=CartStatus.COMPLETED, updated_at=datetime.now(timezone.utc), version=Cart.version + 1)
+    )
@@ -0,0 +1,158 @@
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import case, func, literal_column, text
+from sqlmodel import or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.helpers.order.loaders import select_orders
+from app.models.order.order import Order
+
+SEARCH_DEFAULT_LIMIT = 20
+# Menos dígitos que isso casaria com quase qualquer telefone
+MIN_PHONE_DIGITS = 3
+# Mesmo limiar padrão do pg_trgm (pg_trgm.similarity_threshold)
+SIMILARITY_THRESHOLD = 0.3
+
+# Mesma expressão do índice criado na migração 0004; constantes literais para o planner reconhecer o índice
+phone_digits = func.regexp_replace(
+    Order.phone, literal_column(r"'\D'"), literal_column("''"), literal_column("'g'")
+)
+
+_trgm_available: Optional[bool] = None
+
+def normalize_digits(value: Optional[str]) -> str:
+    """Mantém apenas os dígitos (ex.: '(21) 98888-7777' -> '21988887777')."""
+    return re.sub(r"\D", "", value or "")
+
+def trigrams(value: str) -> Set[str]:
+    """Trigramas no mesmo estilo do pg_trgm: minúsculas e palavras completadas com espaços."""
+    grams = set()
+    for word in re.findall(r"\w+", value.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class OrderNgramIndex:
+    """
+    Índice de trigramas em memória para bancos sem pg_trgm (ex.: SQLite nos testes).
+    É alimentado de forma incremental pelos pedidos com id maior que o último indexado.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._docs: Dict[int, Tuple[str, str, str]] = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, order_id: int, customer_name: Optional[str], phone: Optional[str], code: Optional[str]) -> None:
+        name, digits, order_code = (customer_name or "").lower(), normalize_digits(phone), (code or "").lower()
+        with self._lock:
+            self._docs[order_id] = (name, digits, order_code)
+            for gram in trigrams(name) | trigrams(digits) | trigrams(order_code):
+                self._postings[gram].add(order_id)
+            self._last_id = max(self._last_id, order_id)
+
+    async def refresh(self, session: AsyncSession) -> None:
+        rows = (await session.exec(
+            select(Order.id, Order.customer_name, Order.phone, Order.code)
+            .where(Order.id > self._last_id)
+            .order_by(Order.id)
+        )).all()
+        for row in rows:
+            self.add(row.id, row.customer_name, row.phone, row.code)
+
+    def search(self, query: str, limit: int) -> List[int]:
+        term = query.strip().lower()
+        digits = normalize_digits(term)
+        term_grams = trigrams(term)
+        digit_grams = trigrams(digits) if len(digits) >= MIN_PHONE_DIGITS else set()
+
+        with self._lock:
+            candidates = set()
+            for gram in term_grams | digit_grams:
+                candidates |= self._postings.get(gram, set())
+
+            scored = []
+            for order_id in candidates:
+                name, phone, code = self._docs[order_id]
+                score = max(
+                    similarity(term_grams, trigrams(name)),
+                    similarity(term_grams, trigrams(code)),
+                    similarity(digit_grams, trigrams(phone)),
+                )
+                # Correspondência exata de trecho sempre entra e fica à frente das aproximadas
+                if term in name or code.startswith(term) or (digit_grams and digits in phone):
+                    score += 1
+                if score >= SIMILARITY_THRESHOLD:
+                    scored.append((score, order_id))
+
+        scored.sort(reverse=True)
+        return [order_id for _, order_id in scored[:limit]]
+
+memory_index = OrderNgramIndex()
+
+async def _has_trgm(session: AsyncSession) -> bool:
+    global _trgm_available
+    if _trgm_available is None:
+        result = await session.exec(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+        _trgm_available = result.first() is not None
+        if not _trgm_available:
+            logging.warning("BUSCA >>> Extensão pg_trgm ausente; busca de pedidos sem similaridade")
+    return _trgm_available
+
+async def _search_postgres(session: AsyncSession, query: str, limit: int) -> List[Order]:
+    term = query.strip()
+    digits = normalize_digits(term)
+
+    conditions = [
+        Order.customer_name.icontains(term, autoescape=True),
+        Order.code.istartswith(term, autoescape=True),
+    ]
+    if len(digits) >= MIN_PHONE_DIGITS:
+        conditions.append(phone_digits.contains(digits))
+
+    if await _has_trgm(session):
+        # Operador % do pg_trgm: tolera erros de digitação no nome
+        conditions.append(Order.customer_name.op("%")(term))
+        rank = func.greatest(
+            func.similarity(Order.customer_name, term),
+            func.similarity(Order.code, term),
+            func.similarity(phone_digits, digits or term),
+        )
+    else:
+        rank = case(
+            (Order.code == term, 3),
+            (Order.customer_name.istartswith(term, autoescape=True), 2),
+            else_=1,
+        )
+
+    statement = (
+        select_orders()
+        .where(or_(*conditions))
+        .order_by(rank.desc(), Order.created_at.desc(), Order.id.desc())
+        .limit(limit)
+    )
+    return (await session.exec(statement)).all()
+
+async def find_orders(session: AsyncSession, query: str, limit: int = SEARCH_DEFAULT_LIMIT) -> List[Order]:
+    """
+    Busca pedidos por nome do cliente, telefone (só dígitos) ou código, ordenados por relevância.
+    No Postgres usa os índices de trigramas; nos demais bancos, o índice em memória.
+    """
+    if session.sync_session.get_bind().dialect.name == "postgresql":
+        return await _search_postgres(session, query, limit)
+
+    await memory_index.refresh(session)
+    ids = memory_index.search(query, limit)
+    if not ids:
+        return []
+    orders = (await session.exec(select_orders().where(Order.id.in_(ids)))).all()
+    position = {order_id: i for i, order_id in enumerate(ids)}
+    return sorted(orders, key=lambda order: position[order.id])
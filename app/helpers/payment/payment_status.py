@@ -0,0 +1,22 @@
+from typing import Optional, Tuple
+from sqlalchemy import and_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.order.order import Order
+from app.models.payment.payment import Payment
+
+async def latest_pix_payment(session: AsyncSession, order_code: str) -> Tuple[bool, Optional[Payment]]:
+    """(pedido existe, último pagamento PIX do pedido) numa única consulta."""
+    row = (await session.exec(
+        select(Order.id, Payment)
+        .outerjoin(Payment, and_(Payment.order_id == Order.id, Payment.method == "pix"))
+        .where(Order.code == order_code)
+        .order_by(Payment.created_at.desc().nulls_last())
+        .limit(1)
+    )).first()
+    if row is None:
+        return False, None
+    return True, row[1]
+
+async def payment_by_transaction_code(session: AsyncSession, transaction_code: str) -> Optional[Payment]:
+    return (await session.exec(select(Payment).where(Payment.transaction_code == transaction_code))).first()
@@ -1,38 +1,43 @@
 from datetime import datetime, timezone
 import logging
-from sqlmodel import select
+from sqlmodel import select, update
 from app.configuration.settings import Configuration
 from app.enums.payment_status import PaymentStatus
+from app.models.order.order import Order
 from app.models.payment.payment import Payment
-from app.database.connection import get_session
+from app.services.payment_events import notify_payment_status
+from app.tasks.scheduler.batch_jobs import run_in_chunks
 
 Configuration()
 
 def cancel_expired_payments():
-    with get_session() as session:
-        now = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
 
-        expired_payments = session.exec(
-            select(Payment).where(
+    def cancel_chunk(session, batch_size: int) -> int:
+        ids = (
+            select(Payment.id)
+            .where(
                 Payment.status == PaymentStatus.PENDING,
                 Payment.expires_at.is_not(None),
                 Payment.expires_at < now
             )
+            .order_by(Payment.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        rows = session.exec(
+            update(Payment)
+            .where(Payment.id.in_(ids), Payment.order_id == Order.id)
+            .values(status=PaymentStatus.CANCELED, qr_code_base64=None, updated_at=now)
+            .returning(Payment.id, Payment.transaction_code, Order.code)
         ).all()
+        if rows:
+            logging.debug(f"PAGAMENTO >>> Pagamentos cancelados por expiração: {[row.id for row in rows]}")
+        # Entregue aos inscritos pelos processos web (LISTEN) quando o lote for confirmado
+        notify_payment_status(session, [
+            (transaction_code, PaymentStatus.CANCELED.value, order_code) for _, transaction_code, order_code in rows
+        ])
+        return len(rows)
 
-        for payment in expired_payments:
-            # Se expires_at não tem tzinfo, coloca UTC
-            expires_at = payment.expires_at
-            if expires_at.tzinfo is None:
-                expires_at = expires_at.replace(tzinfo=timezone.utc)
-            
-            time_diff = now - expires_at
-
-            payment.status = PaymentStatus.CANCELED
-            payment.qr_code_base64 = None
-            payment.updated_at = now
-            session.add(payment)
-            logging.info(f"PAGAMENTO >>> Pagamento {payment.id} cancelado por expiração. Tempo desde expiração: {time_diff.total_seconds()} segundos.")
-
-        session.commit() 
-        logging.info(f"PAGAMENTO >>> Cancelamento de {len(expired_payments)} pagamentos expirados concluído.")
\ No newline at end of file
+    run_in_chunks("cancel_expired_payments", cancel_chunk)
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+from sqlmodel import delete, select
+from app.configuration.settings import Configuration
+from app.models.payment.webhook_event import PaymentWebhookEvent
+from app.tasks.scheduler.batch_jobs import run_in_chunks
+
+configuration = Configuration()
+
+def purge_processed_webhook_events():
+    cutoff = datetime.now(timezone.utc) - timedelta(days=configuration.webhook_event_retention_days)
+
+    def purge_chunk(session, batch_size: int) -> int:
+        ids = (
+            select(PaymentWebhookEvent.id)
+            .where(PaymentWebhookEvent.processed_at < cutoff)
+            .order_by(PaymentWebhookEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return len(session.exec(
+            delete(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.id.in_(ids))
+            .returning(PaymentWebhookEvent.id)
+        ).scalars().all())
+
+    run_in_chunks("purge_processed_webhook_events", purge_chunk)
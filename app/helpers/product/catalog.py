@@ -0,0 +1,50 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import event
+from sqlmodel import Session, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.product.catalog_version import CatalogVersion
+
+CATALOG_VERSION_ID = 1
+
+# Última versão lida pelo processo e o instante da leitura
+_memo_version: Optional[int] = None
+_memo_checked_at = 0.0
+
+def forget_catalog_version(*_args) -> None:
+    """Descarta a versão memorizada; a próxima leitura consulta o banco."""
+    global _memo_version
+    _memo_version = None
+
+def bump_catalog_version(session: Session) -> None:
+    """
+    Incrementa a versão do catálogo na transação corrente.
+    Deve ser chamada junto de qualquer escrita em produtos, categorias ou promoções,
+    antes do commit, para que o cache perceba a alteração.
+    """
+    session.exec(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == CATALOG_VERSION_ID)
+        .values(version=CatalogVersion.version + 1, updated_at=datetime.now(timezone.utc))
+    )
+    # Neste processo a mudança fica visível logo após o commit, sem esperar o intervalo da memória
+    event.listen(session, "after_commit", forget_catalog_version, once=True)
+
+async def get_catalog_version(session: AsyncSession) -> int:
+    """Versão atual do catálogo (0 se a tabela ainda não foi inicializada)."""
+    result = await session.exec(
+        select(CatalogVersion.version).where(CatalogVersion.id == CATALOG_VERSION_ID)
+    )
+    return result.first() or 0
+
+async def get_catalog_version_cached(session: AsyncSession, max_age: float) -> int:
+    """Versão do catálogo memorizada por max_age segundos, evitando uma consulta por requisição."""
+    global _memo_version, _memo_checked_at
+    now = time.monotonic()
+    if _memo_version is not None and now - _memo_checked_at < max_age:
+        return _memo_version
+
+    _memo_version = await get_catalog_version(session)
+    _memo_checked_at = now
+    return _memo_version
@@ -1,26 +1,47 @@
 from datetime import datetime, timezone
-import logging
-from sqlmodel import select
+from sqlalchemy import case, func, null
+from sqlmodel import select, update
 from app.configuration.settings import Configuration
 from app.models.product.product import Product
-from app.database.connection import get_session
+from app.helpers.product.catalog import bump_catalog_version
+from app.tasks.scheduler.batch_jobs import run_in_chunks
 
 Configuration()
 
 def clear_expired_promotions():
     now = datetime.now(timezone.utc)
-    
-    with get_session() as session:
-        statement = select(Product).where(Product.promotion_end_at < now)
-        products = session.exec(statement).all()
 
-        for product in products:
-            product.promotion_discount_percentage = None
-            product.promotion_start_at = None
-            product.promotion_end_at = None
-            product.updated_at = now
-            session.add(product)
+    def clear_chunk(session, batch_size: int) -> int:
+        ids = (
+            select(Product.id)
+            .where(Product.promotion_end_at < now)
+            .order_by(Product.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        cleared = session.exec(
+            update(Product)
+            .where(Product.id.in_(ids))
+            .values(
+                # Mesmo fim de clear_product_promotion: volta o preço cheio e desliga a promoção
+                # (old_prices_by_size pode ser JSON null em produtos antigos)
+                prices_by_size=case(
+                    (func.json_typeof(Product.old_prices_by_size) == "object", Product.old_prices_by_size),
+                    else_=Product.prices_by_size,
+                ),
+                old_prices_by_size=null(),
+                is_promotion=False,
+                promotion_discount_percentage=None,
+                promotion_start_at=None,
+                promotion_end_at=None,
+                updated_at=now,
+            )
+            .returning(Product.id)
+        ).scalars().all()
+        if cleared:
+            # Mesma transação do lote: o cache do catálogo só é invalidado com a alteração gravada
+            bump_catalog_version(session)
+        return len(cleared)
 
-        session.commit()
-
-        logging.info(f"PROMOÇÃO >>> Limpeza de promoções expiradas concluída. {len(products)} produtos atualizados.")
+    run_in_chunks("clear_expired_promotions", clear_chunk)
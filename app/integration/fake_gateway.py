@@ -0,0 +1,80 @@
+# app/integration/fake_gateway.py
+import asyncio
+import itertools
+import json
+import random
+from typing import Dict, Optional
+import httpx
+
+class FakeMercadoPago:
+    """
+    Gateway falso em memória com os endpoints de pagamento usados pela aplicação, servido por
+    um httpx.MockTransport (nada sai do processo). Para desenvolvimento, testes de carga e
+    simulação de falhas: `latency` (segundos) e `failure_rate` (fração de respostas 503).
+    PIX fica "pending" até `approve`; cartão é aprovado na criação.
+
+    Com PAYMENT_GATEWAY=fake a instância usada pela aplicação é `payment_gateway.fake`. Para
+    aprovar uma cobrança PIX: `payment_gateway.fake.approve(transaction_code)` e depois o
+    webhook, como o Mercado Pago faria (POST /payment/webhook com
+    {"type": "payment", "data": {"id": transaction_code}}).
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.payments: Dict[str, dict] = {}
+        self._idempotency: Dict[str, dict] = {}
+        self._ids = itertools.count(10_000_000_001)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def approve(self, payment_id) -> Optional[dict]:
+        payment = self.payments.get(str(payment_id))
+        if payment:
+            payment["status"] = "approved"
+        return payment
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return httpx.Response(503, json={"message": "service unavailable"})
+
+        path = request.url.path.rstrip("/")
+        if request.method == "POST" and path == "/v1/payments":
+            return self._create(request)
+        if request.method == "GET" and path.startswith("/v1/payments/"):
+            payment = self.payments.get(path.rsplit("/", 1)[1])
+            if payment is None:
+                return httpx.Response(404, json={"message": "Payment not found", "status": 404})
+            return httpx.Response(200, json=payment)
+        return httpx.Response(404, json={"message": "not found"})
+
+    def _create(self, request: httpx.Request) -> httpx.Response:
+        key = request.headers.get("X-Idempotency-Key")
+        if key and key in self._idempotency:
+            return httpx.Response(201, json=self._idempotency[key])
+
+        body = json.loads(request.content or b"{}")
+        payment_id = next(self._ids)
+        is_pix = body.get("payment_method_id") == "pix"
+        payment = {
+            "id": payment_id,
+            "status": "pending" if is_pix else "approved",
+            "status_detail": "pending_waiting_transfer" if is_pix else "accredited",
+            "transaction_amount": body.get("transaction_amount"),
+            "description": body.get("description"),
+            "payment_method_id": body.get("payment_method_id"),
+        }
+        if is_pix:
+            payment["point_of_interaction"] = {
+                "transaction_data": {
+                    "qr_code": f"00020126FAKEPIX{payment_id}",
+                    "qr_code_base64": "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=",
+                }
+            }
+        self.payments[str(payment_id)] = payment
+        if key:
+            self._idempotency[key] = payment
+        return httpx.Response(201, json=payment)
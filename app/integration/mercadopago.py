@@ -1,9 +1,182 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from typing import Optional
+import httpx
 from app.configuration.settings import Configuration
-import mercadopago
 
 configuration = Configuration()
 
-if configuration.environment == "production":
-    sdk = mercadopago.SDK(configuration.mercado_pago_access_token_prod)
-else:
-    sdk = mercadopago.SDK(configuration.mercado_pago_access_token_test)
\ No newline at end of file
+# Respostas que valem nova tentativa (com a mesma chave de idempotência)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class GatewayError(Exception):
+    """Falha de comunicação com o gateway depois das novas tentativas."""
+
+class CircuitOpenError(GatewayError):
+    """Circuito aberto: o gateway falhou seguidamente e as chamadas são recusadas sem sair do processo."""
+
+class CircuitBreaker:
+    """
+    Abre após `failure_threshold` falhas seguidas; depois de `reset_timeout` segundos deixa uma
+    única chamada de teste passar (meio-aberto) e fecha de novo se ela funcionar. Enquanto o
+    teste não termina, as demais chamadas são recusadas como se o circuito estivesse aberto.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # Só um event loop usa o breaker e before_call não suspende: a flag basta como lock
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Recusa a chamada com o circuito aberto; retorna True se ela é a chamada de teste."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self.probing):
+            raise CircuitOpenError("Gateway de pagamento indisponível no momento")
+        if state == "half_open":
+            self.probing = True
+            return True
+        return False
+
+    def end_probe(self) -> None:
+        """Libera a vaga de teste mesmo quando a chamada termina por cancelamento ou erro inesperado."""
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        # Com o circuito já aberto, a falha é da chamada de teste (meio-aberto): reabre
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logging.warning(f"MERCADO PAGO >>> Circuito aberto após {self.failures} falhas seguidas")
+            self.opened_at = time.monotonic()
+
+class MercadoPagoClient:
+    """
+    Cliente assíncrono da API de pagamentos do Mercado Pago sobre um httpx.AsyncClient com pool.
+    Os métodos devolvem o mesmo formato do SDK ({"status": <http>, "response": <json>}).
+    """
+
+    def __init__(self, access_token: Optional[str], base_url: str, timeout: float = 10.0, retries: int = 2,
+                 backoff: float = 0.3, breaker: Optional[CircuitBreaker] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.access_token = access_token
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        # Com PAYMENT_GATEWAY=fake: o gateway em memória (FakeMercadoPago) por trás do transport
+        self.fake = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    @classmethod
+    def from_configuration(cls) -> "MercadoPagoClient":
+        token = (
+            configuration.mercado_pago_access_token_prod
+            if configuration.environment == "production"
+            else configuration.mercado_pago_access_token_test
+        )
+        fake = transport = None
+        if configuration.payment_gateway == "fake":
+            from app.integration.fake_gateway import FakeMercadoPago
+            fake = FakeMercadoPago()
+            transport = fake.transport()
+            logging.warning("MERCADO PAGO >>> Usando o gateway falso (PAYMENT_GATEWAY=fake)")
+        client = cls(
+            access_token=token,
+            base_url=configuration.mercado_pago_base_url,
+            timeout=configuration.payment_gateway_timeout,
+            retries=configuration.payment_gateway_retries,
+            breaker=CircuitBreaker(
+                configuration.payment_gateway_breaker_failures, configuration.payment_gateway_breaker_reset
+            ),
+            transport=transport,
+        )
+        client.fake = fake
+        return client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Criado sob demanda dentro do event loop da aplicação e reaproveitado entre requisições
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def create_payment(self, body: dict, idempotency_key: Optional[str] = None) -> dict:
+        """Cria o pagamento; a chave de idempotência é a mesma em todas as tentativas."""
+        headers = {"X-Idempotency-Key": idempotency_key or str(uuid.uuid4())}
+        return await self._request("POST", "/v1/payments", json=body, headers=headers)
+
+    async def get_payment(self, payment_id) -> dict:
+        return await self._request("GET", f"/v1/payments/{payment_id}")
+
+    def _delay(self, attempt: int) -> float:
+        # Backoff exponencial com jitter completo
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        try:
+            probe = self.breaker.before_call()
+        except CircuitOpenError:
+            self.stats["rejected"] += 1
+            raise
+
+        try:
+            for attempt in range(self.retries + 1):
+                self.stats["requests"] += 1
+                try:
+                    response = await self.client.request(method, path, **kwargs)
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code not in RETRY_STATUS:
+                        self.breaker.record_success()
+                        return {"status": response.status_code, "response": response.json() if response.content else None}
+                    error = f"HTTP {response.status_code}"
+
+                if attempt < self.retries:
+                    self.stats["retries"] += 1
+                    logging.warning(f"MERCADO PAGO >>> {method} {path} falhou ({error}); nova tentativa {attempt + 1}")
+                    await asyncio.sleep(self._delay(attempt))
+
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            raise GatewayError(f"Falha ao chamar o Mercado Pago ({method} {path}): {error}")
+        finally:
+            if probe:
+                self.breaker.end_probe()
+
+    def get_stats(self) -> dict:
+        return {"circuit": self.breaker.state, **self.stats}
+
+payment_gateway = MercadoPagoClient.from_configuration()
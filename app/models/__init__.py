@@ -4,6 +4,7 @@ from .company.company import Company
 from .user.user import User
 from .product.product import Product
 from .product.category import Category
+from .product.catalog_version import CatalogVersion
 from .order.order import Order
 from .order.order_item import OrderItem
 from .supply.supply import Supply
@@ -12,5 +13,6 @@ from .user.address import Address
 from .cart.cart import Cart
 from .cart.cart_item import CartItem
 from .payment.payment import Payment
+from .payment.webhook_event import PaymentWebhookEvent
 from .chat.chat import Chat
 from .company.promocode import PromoCode
@@ -1,6 +1,7 @@
 from typing import Optional, List
 from datetime import datetime, timezone
 from app.enums.cart import CartStatus
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 import uuid
 
@@ -19,6 +20,15 @@ def generate_cart_code() -> str:
 
 class Cart(SQLModel, table=True):
     __tablename__ = "tb_cart"
+    __table_args__ = (
+        # Paginação por cursor (created_at, id)
+        Index("ix_tb_cart_created_at_id", "created_at", "id"),
+        # Jobs de expiração e limpeza (status + updated_at); carrinhos concluídos ficam de fora
+        Index(
+            "ix_tb_cart_status_updated_at", "status", "updated_at",
+            postgresql_where=text("status IN ('ACTIVE', 'EXPIRED')"),
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     code: str = Field(default_factory=generate_cart_code, index=True, unique=True)
@@ -30,8 +40,12 @@ class Cart(SQLModel, table=True):
     
     promo_code: Optional[str] = Field(default=None)
     promo_discount_percentage: Optional[float] = Field(default=None)
-    promo_discount_value: Optional[float] = Field(default=None)
     promo_applied_at: Optional[datetime] = Field(default=None)
+
+    # Totais mantidos a cada alteração de item (app/helpers/cart/totals.py); ler não percorre os itens
+    subtotal: float = Field(default=0.0)
+    items_count: int = Field(default=0)
+    discount: float = Field(default=0.0)
         
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = None
@@ -39,17 +53,23 @@ class Cart(SQLModel, table=True):
     
     delivery_fee: Optional[float] = None
     delivery_neighborhood: Optional[str] = None
+
+    # Incrementada a cada escrita; o store de carrinhos só grava se ela não mudou desde a leitura
+    version: int = Field(default=0)
     
     
     @property
     def total(self) -> float:
-        return sum(item.subtotal for item in self.items or [])
+        return self.subtotal
     
     @property
     def total_with_discount(self) -> float:
-        discount = self.promo_discount_value or 0
-        return max(self.total - discount, 0)
+        return max(self.subtotal - self.discount, 0)
 
     @property
     def total_items(self) -> int:
-        return sum(item.quantity for item in self.items or [])
+        return self.items_count
+
+    @property
+    def promo_discount_value(self) -> float:
+        return self.discount
@@ -11,7 +11,7 @@ class CartItem(SQLModel, table=True):
     __tablename__ = "tb_cart_item"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    cart_id: int = Field(foreign_key="tb_cart.id")
+    cart_id: int = Field(foreign_key="tb_cart.id", index=True)
     product_id: int = Field(foreign_key="tb_product.id")
     size: Optional[str] = Field(default=None, index=True)
     
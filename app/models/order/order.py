@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 from typing import Optional, List, TYPE_CHECKING
 import uuid
 from sqlmodel import Field, Relationship, SQLModel
-from sqlalchemy import Column, Enum
+from sqlalchemy import Column, Enum, Index
 
 from app.enums.order_status import OrderStatus
 from app.enums.payment_status import PaymentStatus
@@ -22,6 +22,10 @@ def generate_order_code() -> str:
 
 class Order(SQLModel, table=True):
     __tablename__ = "tb_order"
+    __table_args__ = (
+        # Paginação por cursor (created_at, id)
+        Index("ix_tb_order_created_at_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
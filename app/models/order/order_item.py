@@ -12,7 +12,7 @@ class OrderItem(SQLModel, table=True):
     __tablename__ = "tb_order_item"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="tb_order.id")
+    order_id: int = Field(foreign_key="tb_order.id", index=True)
     product_id: int = Field(foreign_key="tb_product.id")
     quantity: int = Field(default=1)
     unit_price: float = Field(default=0.0)
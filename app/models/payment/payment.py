@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 from typing import Optional
-from sqlalchemy import Column, Enum
+from sqlalchemy import Column, Enum, Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 from typing import TYPE_CHECKING
@@ -12,12 +12,19 @@ if TYPE_CHECKING:
 
 class Payment(SQLModel, table=True):
     __tablename__ = "tb_payment"
+    __table_args__ = (
+        # Job de cancelamento: só os pendentes com expiração entram no índice
+        Index(
+            "ix_tb_payment_pending_expires_at", "expires_at",
+            postgresql_where=text("status = 'PENDING' AND expires_at IS NOT NULL"),
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="tb_order.id")
+    order_id: int = Field(foreign_key="tb_order.id", index=True)
     method: str = Field(default="pix")
     amount: float = Field(default=0.0)
-    transaction_code: Optional[str] = Field(default=None)
+    transaction_code: Optional[str] = Field(default=None, index=True)
     
     status: PaymentStatus = Field(default=PaymentStatus.PENDING, sa_column=Column(Enum(PaymentStatus), nullable=False))
     
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import Column, Index, JSON, text
+from sqlmodel import Field, SQLModel
+
+class PaymentWebhookEvent(SQLModel, table=True):
+    """
+    Caixa de entrada dos webhooks do Mercado Pago. Há no máximo uma linha não processada por
+    pagamento: notificações repetidas do mesmo `data.id` são somadas a ela (`events`).
+    """
+    __tablename__ = "tb_payment_webhook_event"
+    __table_args__ = (
+        # Deduplicação na entrada: ON CONFLICT sobre os não processados
+        Index(
+            "ux_tb_payment_webhook_event_pending", "mp_payment_id", unique=True,
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+        # Fila dos workers
+        Index(
+            "ix_tb_payment_webhook_event_next_attempt_at", "next_attempt_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    mp_payment_id: str = Field(max_length=64)
+    action: Optional[str] = Field(default=None)
+    payload: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    events: int = Field(default=1)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None)
+
+    received_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    next_attempt_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    processed_at: Optional[datetime] = Field(default=None, index=True)
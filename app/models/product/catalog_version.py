@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+class CatalogVersion(SQLModel, table=True):
+    """Linha única com a versão do catálogo, incrementada a cada alteração de produtos, categorias ou promoções."""
+    __tablename__ = "tb_catalog_version"
+
+    id: Optional[int] = Field(default=1, primary_key=True)
+    version: int = Field(default=1)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
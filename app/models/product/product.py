@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import Optional, List, Dict
 from sqlmodel import Field, Relationship, SQLModel
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON, text
 from pydantic import validator
 
 from typing import TYPE_CHECKING
@@ -13,6 +13,13 @@ if TYPE_CHECKING:
 
 class Product(SQLModel, table=True):
     __tablename__ = "tb_product"
+    __table_args__ = (
+        # Limpeza de promoções expiradas
+        Index(
+            "ix_tb_product_promotion_end_at", "promotion_end_at",
+            postgresql_where=text("promotion_end_at IS NOT NULL"),
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from typing import List, Optional, TYPE_CHECKING
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -7,15 +8,27 @@ if TYPE_CHECKING:
     from app.models.user.address import Address
     from app.models.order.order import Order
 
+# Predicado do índice único de telefone dos clientes
+CUSTOMER_PHONE_PREDICATE = text("role = 'customer' AND phone IS NOT NULL AND deleted_at IS NULL")
+
 class User(SQLModel, table=True):
     __tablename__ = "tb_user"
+    __table_args__ = (
+        # Paginação por cursor (created_at, id)
+        Index("ix_tb_user_created_at_id", "created_at", "id"),
+        # Um cliente por telefone (upsert na criação do pedido)
+        Index(
+            "ux_tb_user_customer_phone", "phone", unique=True,
+            postgresql_where=CUSTOMER_PHONE_PREDICATE,
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
     name: Optional[str] = Field(default=None)
-    username: Optional[str] = Field(default=None)
+    username: Optional[str] = Field(default=None, index=True)
     password_hash: Optional[str] = Field(default=None)
-    email: Optional[str] = Field(default=None)
+    email: Optional[str] = Field(default=None, index=True)
     phone: Optional[str] = Field(default=None)
 
     role: str = Field(default="customer")
@@ -1,21 +1,32 @@
-import logging
-from typing import List
+import itertools
+from datetime import datetime, timezone
+from typing import List, Optional
 from app.configuration.settings import Configuration
 from app.enums.cart import CartStatus
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models.cart.cart import Cart
 from app.models.cart.cart_item import CartItem
 from app.models.product.product import Product
 from app.auth.auth import AuthRouter
-from app.database.connection import get_session
+from app.cache.cache import CacheManager
+from app.database.connection import get_async_session
+from app.helpers.cart.batch import apply_cart_operations
+from app.helpers.cart.totals import adjust_cart_totals, reset_cart_totals
+from app.core.utils.pagination import CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, split_page, to_naive_utc
 from app.schemas.cart.cart import CartCreate, CartUpdate, CartRead, CartList
-from app.schemas.cart.cart_item import CartItemCreate, CartItemUpdate, CartItemRead
+from app.schemas.cart.cart_item import CartItemBatch, CartItemCreate, CartItemUpdate, CartItemRead
+from app.services.cart_store import StoredCart, cart_store
+from app.services.pricing import PricedLine, PricingError
 
 Configuration()
-db_session = get_session
+db_session = get_async_session
 get_current_user = AuthRouter().get_current_user
+cache_manager = CacheManager()
 
 
 class CartRouter(APIRouter):
@@ -28,59 +39,98 @@ class CartRouter(APIRouter):
         self.add_api_route("/cart/{cart_code}", self.update_cart_by_code, methods=["PUT"], response_model=CartRead)
         self.add_api_route("/cart/{cart_code}", self.delete_cart_by_code, methods=["DELETE"], response_model=dict)
         self.add_api_route("/cart/{cart_code}/items/", self.add_item_by_code, methods=["POST"], response_model=CartItemRead)
+        self.add_api_route("/cart/{cart_code}/items/batch", self.batch_items_by_code, methods=["POST"], response_model=CartRead)
         self.add_api_route("/cart/{cart_code}/items/{item_id}", self.update_item_by_code, methods=["PATCH"], response_model=CartItemRead)
         self.add_api_route("/cart/{cart_code}/items/{item_id}/size/{size}", self.remove_item_by_code, methods=["DELETE"], response_model=dict)
         self.add_api_route("/cart/{cart_code}/items/", self.clear_items_by_code, methods=["DELETE"], response_model=dict)
 
-    def create_cart(self, cart_data: CartCreate, session: Session = Depends(db_session)):
-        cart = Cart(status=CartStatus.ACTIVE)
+    async def _price_item(self, session: AsyncSession, product_id: int, size: str, quantity: int, options) -> PricedLine:
+        """Preço do item pela tabela do catálogo; tamanho e opções inválidos viram 400."""
+        price_table = await cache_manager.get_price_table(session)
+        try:
+            return price_table.price_line(product_id, size, quantity, options)
+        except PricingError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def _get_cart(self, session: AsyncSession, cart_code: str, with_items: bool = False) -> Cart:
+        """Busca o carrinho pelo código; com `with_items` carrega itens e produtos na mesma ida ao banco."""
+        statement = select(Cart).where(Cart.code == cart_code)
+        if with_items:
+            statement = statement.options(selectinload(Cart.items).selectinload(CartItem.product))
+        cart = (await session.exec(statement)).first()
+        if not cart:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+        return cart
+
+    async def create_cart(self, cart_data: CartCreate, session: AsyncSession = Depends(db_session)):
+        cart = Cart(status=CartStatus.ACTIVE, items=[])
 
         if cart_data.whatsapp_id:
             cart.whatsapp_id = cart_data.whatsapp_id
 
-        session.add(cart)
-        session.commit()
-        session.refresh(cart)
-        return cart
-
-    def list_carts(self, session: Session = Depends(db_session)):
-        carts = session.exec(select(Cart)).all()
-        return carts
+        if cart_store.enabled:
+            state = await cart_store.new_cart(session, cart)
+            return await self._store_response(session, state)
 
-    def get_cart_by_code(self, cart_code: str, session: Session = Depends(db_session)):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+        session.add(cart)
+        await session.commit()
         return cart
 
-    def update_cart_by_code(self, cart_code: str, cart_update: CartUpdate, session: Session = Depends(db_session)):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+    async def list_carts(
+        self,
+        response: Response,
+        cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {CURSOR_HEADER} da página anterior"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        status_filter: Optional[CartStatus] = Query(None, alias="status"),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        session: AsyncSession = Depends(db_session),
+    ):
+        """Lista carrinhos do mais recente para o mais antigo, paginando por cursor (created_at, id)."""
+        # Os totais da listagem vêm das colunas do carrinho, sem carregar os itens
+        statement = select(Cart)
+        if status_filter is not None:
+            statement = statement.where(Cart.status == status_filter)
+        if created_from:
+            statement = statement.where(Cart.created_at >= to_naive_utc(created_from))
+        if created_to:
+            statement = statement.where(Cart.created_at < to_naive_utc(created_to))
+
+        carts = (await session.exec(keyset_page(statement, Cart, cursor, limit))).all()
+        return split_page(carts, limit, response)
+
+    async def get_cart_by_code(self, cart_code: str, session: AsyncSession = Depends(db_session)):
+        if cart_store.enabled:
+            return await self._store_response(session, await self._get_stored_cart(session, cart_code))
+        return await self._get_cart(session, cart_code, with_items=True)
+
+    async def update_cart_by_code(self, cart_code: str, cart_update: CartUpdate, session: AsyncSession = Depends(db_session)):
+        if cart_store.enabled:
+            return await self._store_update_cart(session, cart_code, cart_update)
+        cart = await self._get_cart(session, cart_code, with_items=True)
 
         for key, value in cart_update.dict(exclude_unset=True).items():
             setattr(cart, key, value)
 
-        session.commit()
-        session.refresh(cart)
+        await session.commit()
         return cart
 
-    def delete_cart_by_code(self, cart_code: str, session: Session = Depends(db_session)):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+    async def delete_cart_by_code(self, cart_code: str, session: AsyncSession = Depends(db_session)):
+        if cart_store.enabled:
+            return await self._store_delete_cart(session, cart_code)
+        cart = await self._get_cart(session, cart_code, with_items=True)
 
-        session.delete(cart)
+        await session.delete(cart)
         cart.status = CartStatus.EXPIRED
-        session.commit()
+        await session.commit()
         return {"message": "Carrinho deletado com sucesso"}
 
-    def add_item_by_code(self, cart_code: str, item_data: CartItemCreate, session: Session = Depends(db_session)):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+    async def add_item_by_code(self, cart_code: str, item_data: CartItemCreate, session: AsyncSession = Depends(db_session)):
+        if cart_store.enabled:
+            return await self._store_add_item(session, cart_code, item_data)
+        cart = await self._get_cart(session, cart_code)
 
-        product = session.get(Product, item_data.product_id)
+        product = await session.get(Product, item_data.product_id)
         if not product or not product.is_active:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto inválido ou inativo")
 
@@ -88,21 +138,25 @@ class CartRouter(APIRouter):
         if item_data.size not in product.prices_by_size:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tamanho inválido para este produto")
 
-        unit_price = product.prices_by_size[item_data.size]
+        line = await self._price_item(session, product.id, item_data.size, item_data.quantity, item_data.options)
+        options = {name: float(price) for name, price in line.options.items()}
 
         # Verifica se já existe um item igual
-        existing_item = session.exec(
+        existing_item = (await session.exec(
             select(CartItem).where(
                 CartItem.cart_id == cart.id,
                 CartItem.product_id == item_data.product_id,
                 CartItem.size == item_data.size,
             )
-        ).first()
+        )).first()
 
         if existing_item:
+            before = existing_item.subtotal
             existing_item.quantity += item_data.quantity
-            session.commit()
-            session.refresh(existing_item)
+            existing_item.unit_price = float(line.unit_price)
+            await adjust_cart_totals(session, cart, existing_item.subtotal - before, item_data.quantity)
+            await session.commit()
+            set_committed_value(existing_item, "product", product)
             return existing_item
                             
         if item_data.selected_flavors:
@@ -120,36 +174,39 @@ class CartRouter(APIRouter):
             quantity=item_data.quantity,
             size=item_data.size,
             selected_flavors=item_data.selected_flavors,
-            unit_price=unit_price,
+            unit_price=float(line.unit_price),
             observation=item_data.observation,
-            options=item_data.options
+            options=options
         )
         session.add(new_item)
         
         # Atualiza status se ainda estiver ACTIVE
         if cart.status == CartStatus.ACTIVE or cart.status == CartStatus.CLEARED:
             cart.status = CartStatus.PROCESSING
-        
-        session.commit()
-        session.refresh(new_item)
+
+        await adjust_cart_totals(session, cart, new_item.subtotal, new_item.quantity)
+        await session.commit()
+        set_committed_value(new_item, "product", product)
         
         return new_item
 
-    def update_item_by_code(self, cart_code: str, item_id: int, update_data: CartItemUpdate, session: Session = Depends(db_session)):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+    async def update_item_by_code(self, cart_code: str, item_id: int, update_data: CartItemUpdate, session: AsyncSession = Depends(db_session)):
+        if cart_store.enabled:
+            return await self._store_update_item(session, cart_code, item_id, update_data)
+        cart = await self._get_cart(session, cart_code)
 
-        item = session.exec(
+        item = (await session.exec(
             select(CartItem).where(
                 CartItem.id == item_id,
                 CartItem.cart_id == cart.id
-            )
-        ).first()
+            ).options(selectinload(CartItem.product))
+        )).first()
 
         if not item:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item não encontrado no carrinho")
 
+        before_amount, before_quantity = item.subtotal, item.quantity
+
         if update_data.size is not None:
             item.size = update_data.size
 
@@ -163,50 +220,247 @@ class CartRouter(APIRouter):
             item.options = update_data.options
     
         item.quantity = update_data.quantity
-        session.commit()
-        session.refresh(item)
+
+        # Tamanho e opções podem ter mudado: o preço sai sempre do catálogo
+        line = await self._price_item(session, item.product_id, item.size, item.quantity, item.options)
+        item.unit_price = float(line.unit_price)
+        item.options = {name: float(price) for name, price in line.options.items()}
+        await adjust_cart_totals(session, cart, item.subtotal - before_amount, item.quantity - before_quantity)
+        await session.commit()
         return item
 
-    def remove_item_by_code(
+    async def remove_item_by_code(
         self,
         cart_code: str,
         item_id: int,
         size: str,
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(db_session)
     ):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=404, detail="Carrinho não encontrado")
+        if cart_store.enabled:
+            return await self._store_remove_item(session, cart_code, item_id, size)
+        cart = await self._get_cart(session, cart_code)
 
         # Verifica se o item pertence ao carrinho
-        item = session.exec(
+        item = (await session.exec(
             select(CartItem).where(
                 CartItem.id == item_id,
                 CartItem.cart_id == cart.id,
                 CartItem.size == size
             )
-        ).first()
+        )).first()
 
         if not item:
             raise HTTPException(status_code=404, detail="Item não encontrado no carrinho")
 
-        session.delete(item)
-        session.commit()
+        await adjust_cart_totals(session, cart, -item.subtotal, -item.quantity)
+        await session.delete(item)
+        await session.commit()
         return {"message": "Item removido com sucesso"}
 
-    def clear_items_by_code(self, cart_code: str, session: Session = Depends(db_session)):
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
-        if not cart:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+    async def clear_items_by_code(self, cart_code: str, session: AsyncSession = Depends(db_session)):
+        if cart_store.enabled:
+            return await self._store_clear_items(session, cart_code)
+        cart = await self._get_cart(session, cart_code)
 
-        items = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
-        for item in items:
-            session.delete(item)
+        result = await session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
         
-        if items:  # só marca como cancelado se tinha itens
+        if result.rowcount:  # só marca como cancelado se tinha itens
             cart.status = CartStatus.CLEARED
+        reset_cart_totals(cart)
         
-        session.commit()
+        await session.commit()
       
         return {"message": "Todos os itens foram removidos do carrinho"}
-    
+
+    async def batch_items_by_code(self, cart_code: str, batch: CartItemBatch, session: AsyncSession = Depends(db_session)):
+        """
+        Aplica várias inclusões, alterações e remoções de itens de uma vez, em ordem.
+        Todas são validadas antes de gravar: com qualquer erro nada é alterado e a resposta
+        (400) lista as operações recusadas. Retorna o carrinho resultante.
+        """
+        if cart_store.enabled:
+            return await self._store_batch_items(session, cart_code, batch)
+        cart = await self._get_cart(session, cart_code, with_items=True)
+        products = await self._batch_products(session, batch)
+        price_table = await cache_manager.get_price_table(session)
+
+        state = StoredCart.from_models(cart, cart.items)
+        state.recalculate()
+        before_amount, before_quantity = state.cart["subtotal"], state.cart["items_count"]
+
+        # Itens novos recebem ids provisórios negativos; o id real vem do INSERT
+        errors = apply_cart_operations(state, batch.operations, products, price_table, itertools.count(-1, -1))
+        if errors:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors)
+
+        current = {item.id: item for item in cart.items}
+        removed = [item_id for item_id in current if item_id not in state.items]
+        if removed:
+            await session.exec(delete(CartItem).where(CartItem.id.in_(removed)))
+
+        items, added = [], []
+        for item_id, fields in state.items.items():
+            if item_id < 0:
+                item = CartItem(**{name: value for name, value in fields.items() if name != "id"})
+                session.add(item)
+                added.append(item)
+            else:
+                item = current[item_id]
+                for name, value in fields.items():
+                    if getattr(item, name) != value:
+                        setattr(item, name, value)
+            items.append(item)
+        cart.status = state.cart["status"]
+
+        await adjust_cart_totals(
+            session, cart, state.cart["subtotal"] - before_amount, state.cart["items_count"] - before_quantity
+        )
+        await session.commit()
+
+        for item in added:
+            set_committed_value(item, "product", products[item.product_id])
+        set_committed_value(cart, "items", sorted(items, key=lambda item: item.id))
+        return cart
+
+    async def _batch_products(self, session: AsyncSession, batch: CartItemBatch):
+        """Produtos das inclusões do lote em uma única consulta (IN)."""
+        product_ids = {operation.product_id for operation in batch.operations if operation.op == "add"}
+        if not product_ids:
+            return {}
+        products = (await session.exec(select(Product).where(Product.id.in_(product_ids)))).all()
+        return {product.id: product for product in products}
+
+    # --- Store de carrinhos (CART_STORE): alterações em memória, gravadas no banco pelo flusher ---
+
+    async def _get_stored_cart(self, session: AsyncSession, cart_code: str) -> StoredCart:
+        state = await cart_store.get(session, cart_code)
+        if state is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+        return state
+
+    async def _store_response(self, session: AsyncSession, state: StoredCart) -> Cart:
+        return state.to_model(await cache_manager.get_catalog_products(session))
+
+    def _check_flavors(self, product: Product, selected_flavors) -> None:
+        for flavor in selected_flavors or []:
+            if flavor['name'] not in (product.selected_flavors or []):
+                raise HTTPException(status_code=400, detail=f"Sabor '{flavor['name']}' inválido para este produto")
+
+    async def _store_update_cart(self, session: AsyncSession, cart_code: str, cart_update: CartUpdate):
+        async with cart_store.lock(cart_code):
+            state = await self._get_stored_cart(session, cart_code)
+            state.cart.update(cart_update.dict(exclude_unset=True))
+            await cart_store.save(state)
+        return await self._store_response(session, state)
+
+    async def _store_delete_cart(self, session: AsyncSession, cart_code: str):
+        async with cart_store.lock(cart_code):
+            state = await self._get_stored_cart(session, cart_code)
+            state.deleted = True
+            await cart_store.save(state)
+        return {"message": "Carrinho deletado com sucesso"}
+
+    async def _store_add_item(self, session: AsyncSession, cart_code: str, item_data: CartItemCreate):
+        products = await cache_manager.get_catalog_products(session)
+        product = products.get(item_data.product_id)
+        if not product or not product.is_active:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto inválido ou inativo")
+        if item_data.size not in product.prices_by_size:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tamanho inválido para este produto")
+        line = await self._price_item(session, product.id, item_data.size, item_data.quantity, item_data.options)
+
+        async with cart_store.lock(cart_code):
+            state = await self._get_stored_cart(session, cart_code)
+
+            # Verifica se já existe um item igual
+            item = next((
+                item for item in state.items.values()
+                if item["product_id"] == item_data.product_id and item["size"] == item_data.size
+            ), None)
+
+            if item:
+                item["quantity"] += item_data.quantity
+                item["unit_price"] = float(line.unit_price)
+                item["updated_at"] = datetime.now(timezone.utc)
+            else:
+                self._check_flavors(product, item_data.selected_flavors)
+                item = CartItem(
+                    id=await cart_store.new_item_id(session),
+                    cart_id=state.cart["id"],
+                    product_id=item_data.product_id,
+                    quantity=item_data.quantity,
+                    size=item_data.size,
+                    selected_flavors=item_data.selected_flavors,
+                    unit_price=float(line.unit_price),
+                    observation=item_data.observation,
+                    options={name: float(price) for name, price in line.options.items()},
+                ).model_dump()
+                state.items[item["id"]] = item
+
+                # Atualiza status se ainda estiver ACTIVE
+                if state.cart["status"] in (CartStatus.ACTIVE, CartStatus.CLEARED):
+                    state.cart["status"] = CartStatus.PROCESSING
+
+            state.recalculate()
+            await cart_store.save(state)
+        return next(cart_item for cart_item in state.to_model(products).items if cart_item.id == item["id"])
+
+    async def _store_update_item(self, session: AsyncSession, cart_code: str, item_id: int, update_data: CartItemUpdate):
+        async with cart_store.lock(cart_code):
+            state = await self._get_stored_cart(session, cart_code)
+            item = state.find_item(item_id)
+            if not item:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item não encontrado no carrinho")
+
+            changes = {"quantity": update_data.quantity}
+            for field in ("size", "selected_flavors", "observation", "options"):
+                value = getattr(update_data, field)
+                if value is not None:
+                    changes[field] = value
+            fields = {**item, **changes}
+
+            # Tamanho e opções podem ter mudado: o preço sai sempre do catálogo
+            line = await self._price_item(session, fields["product_id"], fields["size"], fields["quantity"], fields["options"])
+            fields["unit_price"] = float(line.unit_price)
+            fields["options"] = {name: float(price) for name, price in line.options.items()}
+            fields["updated_at"] = datetime.now(timezone.utc)
+            state.items[item_id] = fields
+
+            state.recalculate()
+            await cart_store.save(state)
+        return next(item for item in (await self._store_response(session, state)).items if item.id == item_id)
+
+    async def _store_remove_item(self, session: AsyncSession, cart_code: str, item_id: int, size: str):
+        async with cart_store.lock(cart_code):
+            state = await self._get_stored_cart(session, cart_code)
+            if not state.find_item(item_id, size):
+                raise HTTPException(status_code=404, detail="Item não encontrado no carrinho")
+            del state.items[item_id]
+            state.recalculate()
+            await cart_store.save(state)
+        return {"message": "Item removido com sucesso"}
+
+    async def _store_clear_items(self, session: AsyncSession, cart_code: str):
+        async with cart_store.lock(cart_code):
+            state = await self._get_stored_cart(session, cart_code)
+            if state.items:  # só marca como cancelado se tinha itens
+                state.cart["status"] = CartStatus.CLEARED
+            state.items.clear()
+            state.recalculate()
+            await cart_store.save(state)
+        return {"message": "Todos os itens foram removidos do carrinho"}
+
+    async def _store_batch_items(self, session: AsyncSession, cart_code: str, batch: CartItemBatch):
+        products = await cache_manager.get_catalog_products(session)
+        price_table = await cache_manager.get_price_table(session)
+        additions = sum(1 for operation in batch.operations if operation.op == "add")
+        new_ids = iter([await cart_store.new_item_id(session) for _ in range(additions)])
+
+        async with cart_store.lock(cart_code):
+            # get() devolve uma cópia: se houver erro o estado guardado não é tocado
+            state = await self._get_stored_cart(session, cart_code)
+            errors = apply_cart_operations(state, batch.operations, products, price_table, new_ids)
+            if errors:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors)
+            await cart_store.save(state)
+        return state.to_model(products)
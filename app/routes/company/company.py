@@ -1,17 +1,27 @@
 from datetime import datetime, timezone
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
 from sqlmodel import Session, select
 from pydantic import ValidationError
 
 from app.auth.auth import AuthRouter
 from app.core.middlewares.users import is_admin
 from app.models.company.company import Company
+from app.models.payment.webhook_event import PaymentWebhookEvent
 from app.models.user.user import User
 from app.schemas.company.address import AddressUpdate
 from app.schemas.chat.chat_status import ChatbotStatusUpdate, StatusResponse
 from app.schemas.company.company import CompanyStatusResponse, CompanyStatusUpdate, CompanyUpdate
-from app.database.connection import get_session
+from app.database.connection import get_session, get_pool_status
+from app.cache.cache import cache
+from app.integration.mercadopago import payment_gateway
+from app.services.cart_store import cart_store
+from app.services.payment_expiry import payment_expiry
+from app.services.single_flight import pix_charges
+from app.services.webhook_inbox import webhook_inbox
+from app.tasks.scheduler.batch_jobs import job_metrics
+from app.tasks.websockets.ws_manager import order_ws_manager, payment_ws_manager
 from app.core.exceptions.app_exception import AppHttpException
 
 db_session = get_session
@@ -71,6 +81,24 @@ class CompanyRouter(APIRouter):
         self.add_api_route("/health", self.check_health, methods=["GET"],
                          summary="Verificar saúde do serviço")
         
+        self.add_api_route("/health/database", self.check_database_pool, methods=["GET"],
+                         summary="Estatísticas do pool de conexões")
+        
+        self.add_api_route("/health/cache", self.check_cache, methods=["GET"],
+                         summary="Estatísticas do cache")
+        
+        self.add_api_route("/health/websockets", self.check_websockets, methods=["GET"],
+                         summary="Estatísticas das conexões websocket")
+        
+        self.add_api_route("/health/jobs", self.check_jobs, methods=["GET"],
+                         summary="Linhas e duração das execuções dos jobs")
+        
+        self.add_api_route("/health/payment-gateway", self.check_payment_gateway, methods=["GET"],
+                         summary="Estado do circuito e tentativas do gateway de pagamento")
+        
+        self.add_api_route("/health/webhooks", self.check_webhooks, methods=["GET"],
+                         summary="Fila e contadores dos webhooks de pagamento")
+        
         self.add_api_route("/{company_id}", self.update_company, methods=["PUT"], 
                          response_model=Company,
                          summary="Atualizar dados da empresa",
@@ -84,6 +112,55 @@ class CompanyRouter(APIRouter):
     def check_health(self) -> dict:
         """Endpoint de verificação de saúde do serviço"""
         return {"status": "ok", "timestamp": datetime.now(timezone.utc).isoformat()}
+
+    def check_database_pool(self) -> dict:
+        """Retorna as estatísticas do pool de conexões do processo"""
+        return {"pool": get_pool_status(), "timestamp": datetime.now(timezone.utc).isoformat()}
+
+    async def check_cache(self) -> dict:
+        """Retorna os contadores de acertos, falhas e remoções do cache"""
+        return {
+            "cache": cache.stats(),
+            "cart_store": await cart_store.get_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def check_websockets(self) -> dict:
+        """Retorna conexões ativas, mensagens enfileiradas e descartes por consumidor lento"""
+        return {
+            "orders": order_ws_manager.get_stats(),
+            "payment": payment_ws_manager.get_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+            
+    def check_jobs(self) -> dict:
+        """Retorna, por job do scheduler, as linhas alteradas e a duração das execuções"""
+        return {
+            "jobs": job_metrics.get_stats(),
+            "payment_expiry": payment_expiry.get_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+            
+    def check_payment_gateway(self) -> dict:
+        """Retorna o estado do circuito, os contadores de chamadas ao Mercado Pago e as cobranças PIX compartilhadas"""
+        return {
+            "gateway": payment_gateway.get_stats(),
+            "pix_charges": pix_charges.get_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+            
+    def check_webhooks(self, session: Session = Depends(db_session)) -> dict:
+        """Retorna os eventos pendentes na caixa de entrada e os contadores dos workers do processo"""
+        pending, oldest = session.exec(
+            select(func.count(PaymentWebhookEvent.id), func.min(PaymentWebhookEvent.received_at))
+            .where(PaymentWebhookEvent.processed_at.is_(None))
+        ).one()
+        return {
+            "pending": pending,
+            "oldest_pending_at": oldest.isoformat() if oldest else None,
+            "workers": webhook_inbox.get_stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
             
     async def get_company(self, session: Session = Depends(db_session)) -> Company:
         """
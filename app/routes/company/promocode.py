@@ -4,18 +4,25 @@ from typing import List
 from zoneinfo import ZoneInfo
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.auth.auth import AuthRouter
 from app.configuration.settings import Configuration
 from app.core.middlewares.users import is_admin
-from app.database.connection import get_session
+from app.database.connection import get_async_session, get_session
+from app.helpers.cart.totals import discount_for
 from app.models.cart.cart import Cart
 from app.models.company.promocode import PromoCode
 from app.models.user.user import User
-from app.schemas.company.promocode import PromoCodeCreate, PromoCodeResponse, PromoCodeUpdate
+from app.schemas.company.promocode import (
+    PromoCodeCreate, PromoCodeResponse, PromoCodeUpdate, PromoCodeValidateRequest, PromoCodeValidation
+)
+from app.services.cart_store import cart_store
+from app.services.promocodes import PromoCodeError, promo_registry, validate_promo
 
 Configuration()
 db_session = get_session
+async_db_session = get_async_session
 get_current_user = AuthRouter().get_current_user
 
 # Definir o fuso horário de São Paulo
@@ -35,6 +42,7 @@ class PromoCodeRouter(APIRouter):
         self.add_api_route("/{promo_id}", self.update_promocode_by_id, methods=["PUT"], response_model=PromoCode)
         self.add_api_route("/{promo_id}", self.delete_promocode_by_id, methods=["DELETE"], response_model=dict)
 
+        self.add_api_route("/validate", self.validate_promocodes, methods=["POST"], response_model=List[PromoCodeValidation])
         self.add_api_route("/apply/{promo_code}/{cart_code}", self.apply_promocode, methods=["POST"])
         self.add_api_route("/remove/{cart_code}", self.remove_promocode, methods=["DELETE"])
 
@@ -76,13 +84,13 @@ class PromoCodeRouter(APIRouter):
                 # REMOVE timezone, força naive (local sem fuso explícito)
                 promo_dict[key] = self.convert_local_to_utc(dt)
 
+        db_promo = PromoCode(**promo_dict)
 
-                db_promo = PromoCode(**promo_dict)
-
-                session.add(db_promo)
-                session.commit()
-                session.refresh(db_promo)
-                return db_promo
+        session.add(db_promo)
+        session.commit()
+        session.refresh(db_promo)
+        promo_registry.reload(session)
+        return db_promo
 
     async def update_promocode_by_id(
         self,
@@ -105,15 +113,15 @@ class PromoCodeRouter(APIRouter):
                 dt = datetime.fromisoformat(dt) if isinstance(dt, str) else dt
                 update_data[key] = self.convert_local_to_utc(dt)
 
+        for key, value in update_data.items():
+            setattr(db_promo, key, value)
 
-                for key, value in update_data.items():
-                    setattr(db_promo, key, value)
-
-                db_promo.updated_at = datetime.now(timezone.utc)
-                session.add(db_promo)
-                session.commit()
-                session.refresh(db_promo)
-                return db_promo
+        db_promo.updated_at = datetime.now(timezone.utc)
+        session.add(db_promo)
+        session.commit()
+        session.refresh(db_promo)
+        promo_registry.reload(session)
+        return db_promo
 
     async def delete_promocode_by_id(self, promo_id: int, current_user: User = Depends(get_current_user), session: Session = Depends(db_session)):
         is_admin(current_user)
@@ -122,73 +130,98 @@ class PromoCodeRouter(APIRouter):
             raise HTTPException(status_code=404, detail="PromoCode não encontrado")
         session.delete(db_promo)
         session.commit()
+        promo_registry.reload(session)
         return {"detail": "PromoCode deletado com sucesso"}
 
+    async def validate_promocodes(
+        self,
+        request: PromoCodeValidateRequest,
+        session: AsyncSession = Depends(async_db_session)
+    ):
+        """Valida vários códigos de uma vez, direto do registro em memória (não consome usos)"""
+        results = []
+        for code in request.codes:
+            try:
+                promo = await validate_promo(session, code, request.subtotal)
+            except PromoCodeError as e:
+                results.append(PromoCodeValidation(code=code.strip().upper(), valid=False, detail=str(e)))
+                continue
+            results.append(PromoCodeValidation(
+                code=promo.code,
+                valid=True,
+                discount_percentage=promo.discount_percentage,
+                description=promo.description,
+            ))
+        return results
+
     async def apply_promocode(
         self,
         promo_code: str,
         cart_code: str,
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(async_db_session)
     ):
-        """Aplica um código promocional ao carrinho e calcula o desconto"""
+        """Valida o código promocional para o carrinho e calcula o desconto (o uso é consumido no pedido)"""
+
+        if cart_store.enabled:
+            return await self._apply_promocode_in_store(promo_code, cart_code, session)
 
-        # 1. Busca o carrinho
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
+        # 1. Busca o carrinho (os totais já estão gravados nele)
+        cart = (await session.exec(select(Cart).where(Cart.code == cart_code))).first()
         if not cart:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Carrinho não encontrado"
             )
 
-        # 2. Busca o código promocional (case insensitive)
-        promo_code_upper = promo_code.upper()
-        promo = session.exec(
-            select(PromoCode).where(PromoCode.code == promo_code_upper)
-        ).first()
-
-        if not promo:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Código promocional inválido"
-            )
-
-        # 3. Validações do código promocional
-        now = datetime.now(SAO_PAULO_TZ)
-
-        valid_from_local = promo.valid_from.astimezone(SAO_PAULO_TZ) if promo.valid_from else None
-        valid_until_local = promo.valid_until.astimezone(SAO_PAULO_TZ) if promo.valid_until else None
-
-        if not promo.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Código promocional inativo"
-            )
-
-        if valid_from_local and now < valid_from_local:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Código promocional válido apenas a partir de {valid_from_local.strftime('%d/%m/%Y %H:%M')}"
-            )
-
-        if valid_until_local and now > valid_until_local:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Código promocional expirado em {valid_until_local.strftime('%d/%m/%Y %H:%M')}"
-            )
-
-        # 4. Calcula o desconto
+        # 2. Valida o cupom pelo cache (vigência, limite de usos e pedido mínimo)
         subtotal = cart.total  # Somente os produtos
-        discount_value = subtotal * (promo.discount_percentage / 100)
+        try:
+            promo = await validate_promo(session, promo_code, subtotal)
+        except PromoCodeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        # 3. Calcula o desconto (mantido junto com o subtotal a cada alteração de item)
+        discount_value = discount_for(subtotal, promo.discount_percentage)
 
         cart.promo_code = promo.code
         cart.promo_discount_percentage = promo.discount_percentage
-        cart.promo_discount_value = discount_value
+        cart.discount = discount_value
         cart.promo_applied_at = datetime.now(timezone.utc)
-        promo.current_uses += 1
 
-        session.add_all([cart, promo])
-        session.commit()
+        session.add(cart)
+        await session.commit()
+
+        return {
+            "subtotal": subtotal,
+            "discount_percentage": promo.discount_percentage,
+            "discount_value": discount_value,
+            "total_with_discount": max(subtotal - discount_value, 0),
+            "promo_code": promo.code,
+            "promo_description": promo.description
+        }
+
+    async def _apply_promocode_in_store(self, promo_code: str, cart_code: str, session: AsyncSession):
+        """Mesma aplicação do cupom, sobre o carrinho mantido no store (CART_STORE)."""
+        async with cart_store.lock(cart_code):
+            state = await cart_store.get(session, cart_code)
+            if state is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrinho não encontrado")
+
+            subtotal = state.cart["subtotal"]
+            try:
+                promo = await validate_promo(session, promo_code, subtotal)
+            except PromoCodeError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+            state.cart.update(
+                promo_code=promo.code,
+                promo_discount_percentage=promo.discount_percentage,
+                promo_applied_at=datetime.now(timezone.utc),
+            )
+            state.recalculate()
+            await cart_store.save(state)
 
+        discount_value = state.cart["discount"]
         return {
             "subtotal": subtotal,
             "discount_percentage": promo.discount_percentage,
@@ -201,21 +234,25 @@ class PromoCodeRouter(APIRouter):
     async def remove_promocode(
         self,
         cart_code: str,
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(async_db_session)
     ):
         """Remove um código promocional aplicado ao carrinho, revertendo para o valor original"""
 
-        cart = session.exec(select(Cart).where(Cart.code == cart_code)).first()
+        if cart_store.enabled:
+            # O carrinho está no store: a alteração passa por ele para não ser sobrescrita no flush
+            return await self._remove_promocode_in_store(cart_code, session)
+
+        cart = (await session.exec(select(Cart).where(Cart.code == cart_code))).first()
         if not cart:
             raise HTTPException(status_code=404, detail="Carrinho não encontrado")
 
         cart.promo_code = None
         cart.promo_discount_percentage = 0
-        cart.promo_discount_value = 0
+        cart.discount = 0
         cart.promo_applied_at = None
 
         session.add(cart)
-        session.commit()
+        await session.commit()
 
         return {
             "success": True,
@@ -224,4 +261,23 @@ class PromoCodeRouter(APIRouter):
             "current_total": cart.total,
             "discount_applied": 0,
             "promo_code": None
-        }
\ No newline at end of file
+        }
+
+    async def _remove_promocode_in_store(self, cart_code: str, session: AsyncSession):
+        async with cart_store.lock(cart_code):
+            state = await cart_store.get(session, cart_code)
+            if state is None:
+                raise HTTPException(status_code=404, detail="Carrinho não encontrado")
+
+            state.cart.update(promo_code=None, promo_discount_percentage=0, promo_applied_at=None)
+            state.recalculate()
+            await cart_store.save(state)
+
+        return {
+            "success": True,
+            "message": "Código promocional removido com sucesso",
+            "original_total": state.cart["subtotal"],
+            "current_total": state.cart["subtotal"],
+            "discount_applied": 0,
+            "promo_code": None
+        }
@@ -1,22 +1,28 @@
 from datetime import datetime
 import logging
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlmodel import Session, or_, select
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.configuration.settings import Configuration
-from app.enums.cart import CartStatus
 from app.enums.order_status import OrderStatus
 from app.helpers.order.formatters import format_brazilian_date, format_currency
-from app.models.cart.cart import Cart
+from app.helpers.order.persistence import complete_cart, insert_order_items, upsert_customer, upsert_delivery_address
+from app.helpers.order.loaders import ORDER_LIST_DEFAULT_LIMIT, ORDER_LIST_MAX_LIMIT, load_order, select_orders
+from app.helpers.order.search import SEARCH_DEFAULT_LIMIT, find_orders
+from app.services.cart_store import cart_store
+from app.services.pricing import CENT, PricedCart, to_decimal
+from app.services.promocodes import normalize_code, redeem_promo, validate_promo
+from app.core.utils.pagination import CURSOR_HEADER, keyset_page, split_page, to_naive_utc
 from app.models.order.order import Order
 from app.models.order.order_item import OrderItem
-from app.models.product.product import Product
 from app.models.user.address import Address
-from app.models.company.promocode import PromoCode
 from app.schemas.order.order import OrderCreate, OrderUpdate, OrderRead, StatusUpdateRequest
 from app.models.user.user import User
 from app.auth.auth import AuthRouter
-from app.database.connection import get_session
+from app.cache.cache import CacheManager
+from app.database.connection import get_async_session
 from app.tasks.websockets.ws_manager import order_ws_manager
 from fastapi.responses import PlainTextResponse
 
@@ -30,8 +36,22 @@ ORDER_STATUS_PT = {
 }
 
 Configuration()
-db_session = get_session
+db_session = get_async_session
 get_current_user = AuthRouter().get_current_user
+cache_manager = CacheManager()
+
+def log_price_mismatch(order_request: OrderCreate, priced: PricedCart) -> None:
+    """Registra quando os valores enviados pelo cliente divergem dos calculados (o pedido usa os do servidor)."""
+    client_totals = [
+        ("total_amount", order_request.total_amount, priced.subtotal),
+        ("total_amount_with_discount", order_request.total_amount_with_discount, priced.total),
+    ] + [
+        (f"items[{i}].total_price", item.total_price, line.total_price)
+        for i, (item, line) in enumerate(zip(order_request.items, priced.lines))
+    ]
+    for field, sent, computed in client_totals:
+        if sent is not None and abs(to_decimal(sent) - computed) >= CENT:
+            logging.warning(f"PREÇO >>> {field} enviado {sent} difere do calculado {computed}; usando o calculado")
 
 class OrderRouter(APIRouter):
     def __init__(self, *args, **kwargs):
@@ -46,133 +66,89 @@ class OrderRouter(APIRouter):
         self.add_api_route("/orders/{order_id}/status", self.update_order_status_by_id, methods=["PATCH"])
         self.add_api_route("/orders/{order_id}/print",self.print_order_by_id,methods=["GET"], response_class=PlainTextResponse)
 
-    def get_all_orders(self, current_user: User = Depends(get_current_user), session: Session = Depends(db_session)):
-        orders = session.exec(select(Order)).all()
-        for order in orders:
-            order.items = session.exec(select(OrderItem).where(OrderItem.order_id == order.id)).all()
-            order.delivery_address = session.get(Address, order.delivery_address_id)
-        return orders
+    async def get_all_orders(
+        self,
+        response: Response,
+        cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {CURSOR_HEADER} da página anterior"),
+        limit: int = Query(ORDER_LIST_DEFAULT_LIMIT, ge=1, le=ORDER_LIST_MAX_LIMIT),
+        status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+        payment_method: Optional[str] = Query(None),
+        is_whatsapp: Optional[bool] = Query(None),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        current_user: User = Depends(get_current_user),
+        session: AsyncSession = Depends(db_session)
+    ):
+        """Lista pedidos do mais recente para o mais antigo, paginando por cursor (created_at, id)."""
+        statement = select_orders()
+        if status_filter is not None:
+            statement = statement.where(Order.status == status_filter)
+        if payment_method:
+            statement = statement.where(Order.payment_method == payment_method)
+        if is_whatsapp is not None:
+            statement = statement.where(Order.is_whatsapp == is_whatsapp)
+        if created_from:
+            statement = statement.where(Order.created_at >= to_naive_utc(created_from))
+        if created_to:
+            statement = statement.where(Order.created_at < to_naive_utc(created_to))
+
+        orders = (await session.exec(keyset_page(statement, Order, cursor, limit))).all()
+        return split_page(orders, limit, response)
     
-    def search_orders(
+    async def search_orders(
         self,
         query: str = Query(..., min_length=2),
+        limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=ORDER_LIST_MAX_LIMIT),
         current_user: User = Depends(get_current_user),
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(db_session)
     ):
         logging.info(f"QUERY >>> {query}")
         try:
-            stmt = select(Order).where(
-                or_(
-                    Order.customer_name.contains(query),
-                    Order.phone.contains(query),
-                )
-            ).order_by(Order.id.desc())
-
-            orders = session.exec(stmt).all()
-
-            for order in orders:
-                order.items = session.exec(select(OrderItem).where(OrderItem.order_id == order.id)).all()
-                order.delivery_address = session.get(Address, order.delivery_address_id)
-
-            return orders
+            return await find_orders(session, query, limit)
         except Exception as e:
             raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-    async def create_order(self, order_request: OrderCreate, session: Session = Depends(db_session)):
+    async def create_order(self, order_request: OrderCreate, session: AsyncSession = Depends(db_session)):
             try:
-                # 1. Criar ou recuperar usuário
-                user = session.exec(
-                    select(User).where(User.phone == order_request.customer.phone)
-                ).first()
-                
-                if not user:
-                    user = User(
-                        name=order_request.customer.name,
-                        phone=order_request.customer.phone,
-                        role="customer",
-                        is_active=True
-                    )
-                    session.add(user)
-                    session.commit()
-                    session.refresh(user)
-                else:
-                    # Atualiza nome se mudou
-                    if user.name != order_request.customer.name:
-                        user.name = order_request.customer.name
-                        session.add(user)
-                        session.commit()
-
-                # 2. Gerenciar endereço - pegar o primeiro endereço existente ou criar um novo
-                address = session.exec(
-                    select(Address)
-                    .where(Address.user_id == user.id)
-                    .where(Address.is_company_address == False)
-                    .order_by(Address.id)  # Ordena por ID para pegar o mais antigo primeiro
-                ).first()
-
-                if address:
-                    # Atualiza o endereço existente com os novos dados
-                    address.street = order_request.address.street
-                    address.number = order_request.address.number
-                    address.complement = order_request.address.complement
-                    address.neighborhood = order_request.address.neighborhood
-                    address.city = order_request.address.city
-                    address.state = order_request.address.state
-                    address.zip_code = order_request.address.zip_code
-                    address.reference = order_request.address.reference
-                    session.add(address)
-                else:
-                    # Cria um novo endereço se não existir nenhum
-                    address = Address(
-                        street=order_request.address.street,
-                        number=order_request.address.number,
-                        complement=order_request.address.complement,
-                        neighborhood=order_request.address.neighborhood,
-                        city=order_request.address.city,
-                        state=order_request.address.state,
-                        zip_code=order_request.address.zip_code,
-                        reference=order_request.address.reference,
-                        user_id=user.id,
-                        is_company_address=False
-                    )
-                    session.add(address)
-                
-                session.commit()
-                session.refresh(address)
+                # Tudo abaixo é uma única transação: um commit no final ou rollback no except
 
-                # 3. Validar cupom promocional (se veio do carrinho, já foi validado)
-                discount_value = order_request.discount_value or 0.0
-                discount_percentage = order_request.discount_percentage or 0.0
-                promo_code = order_request.promo_code.upper() if order_request.promo_code else None
+                # 1. Criar ou atualizar o cliente pelo telefone (INSERT ... ON CONFLICT)
+                user = await upsert_customer(session, order_request.customer.name, order_request.customer.phone)
+
+                # 2. Atualizar o endereço de entrega mais antigo do cliente ou criar um novo (um único comando)
+                address = await upsert_delivery_address(session, user.id, order_request.address)
+
+                # 3. Validar cupom promocional (pelo cache; o uso só é consumido no fim da transação)
+                promo = None
+                discount_percentage = 0.0
+                promo_code = normalize_code(order_request.promo_code) if order_request.promo_code else None
                 discount_description = order_request.discount_description if order_request.discount_description else None
 
                 if promo_code:
-                    # Verifica se o cupom existe e está ativo (mas não recalcula o desconto)
-                    promo = session.exec(
-                        select(PromoCode).where(PromoCode.code == promo_code)
-                    ).first()
-                    
-                    discount_percentage=promo.discount_percentage
-                    discount_description=promo.description
-
-                    if promo:
-                        # Atualiza contagem de usos do cupom
-                        promo.current_uses += 1
-                        session.add(promo)
-                        session.commit()
+                    promo = await validate_promo(session, promo_code)
+                    discount_percentage = promo.discount_percentage
+                    discount_description = promo.description
+
+                # 4. Preços calculados no servidor a partir da tabela do catálogo (valores do cliente só são conferidos)
+                price_table = await cache_manager.get_price_table(session)
+                priced = price_table.price_cart(order_request.items, discount_percentage)
+                total_amount = float(priced.subtotal)
+                total_amount_with_discount = float(priced.total)
+                discount_value = float(priced.discount_value)
+                log_price_mismatch(order_request, priced)
+                if promo:
+                    promo.check(total_amount)
 
                 if order_request.payment_method == "dinheiro" and order_request.cash_change_for:
                     # O total a pagar deve incluir o valor com desconto MAIS a taxa de entrega
-                    total_a_pagar = (order_request.total_amount_with_discount 
-                                     if order_request.promo_code 
-                                     else order_request.total_amount) + (order_request.delivery_fee or 0)
+                    total_a_pagar = total_amount_with_discount + (order_request.delivery_fee or 0)
                     
                     cash_change_total = order_request.cash_change_for - total_a_pagar
                 else:
                     cash_change_total = None
 
 
-                # 4. Criar pedido com os valores já calculados
+                # 5. Criar pedido com os valores já calculados
                 order = Order(
                     user_id=user.id,
                     customer_name=user.name,
@@ -180,8 +156,8 @@ class OrderRouter(APIRouter):
                     delivery_address_id=address.id,
                     payment_method=order_request.payment_method,
                     delivery_fee=order_request.delivery_fee,
-                    total_amount=order_request.total_amount,
-                    total_amount_with_discount=order_request.total_amount_with_discount,
+                    total_amount=total_amount,
+                    total_amount_with_discount=total_amount_with_discount,
                     discount_code=promo_code,
                     discount_value=discount_value,
                     discount_percentage=discount_percentage,
@@ -195,35 +171,28 @@ class OrderRouter(APIRouter):
                     privacy_policy_accepted_at=order_request.privacy_policy_accepted_at
                 )
                 session.add(order)
-                session.commit()
-                session.refresh(order)
-
-                # 5. Criar itens do pedido
-                for item in order_request.items:
-                    order_item = OrderItem(
-                        product_id=item.product_id,
-                        quantity=item.quantity,
-                        unit_price=item.unit_price,
-                        total_price=item.total_price,
-                        size=item.size,
-                        observation=item.observation,
-                        selected_flavors=item.selected_flavors,
-                        order_id=order.id
-                    )
-                    session.add(order_item)
-
-                # 6. Atualizar status do carrinho, se houver
+                await session.flush()
+
+                # 6. Criar itens do pedido (um único INSERT ... RETURNING)
+                items = await insert_order_items(session, order.id, order_request.items, priced.lines)
+
+                # 7. Atualizar status do carrinho, se houver (pendências do store são gravadas antes)
                 if order_request.cart_code:
-                    cart = session.exec(select(Cart).where(Cart.code == order_request.cart_code)).first()
-                    if cart:
-                        cart.status = CartStatus.COMPLETED
-                        session.add(cart)
+                    await cart_store.checkout(order_request.cart_code)
+                    await complete_cart(session, order_request.cart_code)
 
-                session.commit()
+                # 8. Resgatar o cupom por último (UPDATE condicional): a linha do cupom fica travada só até o commit
+                if promo:
+                    await redeem_promo(session, promo_code, total_amount)
 
-                # 7. Popular dados para resposta
-                order.items = session.exec(select(OrderItem).where(OrderItem.order_id == order.id)).all()
-                order.delivery_address = address
+                await session.commit()
+                if order_request.cart_code and cart_store.enabled:
+                    # Concluído no banco: o store não pode mais regravar o carrinho
+                    await cart_store.evict(order_request.cart_code)
+
+                # 9. Resposta montada com os objetos em memória, sem reler o pedido
+                set_committed_value(order, "items", items)
+                set_committed_value(order, "delivery_address", address)
 
                 await order_ws_manager.broadcast({
                     "type": "new_order",
@@ -233,15 +202,13 @@ class OrderRouter(APIRouter):
                 return OrderRead.model_validate(order)
 
             except Exception as e:
-                session.rollback()
+                await session.rollback()
                 raise HTTPException(status_code=400, detail=str(e))
 
-    async def get_order_by_code(self, code: str, session: Session = Depends(db_session)):
-        order = session.exec(select(Order).where(Order.code == code)).first()
+    async def get_order_by_code(self, code: str, session: AsyncSession = Depends(db_session)):
+        order = await load_order(session, Order.code == code)
         if not order:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
-
-        order.items = session.exec(select(OrderItem).where(OrderItem.order_id == order.id)).all()
         
         return order
 
@@ -250,9 +217,9 @@ class OrderRouter(APIRouter):
         order_id: int,
         updated_order: OrderUpdate,
         current_user: User = Depends(get_current_user),
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(db_session)
     ):
-        order = session.get(Order, order_id)
+        order = await load_order(session, Order.id == order_id)
         if not order:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
 
@@ -263,11 +230,10 @@ class OrderRouter(APIRouter):
             setattr(order, field, value)
 
         session.add(order)
-        session.commit()
-        session.refresh(order)
+        await session.commit()
 
-        order.items = session.exec(select(OrderItem).where(OrderItem.order_id == order.id)).all()
-        order.delivery_address = session.get(Address, order.delivery_address_id)
+        if "delivery_address_id" in update_data:
+            set_committed_value(order, "delivery_address", await session.get(Address, order.delivery_address_id))
         
         await order_ws_manager.broadcast({
             "type": "new_order",
@@ -277,60 +243,47 @@ class OrderRouter(APIRouter):
 
         return OrderRead.model_validate(order)
 
-    def delete_order(self, order_id: int, current_user: User = Depends(get_current_user), session: Session = Depends(db_session)):
-        order = session.get(Order, order_id)
+    async def delete_order(self, order_id: int, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(db_session)):
+        order = await session.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pedido não encontrado")
 
         # Deleta itens associados
-        session.exec(select(OrderItem).where(OrderItem.order_id == order_id)).delete()
+        await session.exec(delete(OrderItem).where(OrderItem.order_id == order_id))
 
         # Deleta pedido
-        session.delete(order)
-        session.commit()
+        await session.delete(order)
+        await session.commit()
         return {"message": "Pedido deletado com sucesso"}
 
-    def update_order_status_by_id(
+    async def update_order_status_by_id(
         self,
         order_id: int,
         status_data: StatusUpdateRequest,
         current_user: User = Depends(get_current_user),
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(db_session)
     ):
-        order = session.get(Order, order_id)
+        order = await session.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
         order.status = status_data.status
-        session.commit()
-        session.refresh(order)
+        await session.commit()
         return {"message": "Status atualizado com sucesso", "status": order.status}
 
     async def print_order_by_id(
             self,
             order_id: int,
-            session: Session = Depends(db_session),
+            session: AsyncSession = Depends(db_session),
             current_user=Depends(get_current_user),
         ):
-            order = session.get(Order, order_id)
+            order = await load_order(session, Order.id == order_id, with_products=True)
             if not order:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-            order.items = session.exec(
-                select(OrderItem).where(OrderItem.order_id == order.id)
-            ).all()
-
             if not order.items:
                 raise HTTPException(status_code=400, detail="Pedido sem itens")
 
-            # Carrega relacionamentos
-            product_ids = [item.product_id for item in order.items]
-            products = session.exec(select(Product).where(Product.id.in_(product_ids))).all()
-            produtos_dict = {p.id: p for p in products}
-            
-            if order.delivery_address_id:
-                order.delivery_address = session.get(Address, order.delivery_address_id)
-
             # Cabeçalho
             lines = []
             lines.append("=" * 24)
@@ -364,7 +317,7 @@ class OrderRouter(APIRouter):
             
             # Itens do pedido
             for item in order.items:
-                prod = produtos_dict.get(item.product_id)
+                prod = item.product
                 if not prod:
                     continue
                     
@@ -1,20 +1,35 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
+import json
 import logging
+import zlib
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlmodel import Session, select
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from sqlalchemy import text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.configuration.settings import Configuration
-from app.database.connection import get_session
+from app.database.connection import get_async_session, get_async_session_factory
 from app.auth.auth import AuthRouter
 from app.models.order.order import Order
 from app.models.payment.payment import Payment
 from app.schemas.payment.payment import PaymentRequest, PaymentResponse
 from app.enums.payment_status import PaymentStatus
-from app.integration.mercadopago import sdk
+from app.integration.mercadopago import payment_gateway
+from app.services.payment_expiry import payment_expiry
+from app.services.single_flight import pix_charges
+from app.helpers.payment.payment_status import latest_pix_payment, payment_by_transaction_code
+from app.tasks.websockets.payment_ws import order_topic, payment_status_message
 from app.tasks.websockets.ws_manager import payment_ws_manager
+from app.services.webhook_inbox import webhook_inbox
 
-Configuration()
-db_session = get_session
+configuration = Configuration()
+db_session = get_async_session
+
+# Namespace do advisory lock por pedido (pg_advisory_xact_lock(namespace, order_id))
+PIX_LOCK_NAMESPACE = zlib.crc32(b"thomaggio:payment") & 0x7FFFFFFF
 get_current_user = AuthRouter().get_current_user
 
 
@@ -27,26 +42,22 @@ class PaymentRouter(APIRouter):
         self.add_api_route("/payment/webhook", self.handle_webhook, methods=["POST"])
         self.add_api_route("/payment/{order_code}", self.get_payment, methods=["GET"], response_model=PaymentResponse)
         self.add_api_route("/payment/{order_code}/status", self.check_pix_status, methods=["GET"], response_model=dict)
+        self.add_api_route("/payment/{order_code}/events", self.stream_payment_status, methods=["GET"])
         self.add_api_route("/payment/{order_code}/change-method", self.change_payment_method, methods=["PATCH"], response_model=dict)
         self.add_api_route("/payment/transaction/{transaction_code}", self.get_payment_by_transaction_code, methods=["GET"], response_model=PaymentResponse)
 
-    def check_pix_status(self, order_code: str, session: Session = Depends(db_session)):
+    async def check_pix_status(self, order_code: str, session: AsyncSession = Depends(db_session)):
+        """Consulta pontual; para acompanhar o pagamento use /payment/{order_code}/events ou o websocket."""
         try:
-            order = session.exec(select(Order).where(Order.code == order_code)).first()
-            if not order:
+            order_found, payment = await latest_pix_payment(session, order_code)
+            if not order_found:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-            payment = session.exec(
-                select(Payment)
-                .where(Payment.order_id == order.id, Payment.method == "pix")
-                .order_by(Payment.created_at.desc())
-            ).first()
-
             if not payment:
                 return {"status": "not_found"}
 
             now_utc = datetime.now(timezone.utc)
-            expired = payment.expires_at and payment.expires_at < now_utc
+            expired = bool(payment.expires_at) and self.make_aware(payment.expires_at) < now_utc
 
             return {
                 "status": payment.status.value,
@@ -55,18 +66,63 @@ class PaymentRouter(APIRouter):
                 "created_at": payment.created_at.isoformat() if payment.created_at else None
             }
 
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Erro ao verificar status do pagamento: {str(e)}")
             raise HTTPException(status_code=500, detail="Erro ao verificar status do pagamento")
 
-    def create_payment(self, data: PaymentRequest, session: Session = Depends(db_session)):
+    async def stream_payment_status(self, order_code: str):
+        """
+        Server-Sent Events com o status do PIX do pedido: o estado atual e depois cada mudança
+        publicada para o pedido. Alternativa ao websocket para quem não pode usá-lo.
+        """
+        # Inscreve antes de ler o estado para não perder uma mudança entre os dois
+        connection = payment_ws_manager.subscribe([order_topic(order_code)])
+        try:
+            async with get_async_session_factory()() as session:
+                order_found, payment = await latest_pix_payment(session, order_code)
+        except Exception:
+            payment_ws_manager.disconnect(connection)
+            raise
+        if not order_found:
+            payment_ws_manager.disconnect(connection)
+            raise HTTPException(status_code=404, detail="Pedido não encontrado")
+
+        snapshot = None
+        if payment:
+            snapshot = payment_status_message(payment.transaction_code, payment.status.value, payment.paid_at)
+        return StreamingResponse(
+            self._sse_events(connection, snapshot),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def _sse_events(self, connection, snapshot: Optional[dict]):
+        try:
+            if snapshot:
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False, separators=(',', ':'))}\n\n"
+            while True:
+                try:
+                    text_message = await asyncio.wait_for(connection.queue.get(), configuration.sse_heartbeat_interval)
+                except asyncio.TimeoutError:
+                    # Comentário SSE: mantém proxies e o navegador com a conexão aberta
+                    yield ": ping\n\n"
+                    continue
+                if text_message is None:
+                    break
+                yield f"data: {text_message}\n\n"
+        finally:
+            payment_ws_manager.disconnect(connection)
+
+    async def create_payment(self, data: PaymentRequest, session: AsyncSession = Depends(db_session)):
         try:
-            order = session.exec(select(Order).where(Order.id == data.order_id)).first()
+            order = (await session.exec(select(Order).where(Order.id == data.order_id))).first()
             if not order:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
             
             if data.method == "pix":
-                return self.generate_pix_qrcode(data, session)
+                return await self.generate_pix_qrcode(data)
 
             # Pagamento comum
             expiration_time = datetime.now(timezone.utc) + timedelta(minutes=1)
@@ -78,8 +134,9 @@ class PaymentRouter(APIRouter):
                 expires_at=expiration_time
             )
             session.add(payment)
-            session.commit()
-            session.refresh(payment)
+            await session.commit()
+            await session.refresh(payment)
+            payment_expiry.schedule(payment.id, payment.expires_at)
 
             return {
                 "payment_id": payment.id,
@@ -88,20 +145,20 @@ class PaymentRouter(APIRouter):
             }
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             raise HTTPException(status_code=500, detail=str(e))
 
-    def get_payment(self, order_code: str, session: Session = Depends(db_session)):
+    async def get_payment(self, order_code: str, session: AsyncSession = Depends(db_session)):
             try:
-                order = session.exec(select(Order).where(Order.code == order_code)).first()
+                order = (await session.exec(select(Order).where(Order.code == order_code))).first()
 
                 if not order:
                     raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-                payment = session.exec(
+                payment = (await session.exec(
                     select(Payment)
                     .where(Payment.order_id == order.id)
-                ).first()
+                )).first()
 
                 if not payment:
                     raise HTTPException(status_code=404, detail="Pagamento não encontrado")
@@ -125,27 +182,50 @@ class PaymentRouter(APIRouter):
                 logging.error(f"PAGAMENTO >>> Erro ao buscar pagamento: {str(e)}")
                 raise HTTPException(status_code=500, detail="Erro interno ao buscar pagamento")
 
-    def generate_pix_qrcode(self, data: PaymentRequest, session: Session = Depends(db_session)):
+    async def lock_order_payments(self, session: AsyncSession, order_id: int) -> None:
+        """Serializa a criação de cobranças do pedido entre processos até o fim da transação."""
+        await session.exec(
+            text("SELECT pg_advisory_xact_lock(:namespace, :order_id)"),
+            params={"namespace": PIX_LOCK_NAMESPACE, "order_id": order_id},
+        )
+
+    async def in_own_session(self, fn, data: PaymentRequest):
+        """
+        Executa a criação da cobrança numa sessão própria: a task compartilhada pode durar mais
+        que a requisição que a iniciou (e que a sessão dela).
+        """
+        async with get_async_session_factory()() as session:
+            return await fn(data, session)
+
+    async def generate_pix_qrcode(self, data: PaymentRequest):
+        # Toques repetidos no mesmo pedido e valor recebem a mesma cobrança
+        return await pix_charges.run(
+            ("generate", data.order_id, data.amount),
+            lambda: self.in_own_session(self._generate_pix_qrcode, data),
+        )
+
+    async def _generate_pix_qrcode(self, data: PaymentRequest, session: AsyncSession):
         try:
-            order = session.exec(select(Order).where(Order.id == data.order_id)).first()
+            order = (await session.exec(select(Order).where(Order.id == data.order_id))).first()
             if not order:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
             
             logging.info(f"PAGAMENTO >>> PEDIDO ENVIADO: {order}")
+            await self.lock_order_payments(session, order.id)
 
             now_utc = datetime.now(timezone.utc)
 
             # Busca pagamento anterior (caso exista)
-            existing_payment = session.exec(
+            existing_payment = (await session.exec(
                 select(Payment)
                 .where(Payment.order_id == order.id, Payment.method == "pix")
                 .order_by(Payment.created_at.desc())
-            ).first()
+            )).first()
             
             logging.info(f"PAGAMENTO >>> PEDIDO EXISTENTE: {existing_payment}")
 
             if existing_payment:
-                if existing_payment.expires_at and existing_payment.expires_at > now_utc:
+                if existing_payment.expires_at and self.make_aware(existing_payment.expires_at) > now_utc:
                     # Ainda tá válido
                     return {
                         "qr_code": existing_payment.qr_code,
@@ -155,10 +235,9 @@ class PaymentRouter(APIRouter):
                         "status": "pending"
                     }
                 else:
-                    # Expirado, marca como cancelado
+                    # Expirado, marca como cancelado (gravado junto com o novo, sem soltar o lock)
                     existing_payment.status = PaymentStatus.CANCELED
                     session.add(existing_payment)
-                    session.commit()
 
             # Gera novo PIX via MP
             full_name = order.customer_name.strip()
@@ -179,7 +258,7 @@ class PaymentRouter(APIRouter):
             
             logging.info(f"PAGAMENTO >>> BODY PARA O PIX: {body}")
 
-            result = sdk.payment().create(body)
+            result = await payment_gateway.create_payment(body, self.pix_idempotency_key(order, existing_payment, data))
             logging.info(f"PAGAMENTO >>> RESULTADO DO SDK: {result}")
 
             response = result.get("response")
@@ -214,8 +293,9 @@ class PaymentRouter(APIRouter):
             )
             logging.info(f"PAGAMENTO >>> A SER SALVO: {payment}")
             session.add(payment)
-            session.commit()
-            session.refresh(payment)
+            await session.commit()
+            await session.refresh(payment)
+            payment_expiry.schedule(payment.id, payment.expires_at)
 
             return {
                 "qr_code": qr_code,
@@ -225,99 +305,55 @@ class PaymentRouter(APIRouter):
             }
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             logging.error(f"Erro ao gerar PIX: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Erro ao processar PIX: {str(e)}")
 
-    async def handle_webhook(self, request: Request, session: Session = Depends(db_session)):
+    async def handle_webhook(self, request: Request, session: AsyncSession = Depends(db_session)):
+        """
+        Só valida e grava a notificação na caixa de entrada; a consulta ao Mercado Pago, a
+        atualização do pagamento e o aviso por websocket ficam com os workers do webhook_inbox.
+        """
         try:
             body = await request.json()
+        except ValueError:
+            return {"status": "invalid_body"}
 
-            logging.info(f"MERCADO PAGO >>> Webhook recebido: {body}")
-
-            if body.get("type") != "payment":
-                return {"status": "ignored"}
-
-            payment_id = body.get("data", {}).get("id")
-
-            if not payment_id:
-                return {"status": "no_payment_id"}
+        logging.info(f"MERCADO PAGO >>> Webhook recebido: {body}")
 
-            try:
-                result = sdk.payment().get(payment_id)
-            except Exception as e:
-                logging.error(f"MERCADO PAGO >>> Erro ao buscar pagamento {payment_id} - {e}")
-                return {"status": "payment_not_found"}
-
-            mp_payment = result.get("response")
-
-            if not mp_payment:
-                logging.error(f"MERCADO PAGO >>> Pagamento {payment_id} não encontrado")
-                return {"status": "payment_not_found"}
-
-            transaction_code = str(mp_payment["id"])
-            status = mp_payment["status"]
-
-            payment = session.exec(
-                select(Payment).where(Payment.transaction_code == transaction_code)
-            ).first()
-
-            if not payment:
-                return {"status": "not_found"}
-
-            expires_at = payment.expires_at
-            if expires_at and expires_at.tzinfo is None:
-                expires_at = expires_at.replace(tzinfo=timezone.utc)
-
-            if expires_at and expires_at < datetime.now(timezone.utc):
-                return {"status": "expired"}
-
-            if status == "approved":
-                payment.status = PaymentStatus.PAID
-                payment.paid_at = datetime.now(timezone.utc)
-                payment.qr_code_base64 = None
-            elif status in ["rejected", "cancelled"]:
-                payment.status = PaymentStatus.CANCELED
-                payment.qr_code_base64 = None
-            elif payment.expires_at and payment.expires_at < datetime.now(timezone.utc):
-                payment.status = PaymentStatus.CANCELED
-                payment.qr_code_base64 = None
-            else:
-                payment.status = PaymentStatus.PENDING
-                
+        if not isinstance(body, dict) or body.get("type") != "payment":
+            return {"status": "ignored"}
 
-            payment.updated_at = datetime.now(timezone.utc)
-            session.add(payment)
-            session.commit()
-            
-            await payment_ws_manager.broadcast({
-                "type": "payment_status",
-                "transaction_code": transaction_code,
-                "status": payment.status.value,
-                "paid_at": payment.paid_at.isoformat() if payment.paid_at else None
-            })
+        data = body.get("data")
+        payment_id = data.get("id") if isinstance(data, dict) else None
 
-            return {"status": "ok"}
+        if not payment_id:
+            return {"status": "no_payment_id"}
 
+        try:
+            await webhook_inbox.enqueue(session, str(payment_id), body.get("action"), body)
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             logging.error(f"Erro interno no webhook -> {e}")
-            return {"status": "internal_error", "detail": str(e)}
+            # Sem gravar o evento, o erro faz o Mercado Pago reenviar a notificação
+            raise HTTPException(status_code=500, detail="Erro ao registrar o webhook")
 
-    def generate_card_payment(self, data: PaymentRequest, session: Session = Depends(db_session)):
+        return {"status": "queued"}
+
+    async def generate_card_payment(self, data: PaymentRequest, session: AsyncSession = Depends(db_session)):
         try:
-            order = session.exec(select(Order).where(Order.id == data.order_id)).first()
+            order = (await session.exec(select(Order).where(Order.id == data.order_id))).first()
             if not order:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
             # Verifica se já existe pagamento pendente
-            existing_payment = session.exec(
+            existing_payment = (await session.exec(
                 select(Payment).where(
                     Payment.order_id == data.order_id,
                     Payment.status == PaymentStatus.PENDING,
                     Payment.method == "card"
                 )
-            ).first()
+            )).first()
 
             now_utc = datetime.now(timezone.utc)
 
@@ -331,7 +367,7 @@ class PaymentRouter(APIRouter):
                 existing_payment.status = PaymentStatus.CANCELED
                 existing_payment.updated_at = now_utc
                 session.add(existing_payment)
-                session.commit()
+                await session.commit()
 
             # Prepara dados do pagador
             full_name = order.customer_name.strip()
@@ -358,7 +394,7 @@ class PaymentRouter(APIRouter):
                 "capture": True  # Captura automática
             }
 
-            result = sdk.payment().create(body)
+            result = await payment_gateway.create_payment(body)
             response = result["response"]
 
             if response.get("status") not in ["approved", "in_process", "pending"]:
@@ -380,8 +416,9 @@ class PaymentRouter(APIRouter):
                 payment.paid_at = now_utc
 
             session.add(payment)
-            session.commit()
-            session.refresh(payment)
+            await session.commit()
+            await session.refresh(payment)
+            payment_expiry.schedule(payment.id, payment.expires_at)
 
             return {
                 "payment_id": response["id"],
@@ -390,33 +427,40 @@ class PaymentRouter(APIRouter):
             }
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             raise HTTPException(status_code=500, detail=str(e))
 
-    def get_payment_by_transaction_code(self, transaction_code: str, session: Session = Depends(db_session)):
+    async def get_payment_by_transaction_code(self, transaction_code: str, session: AsyncSession = Depends(db_session)):
         try:
-            payment = session.exec(select(Payment).where(Payment.transaction_code == transaction_code)).first()
+            payment = await payment_by_transaction_code(session, transaction_code)
             if not payment:
                 raise HTTPException(status_code=404, detail="Pagamento não encontrado")
             return payment
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             raise HTTPException(status_code=500, detail=str(e))
         
-    def regenerate_pix_qrcode(self, data: PaymentRequest, session: Session = Depends(db_session)):
+    async def regenerate_pix_qrcode(self, data: PaymentRequest):
+        return await pix_charges.run(
+            ("regenerate", data.order_id, data.amount),
+            lambda: self.in_own_session(self._regenerate_pix_qrcode, data),
+        )
+
+    async def _regenerate_pix_qrcode(self, data: PaymentRequest, session: AsyncSession):
         try:
-            order = session.exec(select(Order).where(Order.id == data.order_id)).first()
+            order = (await session.exec(select(Order).where(Order.id == data.order_id))).first()
             if not order:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
+            await self.lock_order_payments(session, order.id)
 
             now_utc = datetime.now(timezone.utc)
 
             # Busca o último pagamento Pix
-            existing_payment = session.exec(
+            existing_payment = (await session.exec(
                 select(Payment)
                 .where(Payment.order_id == order.id, Payment.method == "pix")
                 .order_by(Payment.created_at.desc())
-            ).first()
+            )).first()
 
             if existing_payment:
                 if existing_payment.status == PaymentStatus.PAID:
@@ -429,7 +473,6 @@ class PaymentRouter(APIRouter):
                     existing_payment.qr_code_base64 = None
                     existing_payment.updated_at = now_utc
                     session.add(existing_payment)
-                    session.commit()
 
             # Gera novo PIX via MP
             full_name = order.customer_name.strip()
@@ -448,7 +491,7 @@ class PaymentRouter(APIRouter):
                 },
             }
 
-            result = sdk.payment().create(body)
+            result = await payment_gateway.create_payment(body, self.pix_idempotency_key(order, existing_payment, data))
             response = result["response"]
 
             if response.get("status") != "pending":
@@ -476,8 +519,9 @@ class PaymentRouter(APIRouter):
                 created_at=now_utc
             )
             session.add(payment)
-            session.commit()
-            session.refresh(payment)
+            await session.commit()
+            await session.refresh(payment)
+            payment_expiry.schedule(payment.id, payment.expires_at)
 
             return {
                 "qr_code": qr_code,
@@ -487,15 +531,22 @@ class PaymentRouter(APIRouter):
             }
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             logging.error(f"Erro ao gerar PIX: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Erro ao processar PIX: {str(e)}")
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             logging.error(f"Erro ao regenerar QR Code do Pix: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail="Erro ao tentar regenerar o Pix")
 
+    def pix_idempotency_key(self, order: Order, previous: Optional[Payment], data: PaymentRequest) -> str:
+        """
+        Mesma chave enquanto o pedido não ganhar um pagamento novo: se a cobrança foi criada no
+        Mercado Pago mas não gravada aqui, a nova tentativa recebe a mesma cobrança.
+        """
+        return f"pix-{order.id}-{previous.id if previous else 0}-{data.amount}"
+
     def make_aware(self, dt: datetime) -> datetime:
         """Convert naive datetime to timezone-aware (UTC)"""
         if dt.tzinfo is None:
@@ -507,11 +558,11 @@ class PaymentRouter(APIRouter):
         return datetime.now(timezone.utc)
     
     
-    def change_payment_method(
+    async def change_payment_method(
         self, 
         order_code: str, 
         data: dict,
-        session: Session = Depends(db_session)
+        session: AsyncSession = Depends(db_session)
     ):
         """
         Altera o método de pagamento de um pedido existente.
@@ -522,9 +573,12 @@ class PaymentRouter(APIRouter):
         """
         try:
             # Busca o pedido
-            order = session.exec(select(Order).where(Order.code == order_code)).first()
+            order = (await session.exec(select(Order).where(Order.code == order_code))).first()
             if not order:
                 raise HTTPException(status_code=404, detail="Pedido não encontrado")
+            # Relido depois do lock: uma troca concorrente já pode ter gravado o novo método
+            await self.lock_order_payments(session, order.id)
+            await session.refresh(order)
             
             new_method = data.get("method")
             if not new_method or new_method not in ["pix", "dinheiro", "cartao"]:
@@ -566,10 +620,10 @@ class PaymentRouter(APIRouter):
             now_utc = datetime.now(timezone.utc)
             
             # Busca pagamentos existentes para este pedido
-            existing_payments = session.exec(
+            existing_payments = (await session.exec(
                 select(Payment)
                 .where(Payment.order_id == order.id)
-            ).all()
+            )).all()
             
             # Se mudou para PIX, cancela todos os pagamentos existentes e cria um novo PIX
             if new_method == "pix":
@@ -596,7 +650,7 @@ class PaymentRouter(APIRouter):
                     },
                 }
 
-                result = sdk.payment().create(body)
+                result = await payment_gateway.create_payment(body)
                 response = result["response"]
 
                 if response.get("status") != "pending":
@@ -626,8 +680,9 @@ class PaymentRouter(APIRouter):
                     created_at=now_utc
                 )
                 session.add(new_payment)
-                session.commit()
-                session.refresh(new_payment)
+                await session.commit()
+                await session.refresh(new_payment)
+                payment_expiry.schedule(new_payment.id, new_payment.expires_at)
                 
                 return {
                     "qr_code": qr_code,
@@ -656,7 +711,7 @@ class PaymentRouter(APIRouter):
                 )
                 session.add(new_payment)
 
-                session.commit()
+                await session.commit()
                 
                 return {
                     "status": "success",
@@ -668,7 +723,7 @@ class PaymentRouter(APIRouter):
         except HTTPException:
             raise  # Re-lança exceções HTTP que já foram tratadas
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             logging.error(f"Erro ao alterar método de pagamento: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500, 
@@ -7,6 +7,7 @@ from app.models.product.product import Product
 from app.models.user.user import User
 from app.auth.auth import AuthRouter
 from app.database.connection import get_session
+from app.helpers.product.catalog import bump_catalog_version
 from app.schemas.product.category import CategoryCreate, CategoryUpdate
 
 db_session = get_session
@@ -33,6 +34,7 @@ class CategoryRouter(APIRouter):
             allowed_types=category_request.allowed_types
         )
         session.add(category)
+        bump_catalog_version(session)
         session.commit()
         session.refresh(category)
         return category
@@ -67,7 +69,7 @@ class CategoryRouter(APIRouter):
                 .values(is_active=True, deactivated_by_category=False)
             )
 
-
+        bump_catalog_version(session)
         session.commit()
         session.refresh(category)
         return category
@@ -78,5 +80,6 @@ class CategoryRouter(APIRouter):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Categoria não encontrada")
 
         session.delete(category)
+        bump_catalog_version(session)
         session.commit()
         return {"message": "Categoria deletada com sucesso"}
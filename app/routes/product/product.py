@@ -6,20 +6,24 @@ import uuid
 import json
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Body, Depends, HTTPException, status, UploadFile, Form
-from sqlmodel import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response, status, UploadFile, Form
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.cache.cache import CacheManager
 from app.configuration.settings import Configuration
 from app.models.product.product import Product
 from app.models.product.category import Category
 from app.models.user.user import User
 from app.auth.auth import AuthRouter
-from app.database.connection import get_session
+from app.database.connection import get_async_session, get_session
+from app.helpers.product.catalog import bump_catalog_version
 from app.schemas.product.product import ProductCreate, ProductUpdate, ProductResponse
 from app.integration.R2Service import R2Service
 
 
 db_session = get_session
+async_db_session = get_async_session
 get_current_user = AuthRouter().get_current_user
 
 PRODUCT_IMAGE_DIR = "assets/img/product"
@@ -29,6 +33,31 @@ configuration = Configuration()
 
 cache_manager = CacheManager()
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o If-None-Match do cliente (lista, "*" ou ETag fraco) com o ETag atual."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _choose_encoding(accept_encoding: Optional[str], snapshot: dict) -> Optional[str]:
+    """Escolhe a variante pré-comprimida aceita pelo cliente (brotli tem preferência)."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in ("br", "gzip"):
+        if snapshot.get(encoding) and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
 class ProductRouter(APIRouter):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -44,8 +73,10 @@ class ProductRouter(APIRouter):
         self.add_api_route("/products/{product_id}", self.delete_product, methods=["DELETE"], response_model=dict)
         self.add_api_route("/products/{product_id}/image", self.update_product_image, methods=["POST"], response_model=ProductResponse)
 
-    def get_product(self, product_id: int, session: Session = Depends(db_session)):
-        product = session.get(Product, product_id)
+    async def get_product(self, product_id: int, session: AsyncSession = Depends(async_db_session)):
+        product = (await session.exec(
+            select(Product).where(Product.id == product_id).options(selectinload(Product.category))
+        )).first()
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
         return product
@@ -201,18 +232,28 @@ class ProductRouter(APIRouter):
         product = Product.from_orm(product_data)
         product.updated_at = datetime.now(timezone.utc)
         session.add(product)
+        bump_catalog_version(session)
         session.commit()
         session.refresh(product)
-        await cache_manager.cache_data("product_data", {})
         
         return product
 
-    async def list_products(self, session: Session = Depends(db_session)):
-        """Lista todos os produtos (usando cache)"""
+    async def list_products(self, request: Request, session: AsyncSession = Depends(async_db_session)):
+        """Lista todos os produtos (usando cache e respondendo 304 quando o cliente já tem a versão atual)"""
         try:
-            data = await cache_manager.get_products_data(session)
-            # Retorne sempre a mesma estrutura - apenas o array de produtos
-            return data["products"]  # Ou data.products dependendo do seu schema
+            version = await cache_manager.get_catalog_version(session)
+            etag = cache_manager.catalog_etag(version)
+            headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            snapshot = await cache_manager.get_products_snapshot(session, version)
+            encoding = _choose_encoding(request.headers.get("accept-encoding"), snapshot)
+            if encoding:
+                headers["Content-Encoding"] = encoding
+                return Response(content=snapshot[encoding], media_type="application/json", headers=headers)
+            return Response(content=snapshot["body"], media_type="application/json", headers=headers)
         except Exception as e:
             logging.error(f"Erro ao listar produtos: {str(e)}")
             raise HTTPException(
@@ -241,6 +282,7 @@ class ProductRouter(APIRouter):
 
         product.updated_at = datetime.now(timezone.utc)
         session.add(product)
+        bump_catalog_version(session)
         session.commit()
         session.refresh(product)
         return product
@@ -277,6 +319,7 @@ class ProductRouter(APIRouter):
 
             product.image = image_url
             session.add(product)
+            bump_catalog_version(session)
             session.commit()
             session.refresh(product)
             return product
@@ -296,19 +339,14 @@ class ProductRouter(APIRouter):
             raise HTTPException(status_code=404, detail="Produto não encontrado")
 
         # Guarda o original se ainda não estiver guardado
-        if product.prices_by_size:
+        if product.prices_by_size and not (product.is_promotion and product.old_prices_by_size):
             product.old_prices_by_size = product.prices_by_size.copy()
 
+        # Aplica o desconto uma única vez, sempre sobre o preço original
+        if product.old_prices_by_size:
             product.prices_by_size = {
                 k: round(v * (1 - discount_percentage / 100), 2)
-                for k, v in product.prices_by_size.items()
-            }
-
-        # Aplica o desconto
-        if product.prices_by_size:
-            product.prices_by_size = {
-                k: round(v * (1 - discount_percentage / 100), 2)
-                for k, v in product.prices_by_size.items()
+                for k, v in product.old_prices_by_size.items()
             }
 
         product.is_promotion = True
@@ -318,6 +356,7 @@ class ProductRouter(APIRouter):
         product.updated_at = datetime.now(timezone.utc)
 
         session.add(product)
+        bump_catalog_version(session)
         session.commit()
         session.refresh(product)
         return product
@@ -342,6 +381,7 @@ class ProductRouter(APIRouter):
         product.updated_at = datetime.now(timezone.utc)
 
         session.add(product)
+        bump_catalog_version(session)
         session.commit()
         session.refresh(product)
 
@@ -356,12 +396,18 @@ class ProductRouter(APIRouter):
         ).all()
 
         for product in products:
+            # Restaura o preço cheio, como em clear_product_promotion
+            if product.old_prices_by_size:
+                product.prices_by_size = product.old_prices_by_size
+                product.old_prices_by_size = None
+            product.is_promotion = False
             product.promotion_discount_percentage = None
             product.promotion_start_at = None
             product.promotion_end_at = None
             product.updated_at = datetime.now(timezone.utc)
             session.add(product)
 
+        bump_catalog_version(session)
         session.commit()
         return {"message": f"{len(products)} promoções expiradas removidas com sucesso."}
         
@@ -374,6 +420,7 @@ class ProductRouter(APIRouter):
         product.updated_at = datetime.now(timezone.utc)
         product.deleted_at = datetime.now(timezone.utc)
         session.add(product)
+        bump_catalog_version(session)
         session.commit()
         session.refresh(product)
         return {"message": f"Produto com ID {product_id} inativado com sucesso"}
@@ -384,5 +431,6 @@ class ProductRouter(APIRouter):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produto não encontrado")
 
         session.delete(product)
+        bump_catalog_version(session)
         session.commit()
         return {"message": f"Produto com ID {product_id} excluído permanentemente"}
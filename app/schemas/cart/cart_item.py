@@ -1,6 +1,6 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
-from pydantic import BaseModel, conint
+from pydantic import BaseModel, Field, conint, model_validator
 
 from app.models.product.product import Product
 
@@ -24,6 +24,31 @@ class CartItemUpdate(BaseModel):
     observation: Optional[str] = None
     options: Optional[Dict[str, float]] = None
 
+# Limite de operações por requisição em /cart/{cart_code}/items/batch
+MAX_BATCH_OPERATIONS = 50
+
+class CartItemOperation(BaseModel):
+    """Operação do lote: `add` usa product_id/size; `update` e `remove` usam item_id."""
+    op: Literal["add", "update", "remove"]
+    item_id: Optional[int] = None
+    product_id: Optional[int] = None
+    quantity: Optional[conint(ge=1)] = None # type: ignore
+    size: Optional[str] = None
+    selected_flavors: Optional[List[Dict[str, Any]]] = None
+    observation: Optional[str] = None
+    options: Optional[Dict[str, float]] = None
+
+    @model_validator(mode="after")
+    def check_required_fields(self):
+        if self.op == "add" and (self.product_id is None or self.size is None):
+            raise ValueError("Operação 'add' exige product_id e size")
+        if self.op != "add" and self.item_id is None:
+            raise ValueError(f"Operação '{self.op}' exige item_id")
+        return self
+
+class CartItemBatch(BaseModel):
+    operations: List[CartItemOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
 class CartItemRead(CartItemBase):
     id: int
     product: Product
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from sqlmodel import SQLModel
 
@@ -39,4 +39,13 @@ class PromoCodeResponse(SQLModel):
     created_at: datetime
     updated_at: datetime
 
+class PromoCodeValidateRequest(SQLModel):
+    codes: List[str]
+    subtotal: Optional[float] = None
 
+class PromoCodeValidation(SQLModel):
+    code: str
+    valid: bool
+    discount_percentage: Optional[float] = None
+    description: Optional[str] = None
+    detail: Optional[str] = None
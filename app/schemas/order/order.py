@@ -15,11 +15,13 @@ class CustomerCreate(BaseModel):
 class OrderItemCreate(BaseModel):
     product_id: int
     quantity: int
-    unit_price: float
-    total_price: float
+    # Valores do cliente são só conferidos: o servidor recalcula pela tabela de preços
+    unit_price: Optional[float] = None
+    total_price: Optional[float] = None
     size: Optional[str] = None
     selected_flavors: Optional[List[Dict[str, Any]]] = None
     observation: Optional[str] = None
+    options: Optional[Dict[str, float]] = None
     
     @validator('selected_flavors')
     def validate_flavors(cls, v):
@@ -57,8 +59,8 @@ class OrderCreate(BaseModel):
     items: List[OrderItemCreate]
     payment_method: str
     delivery_fee: float
-    total_amount: float
-    total_amount_with_discount: float
+    total_amount: Optional[float] = None
+    total_amount_with_discount: Optional[float] = None
     table_number: Optional[int] = None
     whatsapp_id: Optional[str] = None
     cart_code: Optional[str] = None
@@ -0,0 +1,524 @@
+# app/services/cart_store.py
+import asyncio
+import copy
+import logging
+import threading
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.cache.backends import CacheBackend, LRUBackend, RedisBackend
+from app.configuration.settings import Configuration
+from app.database.connection import get_async_engine, get_async_session_factory
+from app.models.cart.cart import Cart
+from app.models.cart.cart_item import CartItem
+from app.models.product.product import Product
+
+configuration = Configuration()
+
+CART_COLUMNS = tuple(column.name for column in Cart.__table__.columns)
+ITEM_COLUMNS = tuple(column.name for column in CartItem.__table__.columns)
+
+# Colunas que as rotas do store alteram; o resto do carrinho nunca é regravado por ele
+STORE_CART_COLUMNS = (
+    "whatsapp_id", "status", "promo_code", "promo_discount_percentage", "promo_applied_at",
+    "subtotal", "items_count", "discount", "delivery_fee", "updated_at", "version",
+)
+STORE_ITEM_COLUMNS = tuple(name for name in ITEM_COLUMNS if name not in ("id", "cart_id", "created_at"))
+
+class StoredCart:
+    """
+    Estado de um carrinho no store: colunas do carrinho e dos itens como dicionários simples
+    (serializáveis para o Redis). `version` conta as alterações no store; `cart["version"]` é a
+    versão da linha no banco de que o estado partiu, e `persisted` diz se a linha já existe.
+    """
+
+    def __init__(self, cart: dict, items: Dict[int, dict], version: int = 0, deleted: bool = False,
+                 persisted: bool = True):
+        self.cart = cart
+        self.items = items
+        self.version = version
+        self.deleted = deleted
+        self.persisted = persisted
+
+    @classmethod
+    def from_models(cls, cart: Cart, items: Iterable[CartItem], persisted: bool = True) -> "StoredCart":
+        return cls(
+            cart={name: getattr(cart, name) for name in CART_COLUMNS},
+            items={item.id: {name: getattr(item, name) for name in ITEM_COLUMNS} for item in items},
+            persisted=persisted,
+        )
+
+    @property
+    def code(self) -> str:
+        return self.cart["code"]
+
+    def find_item(self, item_id: int, size: Optional[str] = None) -> Optional[dict]:
+        item = self.items.get(item_id)
+        if item is None or (size is not None and item["size"] != size):
+            return None
+        return item
+
+    def recalculate(self) -> None:
+        """Totais recalculados em memória (mesmas regras de app/helpers/cart/totals.py)."""
+        subtotal = round(sum(
+            item["quantity"] * (item["unit_price"] + sum((item["options"] or {}).values()))
+            for item in self.items.values()
+        ), 2)
+        percentage = self.cart.get("promo_discount_percentage") or 0
+        self.cart["subtotal"] = subtotal
+        self.cart["items_count"] = sum(item["quantity"] for item in self.items.values())
+        self.cart["discount"] = round(subtotal * percentage / 100, 2) if percentage else 0.0
+
+    def to_model(self, products: Dict[int, Product]) -> Cart:
+        """Carrinho transiente (fora da sessão) com itens e produtos, para as respostas da API."""
+        cart = Cart(**self.cart)
+        items = []
+        for fields in sorted(self.items.values(), key=lambda item: item["id"]):
+            item = CartItem(**fields)
+            set_committed_value(item, "product", products.get(fields["product_id"]))
+            items.append(item)
+        set_committed_value(cart, "items", items)
+        return cart
+
+class IdAllocator:
+    """
+    Ids reservados em blocos com nextval() da sequência da tabela, para que carrinhos e itens
+    criados só em memória já tenham o id definitivo (o INSERT posterior usa o mesmo id).
+    """
+
+    def __init__(self, block_size: int = 50):
+        self.block_size = block_size
+        self._pools: Dict[str, List[int]] = {}
+        self._lock = asyncio.Lock()
+
+    async def next_id(self, session: AsyncSession, table: str) -> int:
+        async with self._lock:
+            pool = self._pools.setdefault(table, [])
+            if not pool:
+                result = await session.exec(
+                    text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+                    params={"table": table, "n": self.block_size},
+                )
+                pool.extend(sorted((row[0] for row in result), reverse=True))
+            return pool.pop()
+
+class DirtySet:
+    """
+    Códigos com alterações ainda não gravadas no banco (memória do processo). Os métodos
+    assíncronos são usados pelas rotas e pelo flusher; `discard_many` pelos jobs, que rodam em threads.
+    """
+
+    def __init__(self):
+        self._codes: Set[str] = set()
+        self._lock = threading.Lock()
+
+    async def add(self, code: str) -> None:
+        with self._lock:
+            self._codes.add(code)
+
+    async def discard(self, code: str) -> None:
+        self.discard_many([code])
+
+    async def contains(self, code: str) -> bool:
+        with self._lock:
+            return code in self._codes
+
+    async def members(self) -> Set[str]:
+        with self._lock:
+            return set(self._codes)
+
+    def discard_many(self, codes: Iterable[str]) -> None:
+        with self._lock:
+            self._codes.difference_update(codes)
+
+class RedisDirtySet(DirtySet):
+    """
+    Conjunto de pendências guardado só no Redis, compartilhado pelos workers: o flusher de
+    qualquer um deles grava os carrinhos alterados pelos outros (inclusive por um que caiu),
+    e o checkout vê as pendências feitas em outro worker.
+    """
+
+    def __init__(self, client, async_client, key: str = "thomaggio:cart_store:dirty"):
+        super().__init__()
+        self.client = client
+        self.async_client = async_client
+        self.key = key
+
+    async def add(self, code: str) -> None:
+        await self.async_client.sadd(self.key, code)
+
+    async def discard(self, code: str) -> None:
+        await self.async_client.srem(self.key, code)
+
+    async def contains(self, code: str) -> bool:
+        return bool(await self.async_client.sismember(self.key, code))
+
+    async def members(self) -> Set[str]:
+        codes = await self.async_client.smembers(self.key)
+        return {code.decode() if isinstance(code, bytes) else code for code in codes}
+
+    def discard_many(self, codes: Iterable[str]) -> None:
+        codes = list(codes)
+        if codes:
+            self.client.srem(self.key, *codes)
+
+class RedisCartLock:
+    """
+    Lock por chave no Redis (SET NX PX), para serializar as alterações de um carrinho entre
+    workers. Quem espera fica bloqueado num BLPOP da fila de aviso da chave, que o dono
+    alimenta ao liberar; se o dono cair, a espera termina quando o lock vence.
+    """
+
+    # Só apaga a chave se ela ainda for deste dono (o lock pode ter vencido e sido tomado por outro)
+    RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) ~= ARGV[1] then return 0 end
+        redis.call('del', KEYS[1])
+        redis.call('del', KEYS[2])
+        redis.call('rpush', KEYS[2], 1)
+        redis.call('pexpire', KEYS[2], ARGV[2])
+        return 1
+    """
+
+    def __init__(self, client, prefix: str = "thomaggio:cart_store:lock:", ttl_ms: int = 5000, timeout: float = 5.0):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_ms = ttl_ms
+        self.timeout = timeout
+
+    async def acquire(self, code: str) -> str:
+        key = f"{self.prefix}{code}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.timeout
+        while not await self.client.set(key, token, nx=True, px=self.ttl_ms):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Carrinho {code} bloqueado por outro worker")
+            expires_in = await self.client.pttl(key)
+            if expires_in > 0:
+                # Timeout 0 no BLPOP é espera sem fim: o mínimo fica em 10 ms
+                wait = max(min(remaining, expires_in / 1000), 0.01)
+                await self.client.blpop([f"{key}:released"], timeout=wait)
+        return token
+
+    async def release(self, code: str, token: str) -> None:
+        key = f"{self.prefix}{code}"
+        await self.client.eval(self.RELEASE_SCRIPT, 2, key, f"{key}:released", token, self.ttl_ms)
+
+class CartStore:
+    """
+    Carrinhos ativos mantidos em memória (ou no Redis) com gravação adiada: as rotas alteram o
+    estado e marcam o código como pendente; um flusher grava os pendentes em lote a cada
+    CART_STORE_FLUSH_INTERVAL segundos. No checkout o carrinho é gravado na hora.
+
+    A gravação só regrava as colunas do store e é condicional à versão da linha: se outro
+    escritor (jobs, checkout, conferência de totais) alterou o carrinho depois da leitura, a
+    alteração do store é descartada e o carrinho é relido do banco no próximo acesso. Com Redis
+    as pendências são compartilhadas e um lock no Redis garante um único flush por vez entre os
+    workers (dois flushes do mesmo carrinho se veriam como conflito).
+    """
+
+    key_prefix = "cart_store:"
+
+    def __init__(self, backend: Optional[CacheBackend] = None, dirty: Optional[DirtySet] = None,
+                 flush_interval: float = 0.25, ttl: int = 3600, remote_lock: Optional[RedisCartLock] = None,
+                 flush_lock: Optional[RedisCartLock] = None):
+        self.backend = backend
+        self.dirty = dirty or DirtySet()
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.remote_lock = remote_lock
+        self.flush_lock = flush_lock
+        self.ids = IdAllocator()
+        self.stats = {"hits": 0, "loads": 0, "flushes": 0, "flushed_carts": 0, "flush_errors": 0,
+                      "conflicts": 0, "lost": 0}
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_configuration(cls) -> "CartStore":
+        kind = configuration.cart_store
+        remote_lock = flush_lock = None
+        if kind == "memory":
+            if configuration.web_concurrency > 1:
+                # Cada worker teria a sua cópia do carrinho e gravaria por cima da dos outros
+                raise RuntimeError(
+                    f"CART_STORE=memory exige um único worker (WEB_CONCURRENCY={configuration.web_concurrency}); "
+                    "use CART_STORE=redis"
+                )
+            # Sem limite de entradas: um carrinho pendente nunca pode ser descartado por LRU
+            backend = LRUBackend(max_entries=0, max_bytes=0, sweep_interval=configuration.cache_sweep_interval)
+            dirty = DirtySet()
+        elif kind == "redis":
+            backend = RedisBackend(url=configuration.redis_url, prefix="thomaggio:")
+            # Cliente assíncrono para o event loop; o síncrono do backend fica para os jobs (threads)
+            import redis.asyncio
+            async_client = redis.asyncio.Redis.from_url(configuration.redis_url)
+            dirty = RedisDirtySet(backend.client, async_client)
+            remote_lock = RedisCartLock(async_client)
+            flush_lock = RedisCartLock(async_client, prefix="thomaggio:cart_store:", ttl_ms=30000, timeout=30.0)
+        else:
+            return cls()
+        return cls(backend, dirty, configuration.cart_store_flush_interval, configuration.cart_store_ttl,
+                   remote_lock, flush_lock)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _key(self, code: str) -> str:
+        return f"{self.key_prefix}{code}"
+
+    @asynccontextmanager
+    async def lock(self, code: str):
+        """Serializa as alterações de um mesmo carrinho no worker e, com Redis, entre os workers."""
+        local = self._locks.get(code)
+        if local is None:
+            local = self._locks[code] = asyncio.Lock()
+        async with local:
+            if self.remote_lock is None:
+                yield
+                return
+            token = await self.remote_lock.acquire(code)
+            try:
+                yield
+            finally:
+                await self.remote_lock.release(code, token)
+
+    @asynccontextmanager
+    async def _flushing(self):
+        """Um flush por vez no worker e, com Redis, entre os workers."""
+        async with self._flush_lock:
+            if self.flush_lock is None:
+                yield
+                return
+            token = await self.flush_lock.acquire("flush")
+            try:
+                yield
+            finally:
+                await self.flush_lock.release("flush", token)
+
+    # --- leitura e escrita do estado ---
+
+    async def get(self, session: AsyncSession, code: str) -> Optional[StoredCart]:
+        state = await self.backend.aget(self._key(code))
+        if state is not None:
+            self.stats["hits"] += 1
+            if state.deleted:
+                return None
+            # Cópia: uma alteração que falhe no meio não pode vazar para o estado guardado
+            return copy.deepcopy(state) if isinstance(self.backend, LRUBackend) else state
+
+        cart = (await session.exec(select(Cart).where(Cart.code == code))).scalars().first()
+        if cart is None:
+            return None
+        items = (await session.exec(select(CartItem).where(CartItem.cart_id == cart.id))).scalars().all()
+        state = StoredCart.from_models(cart, items)
+        await self.backend.aset(self._key(code), state, self.ttl)
+        self.stats["loads"] += 1
+        return state
+
+    async def save(self, state: StoredCart) -> None:
+        """Grava a alteração no store e agenda a gravação no banco."""
+        state.version += 1
+        state.cart["updated_at"] = datetime.now(timezone.utc)
+        await self.backend.aset(self._key(state.code), state, self.ttl)
+        await self.dirty.add(state.code)
+
+    async def new_cart(self, session: AsyncSession, cart: Cart) -> StoredCart:
+        cart.id = await self.ids.next_id(session, Cart.__tablename__)
+        state = StoredCart.from_models(cart, [], persisted=False)
+        await self.save(state)
+        return state
+
+    async def new_item_id(self, session: AsyncSession) -> int:
+        return await self.ids.next_id(session, CartItem.__tablename__)
+
+    async def evict(self, code: str) -> None:
+        """Tira o carrinho do store (ex.: depois do checkout, quando o banco passa a ser a fonte)."""
+        await self.backend.adelete(self._key(code))
+        await self.dirty.discard(code)
+
+    def evict_many(self, codes: Iterable[str]) -> None:
+        """Usado pelos jobs (threads) que alteram carrinhos direto no banco; sem store ativo não faz nada."""
+        if not self.enabled:
+            return
+        codes = list(codes)
+        for code in codes:
+            self.backend.delete(self._key(code))
+        self.dirty.discard_many(codes)
+
+    # --- gravação no banco ---
+
+    async def flush(self, codes: Optional[Iterable[str]] = None) -> int:
+        """Grava os carrinhos pendentes (ou os informados) em uma única transação."""
+        async with self._flushing():
+            codes = list(await self.dirty.members() if codes is None else codes)
+            states = [state for state in [await self.backend.aget(self._key(code)) for code in codes] if state is not None]
+            missing = set(codes) - {state.code for state in states}
+            for code in missing:
+                if await self.dirty.contains(code):
+                    # Venceu no store antes de ser gravado (banco fora do ar por mais que o TTL)
+                    self.stats["lost"] += 1
+                    logging.error(f"CARRINHO >>> Alterações do carrinho {code} perdidas: expirou no store antes de ser gravado")
+                await self.dirty.discard(code)
+            if not states:
+                return 0
+            # No backend em memória o estado é o mesmo objeto que as rotas alteram
+            versions = {state.code: state.version for state in states}
+
+            try:
+                async with get_async_session_factory()() as session:
+                    conflicts = await self._write(session, states)
+                    await session.commit()
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                logging.error(f"CARRINHO >>> Falha ao gravar {len(states)} carrinhos do store: {e}")
+                await self._keep_pending(states)
+                raise
+
+            for state in states:
+                async with self.lock(state.code):
+                    if state.code in conflicts:
+                        self.stats["conflicts"] += 1
+                        logging.warning(
+                            f"CARRINHO >>> Carrinho {state.code} alterado fora do store; alterações pendentes descartadas"
+                        )
+                        await self.evict(state.code)
+                        continue
+                    if state.deleted:
+                        await self.evict(state.code)
+                        continue
+                    current = await self.backend.aget(self._key(state.code))
+                    if current is None:
+                        await self.dirty.discard(state.code)
+                        continue
+                    # A linha agora está na versão gravada; alterações feitas durante a gravação partem dela
+                    current.persisted = True
+                    current.cart["version"] = state.cart["version"] + 1
+                    if current.version == versions[state.code]:
+                        await self.dirty.discard(state.code)
+                    await self.backend.aset(self._key(state.code), current, self.ttl)
+            self.stats["flushes"] += 1
+            self.stats["flushed_carts"] += len(states) - len(conflicts)
+            return len(states) - len(conflicts)
+
+    async def _keep_pending(self, states: List[StoredCart]) -> None:
+        """Renova o TTL dos pendentes depois de uma falha, para não vencerem antes da próxima tentativa."""
+        for state in states:
+            try:
+                async with self.lock(state.code):
+                    current = await self.backend.aget(self._key(state.code))
+                    if current is not None:
+                        await self.backend.aset(self._key(state.code), current, self.ttl)
+            except Exception as e:
+                logging.warning(f"CARRINHO >>> Não foi possível renovar o carrinho {state.code} no store: {e}")
+
+    async def _write(self, session: AsyncSession, states: List[StoredCart]) -> Set[str]:
+        """
+        Grava os estados e devolve os códigos em conflito: a linha mudou de versão (ou sumiu)
+        desde a leitura. As linhas existentes ficam travadas até o commit.
+        """
+        existing = [state for state in states if state.persisted]
+        current: Dict[int, int] = {}
+        if existing:
+            rows = await session.exec(
+                select(Cart.id, Cart.version)
+                .where(Cart.id.in_([state.cart["id"] for state in existing]))
+                .with_for_update()
+            )
+            current = dict(rows.all())
+        conflicts = {state.code for state in existing if current.get(state.cart["id"]) != state.cart["version"]}
+        states = [state for state in states if state.code not in conflicts]
+
+        removed_ids = [state.cart["id"] for state in states if state.deleted and state.persisted]
+        if removed_ids:
+            await session.exec(delete(CartItem).where(CartItem.cart_id.in_(removed_ids)))
+            await session.exec(delete(Cart).where(Cart.id.in_(removed_ids)))
+
+        live = [state for state in states if not state.deleted]
+        if not live:
+            return conflicts
+
+        # O estado só passa para a nova versão depois do commit (ver flush)
+        statement = pg_insert(Cart).values([
+            {**{name: state.cart[name] for name in CART_COLUMNS}, "version": state.cart["version"] + 1}
+            for state in live
+        ])
+        await session.exec(statement.on_conflict_do_update(
+            index_elements=[Cart.id],
+            set_={name: statement.excluded[name] for name in STORE_CART_COLUMNS},
+            # Já conferido sob o lock acima; mantido para a gravação nunca passar por cima de outra
+            where=Cart.version == statement.excluded.version - 1,
+        ))
+
+        cart_ids = [state.cart["id"] for state in live]
+        item_rows = [item for state in live for item in state.items.values()]
+        kept_ids = [item["id"] for item in item_rows]
+        # Itens removidos em memória: tudo do carrinho que não está mais no estado
+        statement = delete(CartItem).where(CartItem.cart_id.in_(cart_ids))
+        if kept_ids:
+            statement = statement.where(CartItem.id.not_in(kept_ids))
+        await session.exec(statement)
+        if item_rows:
+            statement = pg_insert(CartItem).values([{name: row[name] for name in ITEM_COLUMNS} for row in item_rows])
+            await session.exec(statement.on_conflict_do_update(
+                index_elements=[CartItem.id],
+                set_={name: statement.excluded[name] for name in STORE_ITEM_COLUMNS},
+            ))
+        return conflicts
+
+    async def checkout(self, code: str) -> None:
+        """Garante que o carrinho está no banco antes de virar pedido."""
+        if self.enabled and await self.dirty.contains(code):
+            await self.flush([code])
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Os carrinhos continuam pendentes e entram no próximo ciclo
+                await asyncio.sleep(self.flush_interval * 4)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        if get_async_engine().dialect.name != "postgresql":
+            logging.warning("CARRINHO >>> Store de carrinhos requer Postgres (nextval/ON CONFLICT); desativado")
+            self.backend = None
+            return
+        pending = await self.dirty.members()
+        if pending:
+            logging.warning(f"CARRINHO >>> Gravando {len(pending)} carrinhos pendentes de outro processo")
+            await self.flush(pending)
+        self._task = asyncio.create_task(self._run())
+        logging.info(f"CARRINHO >>> Store de carrinhos ativo ({self.backend.name}, flush a cada {self.flush_interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            flushed = await self.flush()
+            logging.info(f"CARRINHO >>> Store encerrado; {flushed} carrinhos gravados")
+
+    async def get_stats(self) -> dict:
+        pending = len(await self.dirty.members()) if self.enabled else 0
+        return {"enabled": self.enabled, "pending": pending, **self.stats}
+
+cart_store = CartStore.from_configuration()
@@ -0,0 +1,103 @@
+# app/services/payment_events.py
+import asyncio
+import json
+import logging
+import asyncpg
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlmodel import Session
+from app.database.connection import get_database_url
+from app.tasks.websockets.ws_manager import payment_ws_manager
+
+PAYMENT_STATUS_CHANNEL = "payment_status"
+
+def notify_payment_status(session: Session, changes: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+    """
+    Avisa os processos web de mudanças de status feitas fora deles (jobs, no scheduler da API
+    ou no worker de jobs). `changes` são (transaction_code, status, order_code); o NOTIFY faz
+    parte da transação da sessão e só é entregue se ela for confirmada.
+    """
+    payloads = [
+        json.dumps({"transaction_code": transaction_code, "status": status, "order_code": order_code})
+        for transaction_code, status, order_code in changes
+    ]
+    if payloads:
+        session.exec(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            params={"channel": PAYMENT_STATUS_CHANNEL, "payloads": payloads},
+        )
+
+class PaymentStatusListener:
+    """
+    LISTEN no canal de status de pagamento, em cada processo web: o que chega é entregue aos
+    inscritos da transação e do pedido no payment_ws_manager deste processo. Usa uma conexão
+    asyncpg própria, fora do pool; se ela cair, é refeita depois de `retry_interval` segundos
+    (avisos enviados nesse intervalo se perdem, como numa conexão de websocket que caiu).
+    """
+
+    def __init__(self, channel: str = PAYMENT_STATUS_CHANNEL, retry_interval: float = 5.0):
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self._task: Optional[asyncio.Task] = None
+        self._attempted: Optional[asyncio.Event] = None
+        self.stats = {"received": 0, "errors": 0, "reconnects": 0}
+
+    @staticmethod
+    def _connect_args() -> dict:
+        # Mesmos argumentos que o dialeto asyncpg do SQLAlchemy monta (host vazio vira PGHOST/socket)
+        return make_url(get_database_url()).translate_connect_args(username="user")
+
+    def _deliver(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            payment_ws_manager.publish_status(data["transaction_code"], data["status"], order_code=data.get("order_code"))
+        except (ValueError, KeyError) as e:
+            self.stats["errors"] += 1
+            logging.warning(f"PAGAMENTO >>> Aviso inválido no canal {channel}: {e}")
+            return
+        self.stats["received"] += 1
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(**self._connect_args())
+        try:
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(self.channel, self._deliver)
+            logging.info(f"PAGAMENTO >>> Escutando o canal {self.channel}")
+            self._attempted.set()
+            await closed.wait()
+        finally:
+            if not connection.is_closed():
+                await connection.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+                logging.warning(f"PAGAMENTO >>> Conexão do canal {self.channel} encerrada")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"PAGAMENTO >>> Erro ao escutar o canal {self.channel}: {e}")
+            finally:
+                self._attempted.set()
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(self.retry_interval)
+
+    async def start(self) -> None:
+        # Espera a primeira tentativa: avisos da subida não se perdem se o banco estiver no ar
+        self._attempted = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self._attempted.wait()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+payment_status_listener = PaymentStatusListener()
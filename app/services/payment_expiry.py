@@ -0,0 +1,146 @@
+# app/services/payment_expiry.py
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from app.configuration.settings import Configuration
+from app.database.connection import get_async_session_factory
+from app.enums.payment_status import PaymentStatus
+from app.models.order.order import Order
+from app.models.payment.payment import Payment
+from app.tasks.websockets.ws_manager import payment_ws_manager
+
+configuration = Configuration()
+
+def _epoch(value: datetime) -> float:
+    # As colunas são gravadas em UTC sem fuso
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class PaymentExpiryScheduler:
+    """
+    Cancela pagamentos pendentes no momento em que expiram, sem varrer a tabela.
+    As rotas registram (payment_id, expires_at) num heap em memória; uma única task dorme até
+    o próximo vencimento e cancela os vencidos com um UPDATE condicional (só se ainda PENDING),
+    avisando os inscritos da transação e do pedido no payment_ws_manager. Ao iniciar, carrega os pendentes do banco; a varredura
+    periódica (cancel_expired_payments) continua como reconciliação.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._heap: List[Tuple[float, int]] = []
+        # Vencimento vigente por pagamento: entradas antigas no heap são ignoradas ao sair
+        self._deadlines: Dict[int, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"scheduled": 0, "canceled": 0, "errors": 0}
+
+    def schedule(self, payment_id: int, expires_at: Optional[datetime]) -> None:
+        if not self.enabled or expires_at is None:
+            return
+        deadline = _epoch(expires_at)
+        self._deadlines[payment_id] = deadline
+        heapq.heappush(self._heap, (deadline, payment_id))
+        self.stats["scheduled"] += 1
+        # Acorda a task se este vencimento é anterior ao que ela está esperando
+        if self._wakeup is not None and self._heap[0][1] == payment_id:
+            self._wakeup.set()
+
+    def discard(self, payment_id: int) -> None:
+        """Pagamento pago ou cancelado por outro caminho: não precisa mais expirar."""
+        self._deadlines.pop(payment_id, None)
+
+    def _pop_due(self, now: float) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, payment_id = heapq.heappop(self._heap)
+            if self._deadlines.get(payment_id) == deadline:
+                del self._deadlines[payment_id]
+                due.append(payment_id)
+        return due
+
+    async def _cancel(self, payment_ids: List[int]) -> None:
+        now = datetime.now(timezone.utc)
+        async with get_async_session_factory()() as session:
+            result = await session.execute(
+                update(Payment)
+                .where(
+                    Payment.id.in_(payment_ids),
+                    Payment.status == PaymentStatus.PENDING,
+                    Payment.expires_at <= now,
+                    Payment.order_id == Order.id,
+                )
+                .values(status=PaymentStatus.CANCELED, qr_code_base64=None, updated_at=now)
+                .returning(Payment.id, Payment.transaction_code, Order.code)
+            )
+            canceled = result.all()
+            await session.commit()
+
+        self.stats["canceled"] += len(canceled)
+        for payment_id, transaction_code, order_code in canceled:
+            logging.info(f"PAGAMENTO >>> Pagamento {payment_id} cancelado por expiração")
+            payment_ws_manager.publish_status(transaction_code, PaymentStatus.CANCELED.value, order_code=order_code)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max(self._heap[0][0] - time.time(), 0)
+            if timeout != 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            due = self._pop_due(time.time())
+            if not due:
+                continue
+            try:
+                await self._cancel(due)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Ficam para a reconciliação periódica
+                self.stats["errors"] += 1
+                logging.error(f"PAGAMENTO >>> Erro ao cancelar pagamentos expirados {due}: {e}")
+
+    async def _load_pending(self) -> None:
+        async with get_async_session_factory()() as session:
+            rows = (await session.execute(
+                select(Payment.id, Payment.expires_at)
+                .where(Payment.status == PaymentStatus.PENDING, Payment.expires_at.is_not(None))
+            )).all()
+        for payment_id, expires_at in rows:
+            self.schedule(payment_id, expires_at)
+        logging.info(f"PAGAMENTO >>> Expiração agendada para {len(rows)} pagamentos pendentes")
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        # Criado aqui para ficar no event loop da aplicação
+        self._wakeup = asyncio.Event()
+        try:
+            await self._load_pending()
+        except Exception as e:
+            logging.error(f"PAGAMENTO >>> Erro ao carregar pagamentos pendentes: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {"enabled": self.enabled, "pending": len(self._deadlines), **self.stats}
+
+payment_expiry = PaymentExpiryScheduler(enabled=configuration.payment_expiry_scheduler)
@@ -0,0 +1,189 @@
+# app/services/pricing.py
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.product.product import Product
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+HUNDRED = Decimal("100")
+
+class PricingError(ValueError):
+    """Item que não pode ser precificado (produto, tamanho ou opção inexistente)."""
+
+def to_decimal(value) -> Decimal:
+    """Converte via str para não herdar o erro de representação do float (0.1 -> 0.1000000000000000055...)."""
+    if value is None:
+        return ZERO
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+def money(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # As colunas são gravadas em UTC sem fuso
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+@dataclass(frozen=True)
+class ProductPrices:
+    """Preços de um produto já convertidos para Decimal, prontos para consulta."""
+    product_id: int
+    name: str
+    is_active: bool
+    sizes: Dict[str, Decimal]
+    regular_sizes: Dict[str, Decimal]
+    options: Dict[str, Decimal]
+    promotion_percentage: Optional[Decimal] = None
+    promotion_start_at: Optional[datetime] = None
+    promotion_end_at: Optional[datetime] = None
+
+    @classmethod
+    def from_product(cls, product: Product) -> "ProductPrices":
+        sizes = {size: to_decimal(price) for size, price in (product.prices_by_size or {}).items()}
+        # Com promoção cadastrada, prices_by_size já tem o desconto e o preço cheio fica em old_prices_by_size
+        regular = sizes
+        if product.is_promotion and product.old_prices_by_size:
+            regular = {size: to_decimal(price) for size, price in product.old_prices_by_size.items()}
+        # Sem percentual (promoção encerrada por limpeza antiga) não há promoção: vale o preço cheio
+        promotion = product.is_promotion and product.promotion_discount_percentage is not None
+        return cls(
+            product_id=product.id,
+            name=product.name,
+            is_active=product.is_active,
+            sizes=sizes,
+            regular_sizes=regular,
+            options={name: to_decimal(price) for name, price in (product.options or {}).items()},
+            promotion_percentage=to_decimal(product.promotion_discount_percentage) if promotion else None,
+            promotion_start_at=_as_utc(product.promotion_start_at) if promotion else None,
+            promotion_end_at=_as_utc(product.promotion_end_at) if promotion else None,
+        )
+
+    def promotion_active(self, now: datetime) -> bool:
+        if self.promotion_percentage is None:
+            return False
+        return (
+            (self.promotion_start_at is None or self.promotion_start_at <= now)
+            and (self.promotion_end_at is None or self.promotion_end_at >= now)
+        )
+
+@dataclass(frozen=True)
+class PricedLine:
+    product_id: int
+    size: Optional[str]
+    quantity: int
+    unit_price: Decimal
+    options_price: Decimal
+    total_price: Decimal
+    options: Dict[str, Decimal] = field(default_factory=dict)
+    promotion_applied: bool = False
+
+@dataclass(frozen=True)
+class PricedCart:
+    lines: List[PricedLine]
+    subtotal: Decimal
+    discount_percentage: Decimal
+    discount_value: Decimal
+    total: Decimal
+    items_count: int
+
+class PriceTable:
+    """
+    Tabela de preços em memória montada a partir do catálogo.
+    As consultas são por (produto, tamanho) em dicionários pré-calculados; nenhuma vai ao banco.
+    """
+
+    def __init__(self, products: Iterable[ProductPrices], version: Optional[int] = None):
+        self.version = version
+        self.products: Dict[int, ProductPrices] = {p.product_id: p for p in products}
+        self._sizes: Dict[Tuple[int, str], Tuple[Decimal, Decimal]] = {
+            (p.product_id, size): (price, p.regular_sizes.get(size, price))
+            for p in self.products.values()
+            for size, price in p.sizes.items()
+        }
+
+    @classmethod
+    def from_products(cls, products: Iterable[Product], version: Optional[int] = None) -> "PriceTable":
+        return cls((ProductPrices.from_product(product) for product in products), version)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def _product(self, product_id: int) -> ProductPrices:
+        prices = self.products.get(product_id)
+        if prices is None or not prices.is_active:
+            raise PricingError(f"Produto {product_id} inválido ou inativo")
+        return prices
+
+    def unit_price(self, product_id: int, size: Optional[str], now: Optional[datetime] = None) -> Tuple[Decimal, bool]:
+        """Preço unitário vigente do tamanho e se ele é o preço promocional."""
+        prices = self._product(product_id)
+        if size is None and len(prices.sizes) == 1:
+            size = next(iter(prices.sizes))
+        entry = self._sizes.get((product_id, size))
+        if entry is None:
+            raise PricingError(f"Tamanho '{size}' inválido para o produto {prices.name}")
+        promotional, regular = entry
+        if prices.promotion_active(now or datetime.now(timezone.utc)):
+            return promotional, promotional != regular
+        return regular, False
+
+    def options_price(self, product_id: int, options: Optional[Iterable[str]]) -> Dict[str, Decimal]:
+        """Preço de cada opção escolhida, sempre pelo catálogo (o valor enviado pelo cliente é ignorado)."""
+        prices = self._product(product_id)
+        priced = {}
+        for name in options or ():
+            if name not in prices.options:
+                raise PricingError(f"Opção '{name}' inválida para o produto {prices.name}")
+            priced[name] = prices.options[name]
+        return priced
+
+    def price_line(self, product_id: int, size: Optional[str], quantity: int,
+                   options: Optional[Iterable[str]] = None, now: Optional[datetime] = None) -> PricedLine:
+        if quantity < 1:
+            raise PricingError("Quantidade deve ser maior que zero")
+        unit_price, promotion_applied = self.unit_price(product_id, size, now)
+        option_prices = self.options_price(product_id, options)
+        options_total = sum(option_prices.values(), ZERO)
+        return PricedLine(
+            product_id=product_id,
+            size=size,
+            quantity=quantity,
+            unit_price=unit_price,
+            options_price=options_total,
+            total_price=money((unit_price + options_total) * quantity),
+            options=option_prices,
+            promotion_applied=promotion_applied,
+        )
+
+    def price_cart(self, items: Iterable, discount_percentage=None, now: Optional[datetime] = None) -> PricedCart:
+        """
+        Precifica todos os itens de uma vez. Cada item precisa de product_id, size e quantity;
+        options (dict ou lista de nomes) é opcional. O desconto do cupom incide sobre o subtotal.
+        """
+        now = now or datetime.now(timezone.utc)
+        lines = [
+            self.price_line(
+                item.product_id,
+                getattr(item, "size", None),
+                item.quantity,
+                list(getattr(item, "options", None) or ()),
+                now,
+            )
+            for item in items
+        ]
+        subtotal = sum((line.total_price for line in lines), ZERO)
+        percentage = to_decimal(discount_percentage)
+        discount = min(money(subtotal * percentage / HUNDRED), subtotal) if percentage > 0 else ZERO
+        return PricedCart(
+            lines=lines,
+            subtotal=subtotal,
+            discount_percentage=percentage,
+            discount_value=discount,
+            total=subtotal - discount,
+            items_count=sum(line.quantity for line in lines),
+        )
@@ -0,0 +1,190 @@
+# app/services/promocodes.py
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from zoneinfo import ZoneInfo
+from sqlalchemy import event, or_, select, update
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database.connection import get_async_session_factory
+from app.models.company.promocode import PromoCode
+
+SAO_PAULO_TZ = ZoneInfo("America/Sao_Paulo")
+
+class PromoCodeError(ValueError):
+    """Cupom inexistente ou que não pode ser usado; a mensagem vai direto para o cliente."""
+
+# Limites "abertos" da janela de validade, em segundos desde a época
+NO_START = -(2 ** 63)
+NO_END = 2 ** 63 - 1
+
+def _epoch(value: Optional[datetime], default: int) -> int:
+    if value is None:
+        return default
+    # As colunas são gravadas em UTC sem fuso
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def _local(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, SAO_PAULO_TZ).strftime('%d/%m/%Y %H:%M')
+
+@dataclass(frozen=True, slots=True)
+class PromoRecord:
+    """Cupom ativo em forma compacta, com a janela de validade pré-calculada em epoch UTC."""
+    code: str
+    description: Optional[str]
+    discount_percentage: float
+    valid_from: int
+    valid_until: int
+    max_uses: Optional[int]
+    current_uses: int
+    min_order_value: Optional[float]
+
+    @classmethod
+    def from_model(cls, promo: PromoCode) -> "PromoRecord":
+        return cls(
+            code=promo.code,
+            description=promo.description,
+            discount_percentage=promo.discount_percentage,
+            valid_from=_epoch(promo.valid_from, NO_START),
+            valid_until=_epoch(promo.valid_until, NO_END),
+            max_uses=promo.max_uses,
+            current_uses=promo.current_uses or 0,
+            min_order_value=promo.min_order_value,
+        )
+
+    def check(self, subtotal: Optional[float] = None, now: Optional[int] = None) -> None:
+        """Levanta PromoCodeError se o cupom não puder ser usado agora para esse subtotal."""
+        now = int(time.time()) if now is None else now
+        if now < self.valid_from:
+            raise PromoCodeError(f"Código promocional válido apenas a partir de {_local(self.valid_from)}")
+        if now > self.valid_until:
+            raise PromoCodeError(f"Código promocional expirado em {_local(self.valid_until)}")
+        # O contador pode estar defasado: o limite de fato é garantido no UPDATE do resgate
+        if self.max_uses is not None and self.current_uses >= self.max_uses:
+            raise PromoCodeError("Código promocional atingiu o limite de usos")
+        if subtotal is not None and self.min_order_value and subtotal < self.min_order_value:
+            raise PromoCodeError(f"Pedido mínimo para este cupom é de R$ {self.min_order_value:.2f}")
+
+def _active_promos():
+    return select(PromoCode).where(PromoCode.is_active == True, PromoCode.deleted_at.is_(None))
+
+class PromoRegistry:
+    """
+    Todos os cupons ativos em memória, indexados pelo código.
+    É recarregado inteiro (uma consulta) após escritas em /promocode e periodicamente pela
+    task `refresh_promo_registry` do lifespan de cada worker, então validar um cupom não
+    consulta o banco.
+    O dicionário é trocado por inteiro na recarga, de modo que leituras não precisam de lock.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, PromoRecord] = {}
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def _replace(self, promos: Iterable[PromoCode]) -> None:
+        records = {promo.code: PromoRecord.from_model(promo) for promo in promos}
+        with self._lock:
+            self._records = records
+            self.loaded_at = time.monotonic()
+        logging.info(f"CUPOM >>> Registro de cupons recarregado: {len(records)} ativos")
+
+    def reload(self, session: Session) -> None:
+        """Recarga com sessão síncrona (rotas de escrita de /promocode)."""
+        self._replace(session.exec(_active_promos()).scalars().all())
+
+    async def reload_async(self, session: AsyncSession) -> None:
+        self._replace((await session.exec(_active_promos())).scalars().all())
+
+    def get(self, code: str) -> Optional[PromoRecord]:
+        return self._records.get(code)
+
+    def update(self, record: PromoRecord) -> None:
+        """Atualiza um único cupom (ex.: contador após o resgate)."""
+        with self._lock:
+            records = dict(self._records)
+            records[record.code] = record
+            self._records = records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+promo_registry = PromoRegistry()
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+async def refresh_promo_registry(interval: float) -> None:
+    """
+    Recarrega o registro periodicamente para pegar escritas feitas em outros workers.
+    Roda no event loop de cada processo web (o registro é por processo, não é job do scheduler).
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with get_async_session_factory()() as session:
+                await promo_registry.reload_async(session)
+        except Exception as e:
+            logging.error(f"CUPOM >>> Erro ao recarregar o registro de cupons: {e}")
+
+async def get_promo(session: AsyncSession, code: str) -> Optional[PromoRecord]:
+    """Cupom ativo pelo código; só consulta o banco se o registro ainda não foi carregado."""
+    if not promo_registry.loaded:
+        await promo_registry.reload_async(session)
+    return promo_registry.get(normalize_code(code))
+
+async def validate_promo(session: AsyncSession, code: str, subtotal: Optional[float] = None) -> PromoRecord:
+    """Só valida (não consome uso): o resgate acontece na criação do pedido."""
+    record = await get_promo(session, code)
+    if record is None:
+        raise PromoCodeError("Código promocional inválido ou inativo")
+    record.check(subtotal)
+    return record
+
+async def redeem_promo(session: AsyncSession, code: str, subtotal: float) -> PromoRecord:
+    """
+    Consome um uso do cupom com um único UPDATE condicional ... RETURNING.
+    Todas as regras (ativo, vigência, max_uses, min_order_value) ficam no WHERE, então
+    requisições concorrentes não perdem incrementos nem ultrapassam o limite.
+    Chamar no fim da transação: a linha fica travada até o commit.
+    """
+    code = normalize_code(code)
+    now = datetime.now(timezone.utc)
+    statement = (
+        update(PromoCode)
+        .where(
+            PromoCode.code == code,
+            PromoCode.deleted_at.is_(None),
+            PromoCode.is_active == True,
+            or_(PromoCode.valid_from.is_(None), PromoCode.valid_from <= now),
+            or_(PromoCode.valid_until.is_(None), PromoCode.valid_until >= now),
+            or_(PromoCode.max_uses.is_(None), PromoCode.current_uses < PromoCode.max_uses),
+            or_(PromoCode.min_order_value.is_(None), PromoCode.min_order_value <= subtotal),
+        )
+        .values(current_uses=PromoCode.current_uses + 1)
+        .returning(PromoCode)
+    )
+    promo = (await session.exec(
+        select(PromoCode).from_statement(statement).execution_options(populate_existing=True)
+    )).scalar_one_or_none()
+
+    if promo is not None:
+        record = PromoRecord.from_model(promo)
+        # O contador em memória só avança se a transação do pedido for confirmada
+        event.listen(session.sync_session, "after_commit", lambda _: promo_registry.update(record), once=True)
+        return record
+
+    # Recusado: relê os cupons só para explicar o motivo
+    await promo_registry.reload_async(session)
+    await validate_promo(session, code, subtotal)
+    raise PromoCodeError("Código promocional atingiu o limite de usos")
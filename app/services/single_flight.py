@@ -0,0 +1,34 @@
+# app/services/single_flight.py
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes pela mesma chave: a primeira executa `fn` numa task e as
+    demais aguardam o mesmo resultado (ou a mesma exceção). Vale só dentro do processo; entre
+    processos a exclusão fica com o lock do banco.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats["calls"] += 1
+        else:
+            self.stats["shared"] += 1
+        # shield: se quem chamou for cancelado, a criação continua para os outros
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> dict:
+        return {"in_flight": len(self._inflight), **self.stats}
+
+# Criação de cobranças PIX, por pedido
+pix_charges = SingleFlight()
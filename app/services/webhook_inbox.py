@@ -0,0 +1,245 @@
+# app/services/webhook_inbox.py
+import asyncio
+import logging
+import random
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, String, column, or_, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.configuration.settings import Configuration
+from app.database.connection import get_async_session_factory
+from app.enums.payment_status import PaymentStatus
+from app.integration.mercadopago import GatewayError, payment_gateway
+from app.models.order.order import Order
+from app.models.payment.payment import Payment
+from app.models.payment.webhook_event import PaymentWebhookEvent
+from app.services.payment_expiry import payment_expiry
+from app.tasks.websockets.ws_manager import payment_ws_manager
+
+configuration = Configuration()
+
+# Status do Mercado Pago que encerram o pagamento
+APPROVED_STATUS = {"approved"}
+CANCELED_STATUS = {"rejected", "cancelled"}
+
+class WebhookInbox:
+    """
+    Processa os webhooks de pagamento fora da requisição. A rota só grava o evento em
+    tb_payment_webhook_event e responde; notificações repetidas do mesmo pagamento são somadas à
+    linha pendente (ON CONFLICT). Os workers reservam lotes com FOR UPDATE SKIP LOCKED e um prazo
+    (`lease`), consultam o gateway uma vez por pagamento e aplicam as transições com um UPDATE
+    por status. Falhas do gateway voltam para a fila com backoff até `max_attempts`.
+    A validade do pagamento é conferida no momento em que a notificação chegou (`received_at`),
+    não no processamento: fila, backoff ou reinício não fazem um pagamento em dia expirar.
+    """
+
+    def __init__(self, workers: int = 2, batch_size: int = 50, poll_interval: float = 2.0,
+                 max_attempts: int = 8, lease: float = 60.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"received": 0, "coalesced": 0, "batches": 0, "processed": 0, "applied": 0,
+                      "retried": 0, "failed": 0, "errors": 0}
+
+    async def enqueue(self, session: AsyncSession, mp_payment_id: str, action: Optional[str], payload: dict) -> None:
+        """Grava (ou soma à linha pendente) a notificação do pagamento e acorda os workers."""
+        now = datetime.now(timezone.utc)
+        stmt = insert(PaymentWebhookEvent).values(
+            mp_payment_id=mp_payment_id, action=action, payload=payload,
+            events=1, attempts=0, received_at=now, next_attempt_at=now,
+        )
+        # O prazo de uma reserva em andamento é mantido; o worker vê `events` mudar e devolve a linha à fila.
+        # received_at fica o da primeira notificação pendente: é o horário que vale para a expiração
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PaymentWebhookEvent.mp_payment_id],
+            index_where=PaymentWebhookEvent.processed_at.is_(None),
+            set_={
+                "events": PaymentWebhookEvent.events + 1,
+                "action": stmt.excluded.action,
+                "payload": stmt.excluded.payload,
+            },
+        ).returning(PaymentWebhookEvent.events)
+        events = (await session.execute(stmt)).scalar_one()
+        await session.commit()
+
+        self.stats["received"] += 1
+        if events > 1:
+            self.stats["coalesced"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self) -> List[Tuple[int, str, int, int, datetime]]:
+        now = datetime.now(timezone.utc)
+        async with get_async_session_factory()() as session:
+            ids = (
+                select(PaymentWebhookEvent.id)
+                .where(PaymentWebhookEvent.processed_at.is_(None), PaymentWebhookEvent.next_attempt_at <= now)
+                .order_by(PaymentWebhookEvent.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            rows = (await session.execute(
+                update(PaymentWebhookEvent)
+                .where(PaymentWebhookEvent.id.in_(ids))
+                .values(attempts=PaymentWebhookEvent.attempts + 1, next_attempt_at=now + timedelta(seconds=self.lease))
+                .returning(
+                    PaymentWebhookEvent.id, PaymentWebhookEvent.mp_payment_id,
+                    PaymentWebhookEvent.events, PaymentWebhookEvent.attempts, PaymentWebhookEvent.received_at,
+                )
+            )).all()
+            await session.commit()
+        return rows
+
+    async def _fetch(self, mp_payment_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """(transaction_code, status) no gateway; (None, None) se o pagamento não existe lá."""
+        result = await payment_gateway.get_payment(mp_payment_id)
+        mp_payment = result.get("response")
+        if result.get("status") != 200 or not mp_payment or "id" not in mp_payment:
+            return None, None
+        return str(mp_payment["id"]), mp_payment.get("status")
+
+    @staticmethod
+    def _received(events: List[Tuple[str, datetime]]):
+        """(transaction_code, received_at) dos eventos como tabela VALUES, para o UPDATE em lote."""
+        return values(
+            column("transaction_code", String), column("received_at", DateTime), name="events",
+        ).data(events)
+
+    @staticmethod
+    def _not_expired(events):
+        # Pagamento já vencido quando a notificação chegou fica com o cancelamento por expiração
+        return or_(Payment.expires_at.is_(None), Payment.expires_at >= events.c.received_at)
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=random.uniform(0.5, 1.0) * min(2 ** attempts, 300))
+
+    async def process_batch(self) -> int:
+        """Reserva e processa um lote; retorna quantos eventos foram reservados."""
+        rows = await self._claim()
+        if not rows:
+            return 0
+        self.stats["batches"] += 1
+
+        results = await asyncio.gather(*(self._fetch(row.mp_payment_id) for row in rows), return_exceptions=True)
+
+        approved: List[Tuple[str, datetime]] = []
+        canceled: List[Tuple[str, datetime]] = []
+        done: List[Tuple[int, int]] = []
+        failed: Dict[int, Tuple[int, str]] = {}
+        for row, result in zip(rows, results):
+            if isinstance(result, Exception):
+                error = str(result) if isinstance(result, GatewayError) else f"{type(result).__name__}: {result}"
+                failed[row.id] = (row.attempts, error)
+                continue
+            transaction_code, status = result
+            if transaction_code is None:
+                logging.error(f"MERCADO PAGO >>> Pagamento {row.mp_payment_id} não encontrado")
+            elif status in APPROVED_STATUS:
+                approved.append((transaction_code, row.received_at))
+            elif status in CANCELED_STATUS:
+                canceled.append((transaction_code, row.received_at))
+            done.append((row.id, row.events))
+
+        now = datetime.now(timezone.utc)
+        changed = []
+        async with get_async_session_factory()() as session:
+            if approved:
+                events = self._received(approved)
+                changed += (await session.execute(
+                    update(Payment)
+                    .where(Payment.transaction_code == events.c.transaction_code, Payment.status != PaymentStatus.PAID,
+                           self._not_expired(events), Payment.order_id == Order.id)
+                    .values(status=PaymentStatus.PAID, paid_at=now, qr_code_base64=None, updated_at=now)
+                    .returning(Payment.id, Payment.transaction_code, Payment.status, Payment.paid_at, Order.code)
+                )).all()
+            if canceled:
+                events = self._received(canceled)
+                changed += (await session.execute(
+                    update(Payment)
+                    .where(Payment.transaction_code == events.c.transaction_code, Payment.status == PaymentStatus.PENDING,
+                           self._not_expired(events), Payment.order_id == Order.id)
+                    .values(status=PaymentStatus.CANCELED, qr_code_base64=None, updated_at=now)
+                    .returning(Payment.id, Payment.transaction_code, Payment.status, Payment.paid_at, Order.code)
+                )).all()
+
+            if done:
+                # Só fecha o evento se não chegou outra notificação durante o processamento
+                await session.execute(
+                    update(PaymentWebhookEvent)
+                    .where(tuple_(PaymentWebhookEvent.id, PaymentWebhookEvent.events).in_(done))
+                    .values(processed_at=now, last_error=None)
+                )
+                await session.execute(
+                    update(PaymentWebhookEvent)
+                    .where(PaymentWebhookEvent.id.in_([event_id for event_id, _ in done]),
+                           PaymentWebhookEvent.processed_at.is_(None))
+                    .values(next_attempt_at=now)
+                )
+            for event_id, (attempts, error) in failed.items():
+                values = {"last_error": error[:500], "next_attempt_at": now + self._backoff(attempts)}
+                if attempts >= self.max_attempts:
+                    values["processed_at"] = now
+                    logging.error(f"MERCADO PAGO >>> Webhook {event_id} descartado após {attempts} tentativas: {error}")
+                await session.execute(
+                    update(PaymentWebhookEvent).where(PaymentWebhookEvent.id == event_id).values(**values)
+                )
+            await session.commit()
+
+        self.stats["processed"] += len(done)
+        self.stats["applied"] += len(changed)
+        self.stats["retried"] += sum(1 for attempts, _ in failed.values() if attempts < self.max_attempts)
+        self.stats["failed"] += sum(1 for attempts, _ in failed.values() if attempts >= self.max_attempts)
+
+        for payment_id, transaction_code, status, paid_at, order_code in changed:
+            payment_expiry.discard(payment_id)
+            payment_ws_manager.publish_status(transaction_code, status.value, paid_at, order_code)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            # Limpo antes de reservar: um enqueue durante o lote faz a volta seguinte começar na hora
+            self._wakeup.clear()
+            try:
+                claimed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # As linhas reservadas voltam para a fila quando o prazo da reserva vence
+                self.stats["errors"] += 1
+                logging.error(f"MERCADO PAGO >>> Erro ao processar webhooks: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+
+    async def start(self) -> None:
+        if self.workers <= 0:
+            return
+        # Criado aqui para ficar no event loop da aplicação
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    def get_stats(self) -> dict:
+        return {"workers": len(self._tasks), **self.stats}
+
+webhook_inbox = WebhookInbox(
+    workers=configuration.webhook_workers,
+    batch_size=configuration.webhook_batch_size,
+    poll_interval=configuration.webhook_poll_interval,
+    max_attempts=configuration.webhook_max_attempts,
+)
@@ -0,0 +1,59 @@
+# app/tasks/scheduler/batch_jobs.py
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from sqlmodel import Session
+from app.configuration.settings import Configuration
+from app.database.connection import session_scope
+
+configuration = Configuration()
+
+class JobMetrics:
+    """Linhas alteradas e duração de cada execução dos jobs, por nome (expostos em /company/health/jobs)."""
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, job: str, rows: int, batches: int, duration: float) -> None:
+        with self._lock:
+            stats = self._jobs.setdefault(job, {"runs": 0, "rows": 0, "seconds": 0.0})
+            stats["runs"] += 1
+            stats["rows"] += rows
+            stats["seconds"] = round(stats["seconds"] + duration, 3)
+            stats["last_run"] = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "rows": rows,
+                "batches": batches,
+                "duration_ms": round(duration * 1000, 1),
+            }
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {job: dict(stats) for job, stats in self._jobs.items()}
+
+job_metrics = JobMetrics()
+
+def run_in_chunks(job: str, process_chunk: Callable[[Session, int], int], batch_size: Optional[int] = None) -> int:
+    """
+    Executa `process_chunk(session, batch_size)` em lotes, com commit a cada lote, até um lote
+    voltar incompleto. Cada lote deve alterar no máximo `batch_size` linhas e tirá-las do filtro
+    (ex.: mudando o status), senão o laço não termina. Retorna o total de linhas alteradas.
+    """
+    batch_size = batch_size or configuration.job_batch_size
+    started = time.perf_counter()
+    rows = batches = 0
+    with session_scope() as session:
+        while True:
+            touched = process_chunk(session, batch_size)
+            session.commit()
+            rows += touched
+            batches += 1
+            if touched < batch_size:
+                break
+    duration = time.perf_counter() - started
+    job_metrics.record(job, rows, batches, duration)
+    logging.info(f"JOB >>> {job}: {rows} linhas em {batches} lotes ({duration * 1000:.0f} ms)")
+    return rows
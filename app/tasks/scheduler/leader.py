@@ -0,0 +1,87 @@
+# app/tasks/scheduler/leader.py
+import functools
+import logging
+import threading
+import zlib
+from typing import Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.database.connection import get_engine
+
+# Chave do advisory lock disputado pelos processos que rodam o scheduler
+SCHEDULER_LOCK_KEY = zlib.crc32(b"thomaggio:scheduler")
+
+class LeaderElection:
+    """
+    Eleição de líder por advisory lock de sessão do Postgres (pg_try_advisory_lock).
+    O líder mantém uma conexão dedicada aberta: se o processo morre, o Postgres encerra a
+    sessão e libera o lock, e outro processo assume na próxima chamada de `check`.
+    """
+
+    def __init__(self, key: int = SCHEDULER_LOCK_KEY):
+        self.key = key
+        self._connection: Optional[Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._connection is not None
+
+    def check(self) -> bool:
+        """Confirma a liderança (a conexão do lock ainda responde) ou tenta assumi-la."""
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.exec_driver_sql("SELECT 1")
+                    return True
+                except Exception as e:
+                    logging.warning(f"SCHEDULER >>> Conexão do lock de liderança perdida: {e}")
+                    self._discard()
+
+            connection = None
+            try:
+                # Autocommit: o lock é de sessão e a conexão não fica "idle in transaction"
+                connection = get_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+                acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            except Exception as e:
+                logging.error(f"SCHEDULER >>> Erro na eleição de líder: {e}")
+                if connection is not None:
+                    connection.close()
+                return False
+
+            if not acquired:
+                connection.close()
+                return False
+            self._connection = connection
+            logging.info("SCHEDULER >>> Este processo assumiu a execução dos jobs")
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._connection is None:
+                return
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+                self._connection.close()
+                self._connection = None
+                logging.info("SCHEDULER >>> Liderança liberada")
+            except Exception as e:
+                logging.warning(f"SCHEDULER >>> Erro ao liberar o lock de liderança: {e}")
+                self._discard()
+
+    def _discard(self) -> None:
+        # Descarta a conexão em vez de devolvê-la ao pool; fechar a sessão libera o lock
+        try:
+            self._connection.invalidate()
+        except Exception:
+            pass
+        self._connection = None
+
+    def leader_only(self, job: Callable) -> Callable:
+        """Envolve um job para que só rode no processo líder."""
+        @functools.wraps(job)
+        def wrapper(*args, **kwargs):
+            if not self.is_leader:
+                return None
+            return job(*args, **kwargs)
+        return wrapper
@@ -1,27 +1,95 @@
 # app/functions/scheduler.py
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
-from app.helpers.cart.cart_jobs import expire_old_carts, delete_expired_carts
+from apscheduler.schedulers.base import BaseScheduler
+from app.configuration.settings import Configuration
+from app.helpers.cart.cart_jobs import expire_old_carts, delete_expired_carts, verify_cart_totals
 from app.helpers.payment.payments_expired import cancel_expired_payments
+from app.helpers.payment.webhook_events import purge_processed_webhook_events
 from app.helpers.product.discount import clear_expired_promotions
 from app.helpers.render.ping import keep_alive_ping
+from app.tasks.scheduler.leader import LeaderElection
 
-def start_scheduler():
-    scheduler = BackgroundScheduler(timezone="UTC")
+configuration = Configuration()
+
+# Scheduler e eleição do processo web (SCHEDULER_MODE = leader | local)
+_scheduler: Optional[BaseScheduler] = None
+_election: Optional[LeaderElection] = None
+
+def add_jobs(scheduler: BaseScheduler, wrap: Callable[[Callable], Callable] = lambda job: job) -> None:
+    """Registra os jobs; `wrap` permite condicionar a execução (ex.: só no líder)."""
 
     # Roda a cada 10 minutos
-    scheduler.add_job(expire_old_carts, "interval", minutes=10)
+    scheduler.add_job(wrap(expire_old_carts), "interval", minutes=10)
+
+    # Confere (e corrige) os totais gravados dos carrinhos abertos a cada hora
+    scheduler.add_job(wrap(verify_cart_totals), "interval", hours=1)
 
     # Roda 1x por dia, 4 da manhã UTC
-    scheduler.add_job(delete_expired_carts, "cron", hour=3, minute=0)
+    scheduler.add_job(wrap(delete_expired_carts), "cron", hour=3, minute=0)
     
     # Limpa promoções expiradas todo dia às 3 da manhã UTC
-    scheduler.add_job(clear_expired_promotions, "cron", hour=3, minute=0)
+    scheduler.add_job(wrap(clear_expired_promotions), "cron", hour=3, minute=0)
+    
+    # Reconciliação: o cancelamento no vencimento é feito pelo payment_expiry de cada processo web;
+    # a varredura pega o que ficou para trás (processo reiniciado, erro no cancelamento)
+    scheduler.add_job(wrap(cancel_expired_payments), "interval", minutes=configuration.payment_reconcile_interval)
     
-    # Cancela pagamentos expirados a cada 5 minutos
-    scheduler.add_job(cancel_expired_payments, "interval", minutes=1)
+    # Remove os webhooks já processados depois do período de retenção
+    scheduler.add_job(wrap(purge_processed_webhook_events), "cron", hour=3, minute=30)
     
     # Ping de keep-alive a cada 5 minutos
-    scheduler.add_job(keep_alive_ping, "interval", minutes=5)
+    scheduler.add_job(wrap(keep_alive_ping), "interval", minutes=5)
+
+def add_leader_election(scheduler: BaseScheduler, election: LeaderElection) -> None:
+    """Jobs só no líder; a liderança é confirmada (ou disputada) a cada SCHEDULER_LEADER_INTERVAL."""
+    scheduler.add_job(
+        election.check, "interval", seconds=configuration.scheduler_leader_interval,
+        next_run_time=datetime.now(timezone.utc), max_instances=1, coalesce=True,
+    )
+    add_jobs(scheduler, election.leader_only)
+
+def start_scheduler() -> Optional[BaseScheduler]:
+    """
+    Scheduler dentro do processo web, conforme SCHEDULER_MODE:
+    leader (padrão) roda os jobs só no processo que detém o lock; local roda em todo processo;
+    off não cria o scheduler (jobs no worker: python -m app.tasks.scheduler.worker).
+
+    Em leader cada worker web tem a sua thread de scheduler e consulta o lock a cada
+    SCHEDULER_LEADER_INTERVAL (o líder ainda prende uma conexão do pool só para o lock); com
+    WEB_CONCURRENCY > 1 o recomendado é off + worker dedicado.
+    """
+    global _scheduler, _election
+    mode = configuration.scheduler_mode
+    if mode == "off":
+        logging.info("SCHEDULER >>> Desativado neste processo (SCHEDULER_MODE=off)")
+        return None
+
+    if configuration.web_concurrency > 1:
+        logging.warning(
+            f"SCHEDULER >>> SCHEDULER_MODE={mode} com WEB_CONCURRENCY={configuration.web_concurrency}: "
+            "um scheduler por worker; prefira SCHEDULER_MODE=off e python -m app.tasks.scheduler.worker"
+        )
+
+    scheduler = BackgroundScheduler(timezone="UTC")
+    if mode == "local":
+        add_jobs(scheduler)
+    else:
+        _election = LeaderElection()
+        add_leader_election(scheduler, _election)
 
     scheduler.start()
-    
\ No newline at end of file
+    _scheduler = scheduler
+    return scheduler
+
+def stop_scheduler() -> None:
+    """Encerra o scheduler do processo e libera a liderança para outro processo assumir."""
+    global _scheduler, _election
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+    if _election is not None:
+        _election.release()
+        _election = None
@@ -0,0 +1,32 @@
+# app/tasks/scheduler/worker.py
+import logging
+import signal
+from apscheduler.schedulers.blocking import BlockingScheduler
+from app.tasks.scheduler.leader import LeaderElection
+from app.tasks.scheduler.scheduler import add_leader_election
+
+def main() -> None:
+    """
+    Processo dedicado aos jobs (web com SCHEDULER_MODE=off). Pode haver mais de uma réplica:
+    só a que detém o lock executa, e as demais assumem se ela cair.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    scheduler = BlockingScheduler(timezone="UTC")
+    election = LeaderElection()
+    add_leader_election(scheduler, election)
+
+    def shutdown(signum, frame):
+        logging.info("SCHEDULER >>> Encerrando worker")
+        scheduler.shutdown(wait=False)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    logging.info("SCHEDULER >>> Worker iniciado")
+    try:
+        scheduler.start()
+    finally:
+        election.release()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# app/websockets/broadcaster.py
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional, Set
+from fastapi import WebSocket
+from app.configuration.settings import Configuration
+
+configuration = Configuration()
+
+# Políticas para consumidores lentos (fila cheia)
+DROP_OLDEST = "drop_oldest"      # descarta a mensagem mais antiga da fila
+DROP_NEWEST = "drop_newest"      # descarta a mensagem nova
+DISCONNECT = "disconnect"        # derruba a conexão; o cliente reconecta e recarrega o estado
+
+# Código de fechamento "try again later" para consumidores lentos
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class _Connection:
+    """
+    Conexão com fila de envio própria, esvaziada por uma task dedicada. Sem websocket é uma
+    assinatura (SSE): quem a criou consome a fila, e None nela encerra o stream.
+    """
+
+    def __init__(self, websocket: Optional[WebSocket], queue_size: int, topics: Iterable[str] = ()):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.topics = tuple(topics)
+        # Mensagens já enfileiradas (inclui as descartadas depois por fila cheia)
+        self.enqueued = 0
+
+    @property
+    def key(self):
+        return self.websocket if self.websocket is not None else self
+
+class Broadcaster:
+    """
+    Envio em leque para websockets: cada mensagem é serializada uma única vez e colocada
+    na fila de cada conexão; quem chama `broadcast` não espera nenhum envio.
+    Conexões podem se inscrever em tópicos; `publish_topics` entrega só aos inscritos.
+    """
+
+    name = "ws"
+
+    def __init__(self, queue_size: Optional[int] = None, policy: Optional[str] = None,
+                 send_timeout: Optional[float] = None):
+        self.queue_size = queue_size or configuration.ws_queue_size
+        self.policy = policy or configuration.ws_slow_consumer_policy
+        self.send_timeout = send_timeout or configuration.ws_send_timeout
+        self._connections: Dict[object, _Connection] = {}
+        self._topics: Dict[str, Set[_Connection]] = {}
+        self.stats = {"sent": 0, "dropped": 0, "slow_disconnects": 0, "send_errors": 0}
+
+    @property
+    def active_connections(self):
+        return list(self._connections)
+
+    async def connect(self, websocket: WebSocket, topics: Iterable[str] = ()) -> _Connection:
+        await websocket.accept()
+        connection = _Connection(websocket, self.queue_size, topics)
+        connection.task = asyncio.create_task(self._drain(connection))
+        self._register(connection)
+        return connection
+
+    def subscribe(self, topics: Iterable[str]) -> _Connection:
+        """Assinatura sem websocket (SSE); encerrar com `disconnect(connection)`."""
+        connection = _Connection(None, self.queue_size, topics)
+        self._register(connection)
+        return connection
+
+    def _register(self, connection: _Connection) -> None:
+        self._connections[connection.key] = connection
+        for topic in connection.topics:
+            self._topics.setdefault(topic, set()).add(connection)
+
+    def disconnect(self, key):
+        """Remove a conexão pelo websocket (ou a assinatura); pode ser chamado mais de uma vez."""
+        connection = self._connections.pop(key, None)
+        if connection is None:
+            return
+        for topic in connection.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._topics[topic]
+        if connection.task and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+
+    async def broadcast(self, message: dict):
+        self.publish(message)
+
+    def publish_topics(self, topics: Iterable[str], message: dict) -> None:
+        """Enfileira só para os inscritos em algum dos tópicos (uma vez por conexão)."""
+        targets: Set[_Connection] = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        if targets:
+            self.publish(message, targets)
+
+    def publish(self, message: dict, connections=None) -> None:
+        """Serializa uma vez e enfileira para as conexões informadas (todas, por padrão)."""
+        text = json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str)
+        targets = self._connections.values() if connections is None else connections
+        for connection in list(targets):
+            self._enqueue(connection, text)
+
+    def _enqueue(self, connection: _Connection, text: str) -> None:
+        connection.enqueued += 1
+        try:
+            connection.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == DISCONNECT:
+            self.stats["slow_disconnects"] += 1
+            logging.warning(f"WEBSOCKET >>> [{self.name}] Consumidor lento desconectado")
+            self.disconnect(connection.key)
+            if connection.websocket is not None:
+                asyncio.create_task(self._close(connection.websocket, SLOW_CONSUMER_CLOSE_CODE))
+            else:
+                while not connection.queue.empty():
+                    connection.queue.get_nowait()
+                connection.queue.put_nowait(None)
+            return
+
+        self.stats["dropped"] += 1
+        if self.policy == DROP_NEWEST:
+            return
+        connection.queue.get_nowait()
+        connection.queue.put_nowait(text)
+
+    async def _drain(self, connection: _Connection) -> None:
+        websocket = connection.websocket
+        try:
+            while True:
+                text = await connection.queue.get()
+                await asyncio.wait_for(websocket.send_text(text), timeout=self.send_timeout)
+                self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Socket morto ou envio travado: a conexão sai da lista sem afetar as demais
+            self.stats["send_errors"] += 1
+            logging.info(f"WEBSOCKET >>> [{self.name}] Conexão removida após falha no envio: {e}")
+            self.disconnect(websocket)
+            await self._close(websocket)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = 1000) -> None:
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def get_stats(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "topics": len(self._topics),
+            "queued": sum(c.queue.qsize() for c in self._connections.values()),
+            "policy": self.policy,
+            **self.stats,
+        }
@@ -1,18 +1,6 @@
 # app/websockets/order_ws.py
-from fastapi import WebSocket
-from typing import List
+from app.tasks.websockets.broadcaster import Broadcaster
 
-class OrderWebSocketManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
\ No newline at end of file
+class OrderWebSocketManager(Broadcaster):
+    """Painel da cozinha/dashboard: recebe todos os eventos de pedidos."""
+    name = "orders"
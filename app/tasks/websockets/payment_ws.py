@@ -1,18 +1,30 @@
 # app/websockets/payment_ws.py
-from fastapi import WebSocket
-from typing import List
+from datetime import datetime
+from typing import Optional
+from app.tasks.websockets.broadcaster import Broadcaster
 
-class PaymentWebSocketManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+def transaction_topic(transaction_code: str) -> str:
+    return f"transaction:{transaction_code}"
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+def order_topic(order_code: str) -> str:
+    return f"order:{order_code}"
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+def payment_status_message(transaction_code: Optional[str], status: str, paid_at: Optional[datetime]) -> dict:
+    return {
+        "type": "payment_status",
+        "transaction_code": transaction_code,
+        "status": status,
+        "paid_at": paid_at.isoformat() if paid_at else None,
+    }
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
\ No newline at end of file
+class PaymentWebSocketManager(Broadcaster):
+    """Eventos de pagamento enviados ao checkout, por transação ou por pedido."""
+    name = "payment"
+
+    def publish_status(self, transaction_code: str, status: str, paid_at: Optional[datetime] = None,
+                       order_code: Optional[str] = None) -> None:
+        """Entrega a mudança de status só a quem acompanha a transação ou o pedido."""
+        topics = [transaction_topic(transaction_code)]
+        if order_code:
+            topics.append(order_topic(order_code))
+        self.publish_topics(topics, payment_status_message(transaction_code, status, paid_at))
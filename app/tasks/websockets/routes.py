@@ -1,5 +1,8 @@
 # app/websockets/routes.py
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.database.connection import get_async_session_factory
+from app.helpers.payment.payment_status import latest_pix_payment, payment_by_transaction_code
+from app.tasks.websockets.payment_ws import order_topic, payment_status_message, transaction_topic
 from app.tasks.websockets.ws_manager import order_ws_manager, payment_ws_manager
 
 router = APIRouter()
@@ -11,13 +14,39 @@ async def websocket_orders(websocket: WebSocket):
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         order_ws_manager.disconnect(websocket)
-        
-@router.websocket("/ws/payment/{transaction_code}")
-async def websocket_payment(websocket: WebSocket):
-    await payment_ws_manager.connect(websocket)
+
+async def _follow_payment(websocket: WebSocket, topic: str, load_payment):
+    """Inscreve no tópico, envia o status atual e mantém a conexão até o cliente sair."""
+    connection = await payment_ws_manager.connect(websocket, [topic])
     try:
+        async with get_async_session_factory()() as session:
+            payment = await load_payment(session)
+        # Se uma mudança já chegou durante a consulta, ela é mais nova que o estado lido
+        if payment and connection.enqueued == 0:
+            payment_ws_manager.publish(
+                payment_status_message(payment.transaction_code, payment.status.value, payment.paid_at),
+                [connection],
+            )
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         payment_ws_manager.disconnect(websocket)
+
+@router.websocket("/ws/payment/{transaction_code}")
+async def websocket_payment(websocket: WebSocket, transaction_code: str):
+    await _follow_payment(
+        websocket, transaction_topic(transaction_code),
+        lambda session: payment_by_transaction_code(session, transaction_code),
+    )
+
+@router.websocket("/ws/payment/order/{order_code}")
+async def websocket_payment_order(websocket: WebSocket, order_code: str):
+    async def load_payment(session):
+        _, payment = await latest_pix_payment(session, order_code)
+        return payment
+    await _follow_payment(websocket, order_topic(order_code), load_payment)
@@ -0,0 +1,368 @@
+"""Esquema inicial (tabelas existentes antes do alembic)
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ENUM_TYPES = ("cartstatus", "chatstep", "companystatus", "chatbotstatus", "orderstatus", "paymentstatus")
+
+
+def upgrade() -> None:
+    op.create_table('tb_cart',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('code', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('whatsapp_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('status', sa.Enum('ACTIVE', 'PROCESSING', 'COMPLETED', 'CANCELLED', 'EXPIRED', 'CLEARED', name='cartstatus'), nullable=False),
+    sa.Column('promo_code', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('promo_discount_percentage', sa.Float(), nullable=True),
+    sa.Column('promo_discount_value', sa.Float(), nullable=True),
+    sa.Column('promo_applied_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.Column('delivery_fee', sa.Float(), nullable=True),
+    sa.Column('delivery_neighborhood', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tb_cart_code'), 'tb_cart', ['code'], unique=True)
+    op.create_index(op.f('ix_tb_cart_whatsapp_id'), 'tb_cart', ['whatsapp_id'], unique=False)
+    op.create_table('tb_category',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('allowed_types', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tb_category_name'), 'tb_category', ['name'], unique=False)
+    op.create_table('tb_chat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('whatsapp_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('phone', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('cart_code', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('step', sa.Enum('INICIO', 'BOAS_VINDAS', 'CONSULTANDO_EMPRESA', 'ESCOLHENDO_CATEGORIA', 'ESCOLHENDO_PRODUTO', 'VISUALIZANDO_PRODUTO', 'INSERINDO_PRODUTO_CARRINHO', 'REMOVENDO_PRODUTO_CARRINHO', 'ATUALIZANDO_QUANTIDADE', 'CONSULTANDO_CARRINHO', 'CONSULTANDO_VALOR_PRODUTO', 'CONSULTANDO_TAXA_ENTREGA', 'CONSULTANDO_PROMOCOES', 'INSERINDO_DADOS_PESSOAIS', 'INSERINDO_DADOS_ENTREGA', 'ESCOLHENDO_FORMA_PAGAMENTO', 'CONFIRMANDO_PEDIDO', 'PEDIDO_CONFIRMADO', 'PEDIDO_REALIZADO', 'PEDIDO_CANCELADO', 'PEDIDO_EXPIRADO', 'FALAR_COM_ATENDENTE', 'FALAR_COM_BOT', name='chatstep'), nullable=False),
+    sa.Column('human_attendance', sa.Boolean(), nullable=True),
+    sa.Column('interaction_count', sa.Integer(), nullable=True),
+    sa.Column('max_interaction', sa.Integer(), nullable=True),
+    sa.Column('last_interaction_at', sa.DateTime(), nullable=False),
+    sa.Column('context_json', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('whatsapp_id', 'cart_code', name='uix_whatsapp_cart')
+    )
+    op.create_index(op.f('ix_tb_chat_cart_code'), 'tb_chat', ['cart_code'], unique=False)
+    op.create_index(op.f('ix_tb_chat_human_attendance'), 'tb_chat', ['human_attendance'], unique=False)
+    op.create_index(op.f('ix_tb_chat_phone'), 'tb_chat', ['phone'], unique=False)
+    op.create_index(op.f('ix_tb_chat_whatsapp_id'), 'tb_chat', ['whatsapp_id'], unique=False)
+    op.create_table('tb_company',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('industry', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('cnpj', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('phone', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('website', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('contact_email', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('logo_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('opening_time', sa.Time(), nullable=True),
+    sa.Column('closing_time', sa.Time(), nullable=True),
+    sa.Column('working_days', sa.ARRAY(sa.String()), nullable=True),
+    sa.Column('social_media_links', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('OPEN', 'CLOSED', 'MAINTENANCE', name='companystatus'), nullable=False),
+    sa.Column('chatbot_status', sa.Enum('ACTIVE', 'INACTIVE', 'MAINTENANCE', name='chatbotstatus'), nullable=False),
+    sa.Column('min_order_value', sa.Float(), nullable=True),
+    sa.Column('pickup_enabled', sa.Boolean(), nullable=False),
+    sa.Column('delivery_fee_default', sa.Float(), nullable=True),
+    sa.Column('privacy_policy_version', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_delivery_config',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cep', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('central_point_lat', sa.Float(), nullable=False),
+    sa.Column('central_point_lng', sa.Float(), nullable=False),
+    sa.Column('radius', sa.Float(), nullable=False),
+    sa.Column('default_delivery_fee', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_promocode',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('code', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('description', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True),
+    sa.Column('discount_percentage', sa.Float(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('valid_from', sa.DateTime(), nullable=True),
+    sa.Column('valid_until', sa.DateTime(), nullable=True),
+    sa.Column('max_uses', sa.Integer(), nullable=True),
+    sa.Column('current_uses', sa.Integer(), nullable=False),
+    sa.Column('min_order_value', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tb_promocode_code'), 'tb_promocode', ['code'], unique=True)
+    op.create_table('tb_delivery_zone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('lat', sa.Float(), nullable=False),
+    sa.Column('lng', sa.Float(), nullable=False),
+    sa.Column('cep', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('config_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['config_id'], ['tb_delivery_config.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_product',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('stock', sa.Integer(), nullable=True),
+    sa.Column('image', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('size', sa.JSON(), nullable=True),
+    sa.Column('prices_by_size', sa.JSON(), nullable=True),
+    sa.Column('old_prices_by_size', sa.JSON(), nullable=True),
+    sa.Column('selected_flavors', sa.JSON(), nullable=True),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('min_flavors', sa.Integer(), nullable=True),
+    sa.Column('max_flavors', sa.Integer(), nullable=True),
+    sa.Column('flavors_required', sa.Boolean(), nullable=False),
+    sa.Column('options_required', sa.Boolean(), nullable=False),
+    sa.Column('rating', sa.Float(), nullable=True),
+    sa.Column('reviews_count', sa.Integer(), nullable=True),
+    sa.Column('attributes', sa.JSON(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('is_promotion', sa.Boolean(), nullable=True),
+    sa.Column('promotion_discount_percentage', sa.Float(), nullable=True),
+    sa.Column('promotion_start_at', sa.DateTime(), nullable=True),
+    sa.Column('promotion_end_at', sa.DateTime(), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=True),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('types', sa.JSON(), nullable=True),
+    sa.Column('tags', sa.JSON(), nullable=True),
+    sa.Column('deactivated_by_category', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['tb_category.id'], ),
+    sa.ForeignKeyConstraint(['company_id'], ['tb_company.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_supply',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('unit', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('min_quantity', sa.Float(), nullable=True),
+    sa.Column('unit_price', sa.Float(), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['tb_company.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('username', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('password_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('phone', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('role', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('is_admin', sa.Boolean(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('last_login', sa.DateTime(), nullable=True),
+    sa.Column('token_password_reset', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['tb_company.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_address',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('street', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('number', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('complement', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('neighborhood', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('zip_code', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('city', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('state', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('reference', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('is_company_address', sa.Boolean(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['tb_company.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['tb_user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_cart_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cart_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('size', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('observation', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('selected_flavors', sa.JSON(), nullable=True),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cart_id'], ['tb_cart.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['tb_product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tb_cart_item_size'), 'tb_cart_item', ['size'], unique=False)
+    op.create_table('tb_product_supply',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('supply_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('unit', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['tb_product.id'], ),
+    sa.ForeignKeyConstraint(['supply_id'], ['tb_supply.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_order',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('code', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('customer_name', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('phone', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('whatsapp_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('is_whatsapp', sa.Boolean(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'PREPARING', 'READY', 'DELIVERED', 'CANCELED', name='orderstatus'), nullable=False),
+    sa.Column('table_number', sa.Integer(), nullable=True),
+    sa.Column('payment_method', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('delivery_fee', sa.Float(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('total_amount_with_discount', sa.Float(), nullable=False),
+    sa.Column('discount_code', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('discount_percentage', sa.Float(), nullable=True),
+    sa.Column('discount_value', sa.Float(), nullable=True),
+    sa.Column('discount_description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('cash_change_for', sa.Float(), nullable=True),
+    sa.Column('cash_change', sa.Float(), nullable=True),
+    sa.Column('payment_status', sa.Enum('PENDING', 'PAID', 'FAILED', 'CANCELED', name='paymentstatus'), nullable=False),
+    sa.Column('delivery_address_id', sa.Integer(), nullable=True),
+    sa.Column('privacy_policy_version', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('privacy_policy_accepted_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['delivery_address_id'], ['tb_address.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['tb_user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tb_order_code'), 'tb_order', ['code'], unique=True)
+    op.create_index(op.f('ix_tb_order_discount_code'), 'tb_order', ['discount_code'], unique=False)
+    op.create_table('tb_order_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('total_price', sa.Float(), nullable=False),
+    sa.Column('size', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('observation', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('selected_flavors', sa.JSON(none_as_null=True), nullable=True),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['tb_order.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['tb_product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tb_payment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('method', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('transaction_code', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('status', postgresql.ENUM('PENDING', 'PAID', 'FAILED', 'CANCELED', name='paymentstatus', create_type=False), nullable=False),
+    sa.Column('qr_code', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('qr_code_base64', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('paid_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['tb_order.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('tb_payment')
+    op.drop_table('tb_order_item')
+    op.drop_index(op.f('ix_tb_order_discount_code'), table_name='tb_order')
+    op.drop_index(op.f('ix_tb_order_code'), table_name='tb_order')
+    op.drop_table('tb_order')
+    op.drop_table('tb_product_supply')
+    op.drop_index(op.f('ix_tb_cart_item_size'), table_name='tb_cart_item')
+    op.drop_table('tb_cart_item')
+    op.drop_table('tb_address')
+    op.drop_table('tb_user')
+    op.drop_table('tb_supply')
+    op.drop_table('tb_product')
+    op.drop_table('tb_delivery_zone')
+    op.drop_index(op.f('ix_tb_promocode_code'), table_name='tb_promocode')
+    op.drop_table('tb_promocode')
+    op.drop_table('tb_delivery_config')
+    op.drop_table('tb_company')
+    op.drop_index(op.f('ix_tb_chat_whatsapp_id'), table_name='tb_chat')
+    op.drop_index(op.f('ix_tb_chat_phone'), table_name='tb_chat')
+    op.drop_index(op.f('ix_tb_chat_human_attendance'), table_name='tb_chat')
+    op.drop_index(op.f('ix_tb_chat_cart_code'), table_name='tb_chat')
+    op.drop_table('tb_chat')
+    op.drop_index(op.f('ix_tb_category_name'), table_name='tb_category')
+    op.drop_table('tb_category')
+    op.drop_index(op.f('ix_tb_cart_whatsapp_id'), table_name='tb_cart')
+    op.drop_index(op.f('ix_tb_cart_code'), table_name='tb_cart')
+    op.drop_table('tb_cart')
+
+    bind = op.get_bind()
+    for enum_name in ENUM_TYPES:
+        sa.Enum(name=enum_name).drop(bind, checkfirst=True)
@@ -0,0 +1,32 @@
+"""Versão do catálogo para validação do cache de produtos
+
+Revision ID: 0002_catalog_version
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_catalog_version"
+down_revision: Union[str, None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('tb_catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO tb_catalog_version (id, version, updated_at) VALUES (1, 1, now() at time zone 'utc')")
+
+
+def downgrade() -> None:
+    op.drop_table('tb_catalog_version')
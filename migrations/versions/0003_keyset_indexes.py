@@ -0,0 +1,29 @@
+"""Índices (created_at, id) para paginação por cursor
+
+Revision ID: 0003_keyset_indexes
+Revises: 0002_catalog_version
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_keyset_indexes"
+down_revision: Union[str, None] = "0002_catalog_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("tb_order", "tb_cart", "tb_user")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.create_index(f"ix_{table}_created_at_id", table, ["created_at", "id"], unique=False)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_created_at_id", table_name=table)
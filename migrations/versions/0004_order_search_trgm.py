@@ -0,0 +1,48 @@
+"""Índices de trigramas (pg_trgm) para a busca de pedidos
+
+Revision ID: 0004_order_search_trgm
+Revises: 0003_keyset_indexes
+Create Date: 2026-10-17 00:00:00
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_order_search_trgm"
+down_revision: Union[str, None] = "0003_keyset_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# A expressão do telefone precisa ser idêntica à usada em app/helpers/order/search.py
+INDEXES = {
+    "ix_tb_order_customer_name_trgm": "customer_name gin_trgm_ops",
+    "ix_tb_order_code_trgm": "code gin_trgm_ops",
+    "ix_tb_order_phone_digits_trgm": r"regexp_replace(phone, '\D', '', 'g') gin_trgm_ops",
+}
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        available = op.get_bind().execute(
+            sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        ).scalar()
+        if not available:
+            # A busca continua funcionando (ILIKE sem ranking por similaridade)
+            logger.warning("Extensão pg_trgm indisponível no servidor; índices de busca não criados")
+            return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, expression in INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON tb_order USING gin ({expression})")
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
@@ -0,0 +1,45 @@
+"""Telefone único por cliente (permite upsert do cliente na criação do pedido)
+
+Revision ID: 0005_customer_phone_unique
+Revises: 0004_order_search_trgm
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_customer_phone_unique"
+down_revision: Union[str, None] = "0004_order_search_trgm"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREDICATE = "role = 'customer' AND phone IS NOT NULL AND deleted_at IS NULL"
+
+# Quantos telefones mostrar no erro; a lista completa sai do script de correção
+REPORT_LIMIT = 20
+
+
+def upgrade() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT phone, array_agg(id ORDER BY id) FROM tb_user WHERE {PREDICATE} "
+        f"GROUP BY phone HAVING count(*) > 1 ORDER BY phone"
+    )).all()
+    if duplicates:
+        # A unificação muda dono de pedidos e endereços: é decisão de dados, não do esquema
+        report = "; ".join(f"{phone}: {ids}" for phone, ids in duplicates[:REPORT_LIMIT])
+        raise RuntimeError(
+            f"{len(duplicates)} telefones com mais de um cliente ativo ({report}). "
+            "Revise e rode `python -m app.database.merge_duplicate_customers --apply` antes desta migração."
+        )
+    op.create_index(
+        "ux_tb_user_customer_phone", "tb_user", ["phone"], unique=True,
+        postgresql_where=sa.text(PREDICATE),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_tb_user_customer_phone", table_name="tb_user")
@@ -0,0 +1,52 @@
+"""Totais do carrinho gravados na própria tabela (subtotal, items_count, discount)
+
+Revision ID: 0006_cart_totals
+Revises: 0005_customer_phone_unique
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_cart_totals"
+down_revision: Union[str, None] = "0005_customer_phone_unique"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Soma dos itens: quantidade * (preço unitário + preço das opções); options é um objeto JSON nome -> preço
+# (ou JSON null em itens antigos)
+BACKFILL = """
+    UPDATE tb_cart c SET subtotal = t.subtotal, items_count = t.items_count
+    FROM (
+        SELECT i.cart_id,
+               round(sum(i.quantity * (i.unit_price + CASE WHEN json_typeof(i.options) = 'object' THEN coalesce(
+                   (SELECT sum(o.value::numeric) FROM json_each_text(i.options) o), 0
+               ) ELSE 0 END))::numeric, 2) AS subtotal,
+               sum(i.quantity) AS items_count
+        FROM tb_cart_item i
+        GROUP BY i.cart_id
+    ) t
+    WHERE t.cart_id = c.id
+"""
+
+
+def upgrade() -> None:
+    # Coluna nova em vez de renomear promo_discount_value: workers da versão anterior continuam
+    # lendo e gravando a antiga durante o deploy; ela é removida em 0010_drop_promo_discount_value
+    op.add_column("tb_cart", sa.Column("discount", sa.Float(), nullable=False, server_default="0"))
+    op.add_column("tb_cart", sa.Column("subtotal", sa.Float(), nullable=False, server_default="0"))
+    op.add_column("tb_cart", sa.Column("items_count", sa.Integer(), nullable=False, server_default="0"))
+    op.execute(BACKFILL)
+    op.execute(
+        "UPDATE tb_cart SET discount = round((subtotal * coalesce(promo_discount_percentage, 0) / 100)::numeric, 2)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("tb_cart", "items_count")
+    op.drop_column("tb_cart", "subtotal")
+    op.drop_column("tb_cart", "discount")
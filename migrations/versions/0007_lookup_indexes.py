@@ -0,0 +1,44 @@
+"""Índices para os filtros dos jobs e para as buscas por chave
+
+Revision ID: 0007_lookup_indexes
+Revises: 0006_cart_totals
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_lookup_indexes"
+down_revision: Union[str, None] = "0006_cart_totals"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nome, tabela, colunas, predicado do índice parcial)
+INDEXES = (
+    ("ix_tb_payment_pending_expires_at", "tb_payment", ["expires_at"], "status = 'PENDING' AND expires_at IS NOT NULL"),
+    ("ix_tb_payment_transaction_code", "tb_payment", ["transaction_code"], None),
+    ("ix_tb_payment_order_id", "tb_payment", ["order_id"], None),
+    ("ix_tb_cart_status_updated_at", "tb_cart", ["status", "updated_at"], "status IN ('ACTIVE', 'EXPIRED')"),
+    ("ix_tb_cart_item_cart_id", "tb_cart_item", ["cart_id"], None),
+    ("ix_tb_order_item_order_id", "tb_order_item", ["order_id"], None),
+    ("ix_tb_user_username", "tb_user", ["username"], None),
+    ("ix_tb_user_email", "tb_user", ["email"], None),
+    ("ix_tb_product_promotion_end_at", "tb_product", ["promotion_end_at"], "promotion_end_at IS NOT NULL"),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns, predicate in INDEXES:
+        op.create_index(
+            name, table, columns, unique=False,
+            postgresql_where=sa.text(predicate) if predicate else None,
+        )
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,48 @@
+"""Caixa de entrada dos webhooks de pagamento
+
+Revision ID: 0008_payment_webhook_inbox
+Revises: 0007_lookup_indexes
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_payment_webhook_inbox"
+down_revision: Union[str, None] = "0007_lookup_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('tb_payment_webhook_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mp_payment_id', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('action', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_tb_payment_webhook_event_pending', 'tb_payment_webhook_event', ['mp_payment_id'],
+                    unique=True, postgresql_where=sa.text('processed_at IS NULL'))
+    op.create_index('ix_tb_payment_webhook_event_next_attempt_at', 'tb_payment_webhook_event', ['next_attempt_at'],
+                    unique=False, postgresql_where=sa.text('processed_at IS NULL'))
+    op.create_index('ix_tb_payment_webhook_event_processed_at', 'tb_payment_webhook_event', ['processed_at'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tb_payment_webhook_event_processed_at', table_name='tb_payment_webhook_event')
+    op.drop_index('ix_tb_payment_webhook_event_next_attempt_at', table_name='tb_payment_webhook_event')
+    op.drop_index('ux_tb_payment_webhook_event_pending', table_name='tb_payment_webhook_event')
+    op.drop_table('tb_payment_webhook_event')
@@ -0,0 +1,27 @@
+"""Versão dos carrinhos para a gravação condicional do store
+
+Revision ID: 0009_cart_version
+Revises: 0008_payment_webhook_inbox
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_cart_version"
+down_revision: Union[str, None] = "0008_payment_webhook_inbox"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Coluna nova com default: processos antigos continuam funcionando durante o deploy
+    op.add_column('tb_cart', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('tb_cart', 'version')
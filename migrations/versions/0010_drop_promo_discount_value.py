@@ -0,0 +1,32 @@
+"""Remove tb_cart.promo_discount_value, substituída por discount
+
+Aplicar só depois que nenhum worker da versão anterior estiver rodando (eles ainda leem a
+coluna). Em deploy sem parada: `alembic upgrade 0009_cart_version`, troca dos workers e,
+depois, `alembic upgrade head`.
+
+Revision ID: 0010_drop_promo_discount_value
+Revises: 0009_cart_version
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010_drop_promo_discount_value"
+down_revision: Union[str, None] = "0009_cart_version"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # IF EXISTS: bancos que aplicaram a primeira versão de 0006 (que renomeava a coluna) já não a têm
+    op.execute("ALTER TABLE tb_cart DROP COLUMN IF EXISTS promo_discount_value")
+
+
+def downgrade() -> None:
+    op.add_column("tb_cart", sa.Column("promo_discount_value", sa.Float(), nullable=True))
+    op.execute("UPDATE tb_cart SET promo_discount_value = discount")
@@ -0,0 +1,40 @@
+"""Restaura o preço cheio de produtos com promoção encerrada pela limpeza antiga
+
+A limpeza de promoções vencidas apagava só percentual e datas, deixando is_promotion ligado e
+prices_by_size com o desconto. Aqui esses produtos voltam ao estado de clear_product_promotion.
+
+Revision ID: 0011_repair_ended_promotions
+Revises: 0010_drop_promo_discount_value
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011_repair_ended_promotions"
+down_revision: Union[str, None] = "0010_drop_promo_discount_value"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    repaired = op.get_bind().exec_driver_sql("""
+        UPDATE tb_product SET
+            prices_by_size = CASE WHEN json_typeof(old_prices_by_size) = 'object'
+                                  THEN old_prices_by_size ELSE prices_by_size END,
+            old_prices_by_size = NULL,
+            is_promotion = false,
+            updated_at = now() at time zone 'utc'
+        WHERE is_promotion AND promotion_discount_percentage IS NULL
+    """).rowcount
+    if repaired:
+        # Invalida o catálogo em cache (bump_catalog_version)
+        op.execute("UPDATE tb_catalog_version SET version = version + 1, updated_at = now() at time zone 'utc'")
+
+
+def downgrade() -> None:
+    # Correção de dados: não há estado anterior a restaurar
+    pass
@@ -0,0 +1,75 @@
+# tests/conftest.py
+import os
+
+# Os singletons (engine, gateway, store de carrinhos) leem o ambiente no import: configura antes.
+# Os testes usam um banco próprio, recriado a cada execução, no mesmo servidor do DB_DEV_*.
+os.environ["ENVIRONMENT"] = "development"
+os.environ["DB_DEV_NAME"] = os.getenv("TEST_DB_NAME", "thomaggio_test")
+os.environ["PAYMENT_GATEWAY"] = "fake"
+os.environ["SCHEDULER_MODE"] = "off"
+os.environ["CART_STORE"] = "off"
+os.environ["WEBHOOK_WORKERS"] = "0"
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from app.database.connection import dispose_async_engine, dispose_engine, get_database_url
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+def database():
+    """Recria o banco de testes e aplica as migrações e seeds; sem Postgres os testes são pulados."""
+    url = make_url(get_database_url())
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    try:
+        with admin.connect() as connection:
+            connection.exec_driver_sql(f'DROP DATABASE IF EXISTS "{url.database}" WITH (FORCE)')
+            connection.exec_driver_sql(f'CREATE DATABASE "{url.database}"')
+    except OperationalError as e:
+        pytest.skip(f"Postgres indisponível para os testes: {e}")
+    finally:
+        admin.dispose()
+
+    from app.database.bootstrap import bootstrap_database
+    bootstrap_database()
+    yield url
+    dispose_engine()
+
+@pytest.fixture
+async def db(database):
+    """Para testes assíncronos: o pool do asyncpg fica preso ao event loop de cada teste."""
+    yield database
+    await dispose_async_engine()
+
+@pytest.fixture
+def client(database):
+    from fastapi.testclient import TestClient
+    from app import create_app
+
+    with TestClient(create_app()) as client:
+        yield client
+        # Antes de o loop do TestClient fechar, para o próximo teste abrir conexões no seu
+        client.portal.call(dispose_async_engine)
+
+@pytest.fixture
+def order(client):
+    """Pedido de uma pizza M de calabresa (R$ 42,00 + R$ 5,00 de entrega)."""
+    response = client.post("/orders/", json={
+        "customer": {"name": "Cliente Teste", "phone": "21988887777"},
+        "address": {
+            "street": "Rua A", "number": "1", "complement": "", "neighborhood": "Centro",
+            "zip_code": "20531-402", "city": "Rio de Janeiro", "state": "RJ",
+        },
+        "items": [{"product_id": 1, "quantity": 1, "size": "M"}],
+        "payment_method": "pix",
+        "delivery_fee": 5.0,
+        "privacy_policy_version": "1.0.0",
+        "privacy_policy_accepted_at": "2026-01-01T00:00:00Z",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
@@ -0,0 +1,93 @@
+# tests/test_cart_store.py
+import asyncio
+import time
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from sqlmodel import select
+
+from app.cache.backends import RedisBackend
+from app.database.connection import get_async_session_factory
+from app.models.cart.cart import Cart
+from app.services.cart_store import CartStore, RedisCartLock, RedisDirtySet
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+def _worker(server) -> CartStore:
+    """Um store como o de cada worker com CART_STORE=redis, todos no mesmo servidor Redis."""
+    client = fakeredis.FakeRedis(server=server)
+    async_client = fakeredis.aioredis.FakeRedis(server=server)
+    return CartStore(
+        RedisBackend(client=client, prefix="thomaggio:"),
+        RedisDirtySet(client, async_client),
+        remote_lock=RedisCartLock(async_client),
+        flush_lock=RedisCartLock(async_client, prefix="thomaggio:cart_store:", ttl_ms=30000, timeout=30.0),
+    )
+
+async def _new_cart() -> str:
+    async with get_async_session_factory()() as session:
+        cart = Cart()
+        session.add(cart)
+        await session.commit()
+        return cart.code
+
+async def _change_delivery_fee(store: CartStore, code: str, fee: float) -> None:
+    async with get_async_session_factory()() as session:
+        async with store.lock(code):
+            state = await store.get(session, code)
+            state.cart["delivery_fee"] = fee
+            await store.save(state)
+
+async def _saved_cart(code: str) -> Cart:
+    async with get_async_session_factory()() as session:
+        return (await session.exec(select(Cart).where(Cart.code == code))).one()
+
+async def test_checkout_on_another_worker_flushes_pending_cart(db, redis_server):
+    first, second = _worker(redis_server), _worker(redis_server)
+    code = await _new_cart()
+
+    await _change_delivery_fee(first, code, 9.5)
+    assert (await second.get_stats())["pending"] == 1
+
+    await second.checkout(code)
+
+    cart = await _saved_cart(code)
+    assert cart.delivery_fee == 9.5
+    assert cart.version == 1
+    assert (await first.get_stats())["pending"] == 0
+
+async def test_concurrent_flushes_do_not_discard_changes(db, redis_server):
+    workers = [_worker(redis_server) for _ in range(3)]
+    code = await _new_cart()
+    await _change_delivery_fee(workers[0], code, 7.0)
+
+    await asyncio.gather(*(worker.flush() for worker in workers))
+
+    assert (await _saved_cart(code)).delivery_fee == 7.0
+    assert sum(worker.stats["conflicts"] for worker in workers) == 0
+
+async def test_lock_waiter_wakes_on_release(redis_server):
+    client = fakeredis.aioredis.FakeRedis(server=redis_server)
+    owner, waiter = RedisCartLock(client, ttl_ms=5000), RedisCartLock(client, ttl_ms=5000, timeout=2.0)
+    token = await owner.acquire("abc")
+
+    waiting = asyncio.create_task(waiter.acquire("abc"))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    released_at = time.monotonic()
+    await owner.release("abc", token)
+    await waiter.release("abc", await asyncio.wait_for(waiting, 1.0))
+    assert time.monotonic() - released_at < 0.5
+
+async def test_lock_times_out_while_held(redis_server):
+    client = fakeredis.aioredis.FakeRedis(server=redis_server)
+    await RedisCartLock(client).acquire("abc")
+
+    with pytest.raises(TimeoutError):
+        await RedisCartLock(client, timeout=0.1).acquire("abc")
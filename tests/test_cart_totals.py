@@ -0,0 +1,65 @@
+# tests/test_cart_totals.py
+from sqlalchemy import event, update
+from sqlmodel import Session, select
+
+from app.database.connection import get_engine, session_scope
+from app.helpers.cart.totals import check_cart_totals
+from app.models.cart.cart import Cart
+from app.models.cart.cart_item import CartItem
+
+def _drifted_cart() -> int:
+    """Carrinho sem itens com totais gravados errados."""
+    with session_scope() as session:
+        cart = Cart(subtotal=99.0, items_count=3)
+        session.add(cart)
+        session.commit()
+        return cart.id
+
+def _cart(cart_id: int) -> Cart:
+    with session_scope() as session:
+        cart = session.get(Cart, cart_id)
+        session.expunge(cart)
+        return cart
+
+def test_fix_rewrites_totals_and_bumps_version(database):
+    cart_id = _drifted_cart()
+
+    with session_scope() as session:
+        mismatches = check_cart_totals(session, fix=True)
+
+    assert cart_id in {mismatch["cart_id"] for mismatch in mismatches}
+    cart = _cart(cart_id)
+    assert (cart.subtotal, cart.items_count, cart.discount, cart.version) == (0.0, 0, 0.0, 1)
+
+def test_fix_skips_cart_changed_after_it_was_read(database):
+    cart_id = _drifted_cart()
+
+    written = []
+    with Session(get_engine()) as session:
+        @event.listens_for(session, "do_orm_execute")
+        def concurrent_write(state):
+            # Outro escritor grava o carrinho entre a leitura e a correção
+            if not written and state.is_select and CartItem.__table__ in state.statement.get_final_froms():
+                written.append(cart_id)
+                with get_engine().begin() as connection:
+                    connection.execute(
+                        update(Cart).where(Cart.id == cart_id).values(subtotal=12.5, version=Cart.version + 1)
+                    )
+
+        mismatches = check_cart_totals(session, fix=True)
+
+    assert cart_id not in {mismatch["cart_id"] for mismatch in mismatches}
+    cart = _cart(cart_id)
+    assert (cart.subtotal, cart.version) == (12.5, 1)
+
+def test_clearing_items_bumps_cart_version(client):
+    code = client.post("/cart/", json={}).json()["code"]
+    assert client.post(f"/cart/{code}/items/", json={"product_id": 1, "quantity": 1, "size": "M"}).status_code == 200
+    with session_scope() as session:
+        version = session.exec(select(Cart.version).where(Cart.code == code)).one()
+
+    assert client.delete(f"/cart/{code}/items/").status_code == 200
+
+    with session_scope() as session:
+        cart = session.exec(select(Cart).where(Cart.code == code)).one()
+        assert (cart.items_count, cart.version) == (0, version + 1)
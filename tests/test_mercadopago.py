@@ -0,0 +1,59 @@
+# tests/test_mercadopago.py
+import asyncio
+import time
+
+import pytest
+
+from app.integration.fake_gateway import FakeMercadoPago
+from app.integration.mercadopago import CircuitBreaker, CircuitOpenError, GatewayError, MercadoPagoClient
+
+pytestmark = pytest.mark.anyio
+
+def _client(fake: FakeMercadoPago, breaker: CircuitBreaker = None) -> MercadoPagoClient:
+    client = MercadoPagoClient("token", "http://mercadopago.test", retries=0, breaker=breaker, transport=fake.transport())
+    client.fake = fake
+    return client
+
+async def test_fake_gateway_approves_pix_charge():
+    client = _client(FakeMercadoPago())
+    created = await client.create_payment({"payment_method_id": "pix", "transaction_amount": 47.0})
+    payment_id = created["response"]["id"]
+    assert created["response"]["status"] == "pending"
+
+    client.fake.approve(payment_id)
+
+    fetched = await client.get_payment(payment_id)
+    assert fetched["response"]["status"] == "approved"
+    await client.aclose()
+
+async def test_half_open_circuit_lets_a_single_probe_through():
+    fake = FakeMercadoPago(latency=0.1, failure_rate=1.0)
+    client = _client(fake, CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for _ in range(2):
+        with pytest.raises(GatewayError):
+            await client.get_payment(1)
+    assert client.breaker.state == "open"
+
+    fake.failure_rate = 0.0
+    client.breaker.opened_at = time.monotonic() - 61
+    results = await asyncio.gather(*(client.get_payment(1) for _ in range(5)), return_exceptions=True)
+
+    assert sum(isinstance(result, dict) for result in results) == 1
+    assert sum(isinstance(result, CircuitOpenError) for result in results) == 4
+    assert client.breaker.state == "closed"
+    await client.aclose()
+
+async def test_cancelled_probe_releases_the_half_open_slot():
+    fake = FakeMercadoPago(latency=0.5)
+    client = _client(fake, CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    client.breaker.opened_at = time.monotonic() - 61
+
+    probe = asyncio.create_task(client.get_payment(1))
+    await asyncio.sleep(0.05)
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+
+    assert client.breaker.probing is False
+    fake.latency = 0
+    assert (await client.get_payment(1))["status"] == 404
+    await client.aclose()
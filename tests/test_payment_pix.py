@@ -0,0 +1,37 @@
+# tests/test_payment_pix.py
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from app.database.connection import session_scope
+
+def _pix_payments(order_id: int):
+    with session_scope() as session:
+        return session.exec(
+            text("SELECT transaction_code, status FROM tb_payment WHERE order_id = :order_id AND method = 'pix'")
+            .bindparams(order_id=order_id)
+        ).all()
+
+def test_create_payment_pix_generates_charge(client, order):
+    response = client.post("/payment/", json={"order_id": order["id"], "amount": 47.0, "method": "pix"})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["qr_code"] and body["transaction_code"]
+    assert _pix_payments(order["id"]) == [(body["transaction_code"], "PENDING")]
+
+def test_create_payment_pix_reuses_pending_charge(client, order):
+    first = client.post("/payment/", json={"order_id": order["id"], "amount": 47.0, "method": "pix"}).json()
+    second = client.post("/payment/", json={"order_id": order["id"], "amount": 47.0, "method": "pix"}).json()
+
+    assert second["transaction_code"] == first["transaction_code"]
+    assert len(_pix_payments(order["id"])) == 1
+
+def test_concurrent_pix_requests_share_one_charge(client, order):
+    payload = {"order_id": order["id"], "amount": 47.0, "method": "pix"}
+    with ThreadPoolExecutor(5) as pool:
+        responses = list(pool.map(lambda _: client.post("/payment/pix-qrcode", json=payload), range(5)))
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["transaction_code"] for response in responses}) == 1
+    assert len(_pix_payments(order["id"])) == 1
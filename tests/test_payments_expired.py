@@ -0,0 +1,41 @@
+# tests/test_payments_expired.py
+import asyncio
+import json
+import subprocess
+import sys
+
+from sqlalchemy import text
+
+from app.database.connection import session_scope
+from app.tasks.websockets.payment_ws import order_topic, transaction_topic
+from app.tasks.websockets.ws_manager import payment_ws_manager
+
+def test_expiry_sweep_notifies_web_subscribers(client, order):
+    charge = client.post("/payment/pix-qrcode", json={"order_id": order["id"], "amount": 47.0, "method": "pix"}).json()
+    transaction_code = charge["transaction_code"]
+    with session_scope() as session:
+        session.exec(text(
+            "UPDATE tb_payment SET expires_at = now() at time zone 'utc' - interval '1 minute' WHERE transaction_code = :code"
+        ).bindparams(code=transaction_code))
+        session.commit()
+
+    async def subscribe():
+        return payment_ws_manager.subscribe([transaction_topic(transaction_code), order_topic(order["code"])])
+
+    async def next_message(subscription):
+        return json.loads(await asyncio.wait_for(subscription.queue.get(), 5))
+
+    subscription = client.portal.call(subscribe)
+    try:
+        # Em outro processo, como no worker de jobs: a entrega vem pelo LISTEN deste
+        subprocess.run([
+            sys.executable, "-c",
+            "from app.helpers.payment.payments_expired import cancel_expired_payments; cancel_expired_payments()",
+        ], check=True)
+        message = client.portal.call(next_message, subscription)
+    finally:
+        payment_ws_manager.disconnect(subscription.key)
+
+    assert message["transaction_code"] == transaction_code
+    assert message["status"] == "canceled"
+    assert subscription.queue.empty()
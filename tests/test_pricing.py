@@ -0,0 +1,71 @@
+# tests/test_pricing.py
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlmodel import select
+
+from app.database.connection import session_scope
+from app.helpers.product.discount import clear_expired_promotions
+from app.models.product.product import Product
+from app.services.pricing import PriceTable
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+def _product(**fields) -> Product:
+    values = dict(id=1, name="Pizza", is_active=True, prices_by_size={"M": 45.0}, old_prices_by_size={"M": 50.0})
+    values.update(fields)
+    return Product(**values)
+
+def _price(product: Product) -> Decimal:
+    return PriceTable.from_products([product]).unit_price(product.id, "M", NOW)[0]
+
+def test_active_promotion_uses_discounted_price():
+    product = _product(
+        is_promotion=True, promotion_discount_percentage=10.0,
+        promotion_start_at=NOW - timedelta(days=1), promotion_end_at=NOW + timedelta(days=1),
+    )
+    assert _price(product) == Decimal("45.0")
+
+def test_ended_promotion_uses_regular_price():
+    product = _product(
+        is_promotion=True, promotion_discount_percentage=10.0,
+        promotion_start_at=NOW - timedelta(days=2), promotion_end_at=NOW - timedelta(days=1),
+    )
+    assert _price(product) == Decimal("50.0")
+
+def test_promotion_without_percentage_is_no_promotion():
+    # Estado deixado pela limpeza antiga: flag ligada, percentual e datas apagados
+    product = _product(is_promotion=True, promotion_discount_percentage=None)
+    assert _price(product) == Decimal("50.0")
+
+def _set_ended_promotion(client, product_id: int) -> dict:
+    with session_scope() as session:
+        regular = dict(session.get(Product, product_id).prices_by_size)
+    response = client.post(f"/products/{product_id}/set-promotion", json={
+        "discount_percentage": 10,
+        "start_at": (datetime.now(timezone.utc) - timedelta(days=2)).isoformat(),
+        "end_at": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 200, response.text
+    return regular
+
+def _assert_promotion_cleared(product_id: int, regular: dict) -> None:
+    with session_scope() as session:
+        product = session.exec(select(Product).where(Product.id == product_id)).one()
+        assert product.is_promotion is False
+        assert product.prices_by_size == regular
+        assert not product.old_prices_by_size
+        table = PriceTable.from_products([product])
+    assert table.unit_price(product_id, "M")[0] == Decimal(str(regular["M"]))
+
+@pytest.mark.parametrize("clear", ["job", "route"])
+def test_clearing_expired_promotions_restores_regular_prices(client, clear):
+    regular = _set_ended_promotion(client, 2)
+
+    if clear == "job":
+        clear_expired_promotions()
+    else:
+        assert client.post("/products/clear-expired-promotions").status_code == 200
+
+    _assert_promotion_cleared(2, regular)
@@ -0,0 +1,59 @@
+# tests/test_webhook_inbox.py
+from sqlalchemy import text
+
+from app.database.connection import session_scope
+from app.integration.mercadopago import payment_gateway
+from app.services.webhook_inbox import webhook_inbox
+
+def _approved_pix(client, order) -> str:
+    """Cobrança PIX aprovada no gateway, com a notificação já na caixa de entrada (sem processar)."""
+    charge = client.post("/payment/pix-qrcode", json={"order_id": order["id"], "amount": 47.0, "method": "pix"}).json()
+    transaction_code = charge["transaction_code"]
+    payment_gateway.fake.approve(transaction_code)
+    response = client.post("/payment/webhook", json={"type": "payment", "data": {"id": transaction_code}})
+    assert response.json() == {"status": "queued"}
+    return transaction_code
+
+def _set_times(transaction_code: str, received_ago: str, expired_ago: str) -> None:
+    with session_scope() as session:
+        session.exec(text(
+            "UPDATE tb_payment_webhook_event SET received_at = now() at time zone 'utc' - CAST(:received AS interval) "
+            "WHERE mp_payment_id = :code AND processed_at IS NULL"
+        ).bindparams(received=received_ago, code=transaction_code))
+        session.exec(text(
+            "UPDATE tb_payment SET expires_at = now() at time zone 'utc' - CAST(:expired AS interval) "
+            "WHERE transaction_code = :code"
+        ).bindparams(expired=expired_ago, code=transaction_code))
+        session.commit()
+
+def _status(transaction_code: str) -> str:
+    with session_scope() as session:
+        return session.exec(
+            text("SELECT status FROM tb_payment WHERE transaction_code = :code").bindparams(code=transaction_code)
+        ).scalar_one()
+
+def test_approval_received_before_expiry_is_applied_after_it(client, order):
+    transaction_code = _approved_pix(client, order)
+    # Notificado com o PIX em dia, processado (fila, backoff, reinício) depois do vencimento
+    _set_times(transaction_code, received_ago="2 minutes", expired_ago="1 minute")
+
+    client.portal.call(webhook_inbox.process_batch)
+
+    assert _status(transaction_code) == "PAID"
+
+def test_approval_received_after_expiry_is_not_applied(client, order):
+    transaction_code = _approved_pix(client, order)
+    _set_times(transaction_code, received_ago="1 minute", expired_ago="2 minutes")
+
+    client.portal.call(webhook_inbox.process_batch)
+
+    assert _status(transaction_code) == "PENDING"
+
+def test_repeated_notifications_keep_the_first_receipt_time(client, order):
+    transaction_code = _approved_pix(client, order)
+    _set_times(transaction_code, received_ago="2 minutes", expired_ago="1 minute")
+    client.post("/payment/webhook", json={"type": "payment", "data": {"id": transaction_code}})
+
+    client.portal.call(webhook_inbox.process_batch)
+
+    assert _status(transaction_code) == "PAID"